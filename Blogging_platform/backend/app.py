@@ -1,21 +1,54 @@
-from flask import Flask, jsonify
+import logging
+
+import click
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 import cloudinary
 
 from models import db
 from config import Config
+from cache import response_cache
+from uploads import upload_queue
+from audit import audit_sink
+from passwords import password_hasher
+from slugs import slug_cache
+from trending import trending
+from likes import liked_cache
+from dbmetrics import db_metrics, engine_options_for
+import search  # registers the full-text index DDL with db.create_all()
 
-def create_app():
+def create_app(config=None):
+    """Build the app from Config, with `config` (a dict) overriding it, e.g. in tests"""
     app = Flask(__name__)
     app.url_map.strict_slashes = False
     app.config.from_object(Config)
+    app.config.update(config or {})
+    # Pool settings depend on the database actually used, so they're derived last
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options_for(app.config))
 
     # Initialize extensions
     db.init_app(app)
+    db_metrics.init_app(app)
+    response_cache.init_app(app)
+    upload_queue.init_app(app)
+    audit_sink.init_app(app)
+    password_hasher.init_app(app)
+    slug_cache.init_app(app)
+    trending.init_app(app)
+    liked_cache.init_app(app)
     CORS(app, resources={r"/api/*": {"origins": app.config['FRONTEND_URL']}})
     jwt = JWTManager(app)
 
+    # JSON lines: sampled auth decisions from middleware.log_auth(), slow queries from dbmetrics
+    for name in ('auth', 'db'):
+        json_logger = logging.getLogger(name)
+        if not json_logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            json_logger.addHandler(handler)
+            json_logger.setLevel(logging.INFO)
+
     # Configure Cloudinary
     cloudinary.config(
         cloud_name=app.config['CLOUDINARY_CLOUD_NAME'],
@@ -23,6 +56,12 @@ def create_app():
         api_secret=app.config['CLOUDINARY_API_SECRET']
     )
 
+    # Serve images stored by the local upload backend (development/tests)
+    if app.config['UPLOAD_BACKEND'] == 'local':
+        @app.route('/uploads/<path:filename>', methods=['GET'])
+        def uploaded_file(filename):
+            return send_from_directory(app.config['UPLOAD_LOCAL_DIR'], filename)
+
     # Register Blueprints
     from routes.auth_routes import auth_bp
     from routes.post_routes import post_bp
@@ -52,6 +91,99 @@ def create_app():
     def server_error(error):
         return jsonify({"error": "Internal server error"}), 500
 
+    # CLI: flask --app app upgrade-db (after deploying a release that changed the models)
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """Add the columns and indexes an existing database is missing, and fill them"""
+        from schema import upgrade_schema
+        changes = upgrade_schema()
+        for change in changes:
+            print(change)
+        print("Database is up to date." if not changes else f"Applied {len(changes)} changes.")
+
+    # CLI: flask --app app rebuild-search-index
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Create (if needed) and repopulate the post full-text index"""
+        from search import rebuild_index
+        db.create_all()
+        rebuild_index()
+        print("Search index rebuilt.")
+
+    # CLI: flask --app app render-posts [--all]
+    @app.cli.command('render-posts')
+    @click.option('--all', 'force', is_flag=True, help='Re-render every post, not only those missing an excerpt')
+    def render_posts_command(force):
+        """Store excerpt, sanitized HTML and reading time for existing posts"""
+        from rendering import backfill_rendering
+        rendered = backfill_rendering(force=force)
+        print(f"Rendered {rendered} posts.")
+
+    # CLI: flask --app app archive-audit-logs [--days N]
+    @app.cli.command('archive-audit-logs')
+    @click.option('--days', type=int, default=None, help='Keep this many days in the table (default AUDIT_RETENTION_DAYS)')
+    def archive_audit_logs_command(days):
+        """Move old audit log rows into compressed monthly archive files"""
+        from datetime import datetime, timedelta
+        from audit import archive_audit_logs
+        days = days if days is not None else app.config['AUDIT_RETENTION_DAYS']
+        archived = archive_audit_logs(datetime.utcnow() - timedelta(days=days), app.config['AUDIT_ARCHIVE_DIR'])
+        print(f"Archived {archived} audit log entries to {app.config['AUDIT_ARCHIVE_DIR']}.")
+
+    # CLI: flask --app app decay-trending / rebuild-trending
+    @app.cli.command('decay-trending')
+    def decay_trending_command():
+        """Apply trending score decay now (when TRENDING_DECAY_INTERVAL is 0, run this from cron)"""
+        factor = trending.decay()
+        print(f"Trending scores decayed by {factor:.4f}." if factor else "Nothing to decay.")
+
+    @app.cli.command('rebuild-trending')
+    def rebuild_trending_command():
+        """Recompute trending scores from recent likes and comments"""
+        db.create_all()
+        print(f"Trending scores rebuilt for {trending.rebuild()} posts.")
+
+    # CLI: flask --app app import-posts posts.ndjson --author alice / export-posts posts.ndjson
+    @app.cli.command('import-posts')
+    @click.argument('source', type=click.File('rb'))
+    @click.option('--author', required=True, help='Username the imported posts are credited to')
+    @click.option('--batch-size', type=int, default=None, help='Posts per transaction (default IMPORT_BATCH_SIZE)')
+    def import_posts_command(source, author, batch_size):
+        """Bulk-create posts from an NDJSON file ('-' for stdin)"""
+        from models import User
+        from bulk import import_posts
+        user = User.query.filter_by(username=author).first()
+        if not user:
+            raise click.ClickException(f"No user named {author}")
+        report = import_posts(source, user.id, batch_size or app.config['IMPORT_BATCH_SIZE'])
+        for error in report["errors"]:
+            print(f"line {error['line']}: {error['error']}")
+        print(f"Imported {report['imported']} posts, {report['failed']} failed.")
+
+    @app.cli.command('export-posts')
+    @click.argument('target', type=click.File('w'))
+    @click.option('--author', default=None, help='Only export posts by this username')
+    def export_posts_command(target, author):
+        """Write posts as NDJSON to a file ('-' for stdout)"""
+        from models import User
+        from bulk import export_posts
+        user_id = None
+        if author:
+            user = User.query.filter_by(username=author).first()
+            if not user:
+                raise click.ClickException(f"No user named {author}")
+            user_id = user.id
+        for line in export_posts(user_id, app.config['EXPORT_BATCH_SIZE']):
+            target.write(line)
+
+    # CLI: flask --app app reconcile-counters
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Repair drifted like/comment counters on posts"""
+        from counters import reconcile_counters
+        repaired = reconcile_counters()
+        print(f"Reconciled counters, {repaired} posts repaired.")
+
     return app
 
 if __name__ == '__main__':
@@ -68,6 +200,7 @@ if __name__ == '__main__':
             for name in categories:
                 db.session.add(Category(name=name))
             db.session.commit()
+            response_cache.invalidate('categories')
             print("Categories seeded successfully.")
             
         print("Database tables created successfully.")
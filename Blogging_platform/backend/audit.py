@@ -0,0 +1,402 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no other process can be told apart, every segment is adopted
+    fcntl = None
+
+from sqlalchemy import delete, insert
+
+from models import db, AuditLog
+
+# Values stored in AuditLog.action_type, filterable on /api/admin/audit
+ACTION_TYPES = (
+    'login', 'logout', 'role_change', 'post_create',
+    'post_like', 'post_unlike', 'comment_create',
+)
+
+
+class AuditSink:
+    """
+    Records AuditLog events without adding a row write to the request's transaction.
+
+    AUDIT_MODE selects the durability trade-off:
+      'sync'  - the row is added to the caller's session and commits with it (old behaviour)
+      'async' - events are queued in memory and bulk-inserted by a background
+                writer; anything still queued is lost if the process is killed
+      'wal'   - like 'async', but each event is first appended to a write-ahead
+                segment file in AUDIT_WAL_DIR, so a crash loses nothing (see _Segment)
+
+    The queue is bounded (AUDIT_QUEUE_SIZE); when the writer falls behind,
+    record() waits briefly and then writes the event through the caller's
+    session instead of dropping it. A batch that still fails after
+    AUDIT_WRITE_ATTEMPTS tries is written row by row; events the database
+    keeps rejecting are appended to AUDIT_DEAD_LETTER_PATH and logged, and in
+    'wal' mode stay uncommitted in their segment so a restart replays them. Queued events are flushed at interpreter
+    exit, or explicitly with flush()/shutdown().
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'sync'
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._wal = None
+        self._wal_lock = threading.Lock()
+        self._segments = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.app = app
+        self.mode = app.config.get('AUDIT_MODE', 'async')
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 1.0)
+        self.enqueue_timeout = app.config.get('AUDIT_ENQUEUE_TIMEOUT', 0.05)
+        self.fsync = app.config.get('AUDIT_WAL_FSYNC', False)
+        self.segment_events = app.config.get('AUDIT_WAL_SEGMENT_EVENTS', 10000)
+        self.write_attempts = max(1, app.config.get('AUDIT_WRITE_ATTEMPTS', 3))
+        self.dead_letter_path = app.config.get('AUDIT_DEAD_LETTER_PATH')
+        self._queue = queue.Queue(maxsize=app.config.get('AUDIT_QUEUE_SIZE', 10000))
+        self._stop = threading.Event()
+        self._thread = None
+        if self.mode == 'wal':
+            self._open_wal(app.config['AUDIT_WAL_DIR'])
+        app.extensions['audit_sink'] = self
+
+    # --- Write-ahead segments ---
+
+    def _open_wal(self, wal_dir):
+        os.makedirs(wal_dir, exist_ok=True)
+        self.wal_dir = wal_dir
+        # Segments left behind by processes that are gone: replay what they hadn't committed
+        replayed = 0
+        for name in sorted(os.listdir(wal_dir)):
+            if not name.endswith('.wal'):
+                continue
+            segment = _Segment.adopt(os.path.join(wal_dir, name), self.fsync)
+            if segment is None:
+                continue  # still written by a live process
+            self._segments.append(segment)
+            # Read it all first: the segment must know its length before the writer commits any of it
+            events = list(segment.uncommitted())
+            segment.release_if_done()
+            for position, event in events:
+                self._queue.put((event, (segment, position)))
+            replayed += len(events)
+        if replayed:
+            self.app.logger.info("Audit: replaying %d events from %s", replayed, wal_dir)
+            self._start()
+        self._wal = self._new_segment()
+
+    def _new_segment(self):
+        name = f"audit-{os.getpid()}-{uuid.uuid4().hex[:8]}.wal"
+        return _Segment.create(os.path.join(self.wal_dir, name), self.fsync)
+
+    def _wal_append(self, event):
+        """Write an event to the active segment; returns its (segment, position)"""
+        with self._wal_lock:
+            if self._wal.lines >= self.segment_events:
+                self._wal.seal()
+                self._segments.append(self._wal)
+                self._wal = self._new_segment()
+            return self._wal, self._wal.append(event)
+
+    def _wal_committed(self, positions):
+        with self._wal_lock:
+            segments = set()
+            for segment, position in positions:
+                segment.done.add(position)
+                segments.add(segment)
+            for segment in segments:
+                segment.advance()
+            self._segments = [segment for segment in self._segments if segment.file is not None]
+
+    # --- Request side ---
+
+    def record(self, user_id, action, action_type=None):
+        """Log an action by a user; in 'sync' mode the caller commits it"""
+        if self.mode == 'sync':
+            db.session.add(AuditLog(user_id=user_id, action=action, action_type=action_type))
+            return
+
+        event = {"user_id": user_id, "action": action, "action_type": action_type,
+                 "timestamp": datetime.utcnow().isoformat()}
+        self._start()
+        position = self._wal_append(event) if self._wal is not None else None
+        try:
+            self._queue.put((event, position), timeout=self.enqueue_timeout)
+        except queue.Full:
+            # Back-pressure: write it with the request rather than lose it
+            db.session.add(AuditLog(**self._row(event)))
+            if position is not None:
+                self._wal_committed([position])
+
+    def flush(self, timeout=10):
+        """Block until every queued event has been written (tests, shutdown); True if drained"""
+        deadline = time.monotonic() + timeout
+        while self._queue is not None and self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout=10):
+        """Flush and stop the writer thread"""
+        with self._lock:
+            thread = self._thread
+            self._stop.set()
+        if thread is not None:
+            thread.join(timeout)
+            self._thread = None
+        with self._wal_lock:
+            if self._wal is not None:
+                self._wal.seal()
+                self._segments.append(self._wal)
+                self._wal = None
+            # Whatever isn't committed yet stays on disk for the next start to replay
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    # --- Writer thread ---
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    @staticmethod
+    def _row(event):
+        return {
+            "user_id": event["user_id"],
+            "action": event["action"][:255],
+            "action_type": event.get("action_type"),
+            "timestamp": datetime.fromisoformat(event["timestamp"]),
+        }
+
+    def _take_batch(self, wait):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if wait else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _insert(self, batch):
+        with self.app.app_context():
+            db.session.execute(insert(AuditLog), [self._row(event) for event, _ in batch])
+            db.session.commit()
+
+    def _insert_one_by_one(self, batch):
+        """Write what the database accepts of a failing batch; returns the items written"""
+        written = []
+        for item in batch:
+            try:
+                self._insert([item])
+                written.append(item)
+            except Exception as e:
+                self._dead_letter(item[0], e)
+        return written
+
+    def _dead_letter(self, event, error):
+        self.app.logger.error("Audit event rejected by the database: %s (%s)", json.dumps(event), error)
+        if not self.dead_letter_path:
+            return
+        try:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"event": event, "error": str(error),
+                                    "failed_at": datetime.utcnow().isoformat()}) + "\n")
+        except OSError as e:
+            self.app.logger.error("Could not write to %s: %s", self.dead_letter_path, e)
+
+    def _run(self):
+        batch, failures = [], 0
+        while True:
+            stopping = self._stop.is_set()
+            if not batch:
+                batch = self._take_batch(wait=not stopping)
+            if batch:
+                try:
+                    self._insert(batch)
+                    written = batch
+                except Exception as e:
+                    failures += 1
+                    self.app.logger.error("Audit write failed (%d events, attempt %d of %d): %s",
+                                          len(batch), failures, self.write_attempts, e)
+                    if failures < self.write_attempts and not stopping:
+                        time.sleep(self.flush_interval)
+                        continue  # retry the same batch
+                    # Keep the writer moving: isolate the events that can't be written
+                    written = self._insert_one_by_one(batch)
+                failures = 0
+                # Rejected events keep their WAL position uncommitted, so a restart replays them
+                positions = [position for _, position in written if position is not None]
+                if positions:
+                    self._wal_committed(positions)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+            elif stopping:
+                return
+
+
+class _Segment:
+    """
+    One write-ahead file of audit events, owned by a single process.
+
+    Each process appends to its own segment (audit-<pid>-<id>.wal) and holds
+    an exclusive lock on it, so gunicorn workers sharing AUDIT_WAL_DIR never
+    write to or replay each other's files. Once the events at the start of
+    the segment are in the database their count is stored next to it
+    (<segment>.committed); a segment is rotated after AUDIT_WAL_SEGMENT_EVENTS
+    events and deleted as soon as it is sealed and fully committed. A process
+    starting up adopts the unlocked segments of processes that exited and
+    replays only the events past the committed count, so a crash repeats at
+    most the batch whose commit hadn't been recorded yet. Events committed
+    after one that was rejected are listed after the count, so only the
+    rejected ones are replayed.
+    """
+
+    def __init__(self, path, file, lines, committed, fsync):
+        self.path = path
+        self.file = file
+        self.lines = lines
+        self.committed = committed
+        self.done = set()
+        self.sealed = False
+        self.fsync = fsync
+
+    @classmethod
+    def create(cls, path, fsync):
+        file = open(path, 'a', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        return cls(path, file, 0, 0, fsync)
+
+    @classmethod
+    def adopt(cls, path, fsync):
+        """Open a segment left by an exited process (None while its owner still holds it)"""
+        file = open(path, 'r', encoding='utf-8')
+        if fcntl is not None:
+            try:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                file.close()
+                return None
+        committed, done = 0, set()
+        if os.path.exists(path + '.committed'):
+            with open(path + '.committed') as f:
+                values = f.read().split()
+            if values:
+                committed, done = int(values[0]), {int(v) for v in values[1:]}
+        segment = cls(path, file, 0, committed, fsync)
+        segment.done = done
+        segment.sealed = True
+        return segment
+
+    def uncommitted(self):
+        """(position, event) for every complete line past the committed count"""
+        self.file.seek(0)
+        for position, line in enumerate(self.file):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                break  # torn last line from a crash mid-write
+            self.lines = position + 1
+            if position >= self.committed and position not in self.done:
+                yield position, event
+
+    def append(self, event):
+        self.file.write(json.dumps(event) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.lines += 1
+        return self.lines - 1
+
+    def advance(self):
+        """Move the committed count over the events now in the database"""
+        committed = self.committed
+        while committed in self.done:
+            self.done.remove(committed)
+            committed += 1
+        self.committed = committed
+        if not self.release_if_done():
+            tmp = self.path + '.committed.tmp'
+            with open(tmp, 'w') as f:
+                f.write(' '.join(str(p) for p in [committed, *sorted(self.done)]))
+            os.replace(tmp, self.path + '.committed')
+
+    def seal(self):
+        """Stop writing to the segment; it goes away once everything in it is committed"""
+        self.sealed = True
+        self.release_if_done()
+
+    def release_if_done(self):
+        if not self.sealed or self.committed < self.lines or self.file is None:
+            return False
+        for path in (self.path + '.committed', self.path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.close()
+        return True
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()  # also drops the lock
+            self.file = None
+
+
+audit_sink = AuditSink()
+atexit.register(audit_sink.shutdown)
+
+
+def archive_audit_logs(before, archive_dir, batch_size=5000):
+    """
+    Move audit rows older than `before` out of the table into one gzipped
+    NDJSON file per month (audit-YYYY-MM.ndjson.gz, appended to on later
+    runs). Works oldest-first in batches of `batch_size` along the timestamp
+    index: each batch is written and closed before it is deleted, one short
+    transaction per batch. Returns the number of rows archived.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    archived = 0
+    while True:
+        # Archived rows are deleted, so each batch starts again from the oldest remaining
+        rows = db.session.query(
+            AuditLog.id, AuditLog.user_id, AuditLog.action, AuditLog.action_type, AuditLog.timestamp
+        ).filter(AuditLog.timestamp < before).order_by(AuditLog.timestamp, AuditLog.id).limit(batch_size).all()
+        if not rows:
+            return archived
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row.timestamp.strftime('%Y-%m'), []).append(row)
+        for month, month_rows in by_month.items():
+            with gzip.open(os.path.join(archive_dir, f"audit-{month}.ndjson.gz"), 'at', encoding='utf-8') as f:
+                for row in month_rows:
+                    f.write(json.dumps({
+                        "id": row.id, "user_id": row.user_id, "action": row.action,
+                        "action_type": row.action_type, "timestamp": row.timestamp.isoformat()
+                    }) + "\n")
+
+        db.session.execute(delete(AuditLog).where(AuditLog.id.in_([row.id for row in rows])))
+        db.session.commit()
+        archived += len(rows)
@@ -0,0 +1,96 @@
+"""
+Microbenchmark of the per-request cost of the role checks in middleware.py.
+
+Times a trivial view behind @jwt_required() + @editor_or_admin_required()
+inside a fresh request context per call, against the previous decorator
+(which verified the token a second time and printed the full claims dict)
+and against the bare view, and reports the auth overhead in microseconds.
+
+    python bench_auth.py --requests 20000
+"""
+import argparse
+import contextlib
+import logging
+import os
+import time
+from functools import wraps
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from flask import jsonify
+from flask_jwt_extended import create_access_token, get_jwt, jwt_required, verify_jwt_in_request
+
+from app import create_app
+from middleware import editor_or_admin_required
+
+
+def legacy_role_required(*roles):
+    """The role check as it was before single-pass verification"""
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            try:
+                verify_jwt_in_request()
+            except Exception as e:
+                return jsonify({"error": "Missing or invalid token", "details": str(e)}), 401
+            claims = get_jwt()
+            print(f"DEBUG: JWT Claims: {claims}")
+            user_role = claims.get('role')
+            if not user_role or user_role not in roles:
+                return jsonify({"msg": "Access strictly prohibited!"}), 403
+            return fn(*args, **kwargs)
+        return decorator
+    return wrapper
+
+
+def view():
+    return "ok"
+
+
+def run(app, fn, headers, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        with app.test_request_context('/api/posts', method='POST', headers=headers):
+            fn()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--sample-rate', type=float, default=None, help='AUTH_LOG_SAMPLE_RATE (default from config)')
+    args = parser.parse_args()
+
+    app = create_app()
+    if args.sample_rate is not None:
+        app.config['AUTH_LOG_SAMPLE_RATE'] = args.sample_rate
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={
+            'role': 'editor', 'username': 'editor', 'avatar_url': None
+        })
+    headers = {'Authorization': f'Bearer {token}'}
+
+    views = {
+        'bare view': view,
+        'before (verify twice + print)': jwt_required()(legacy_role_required('admin', 'editor')(view)),
+        'after (single pass + sampled log)': jwt_required()(editor_or_admin_required()(view)),
+    }
+
+    # Both versions write their log lines to /dev/null, so the benchmark
+    # measures formatting and write syscalls rather than the terminal
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for handler in logging.getLogger('auth').handlers:
+            handler.setStream(devnull)
+        for fn in views.values():
+            run(app, fn, headers, 500)  # warm up
+        results = {name: run(app, fn, headers, args.requests) for name, fn in views.items()}
+
+    baseline = results['bare view']
+    print(f"{args.requests} requests each, log sample rate {app.config['AUTH_LOG_SAMPLE_RATE']}")
+    for name, micros in results.items():
+        overhead = "" if name == 'bare view' else f"  (auth overhead {micros - baseline:7.1f} us)"
+        print(f"{name:36s} {micros:8.1f} us/request{overhead}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Login benchmark for the password hashing policy.
+
+First times a single verify() for a few hashing methods, then runs a login
+storm (--clients threads posting to /api/auth/login as fast as they can)
+while one more thread issues cheap GET /health requests, and reports login
+throughput and the /health latency (p50/p99) for each hashing pool size.
+
+    python bench_login.py --method pbkdf2:sha256:600000 --clients 16 --seconds 5
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app
+from config import Config
+from models import db, User
+from passwords import password_hasher
+
+METHODS = ['pbkdf2:sha256:100000', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000', 'scrypt:16384:8:1', 'scrypt:32768:8:1']
+
+
+def time_methods(repeat):
+    print("verify() cost per method")
+    for method in METHODS:
+        stored = generate_password_hash('secret', method=method)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            password_hasher._verify(stored, 'secret')
+        print(f"  {method:24s} {(time.perf_counter() - start) / repeat * 1000:8.1f} ms")
+
+
+def make_app(method, workers, clients):
+    # Threads need their own connections, which an in-memory SQLite database can't share
+    database = os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'blog.db')
+    Config.SQLALCHEMY_DATABASE_URI = f'sqlite:///{database}'
+    app = create_app()
+    app.config.update(AUDIT_MODE='async', PASSWORD_HASH_METHOD=method, PASSWORD_HASH_WORKERS=workers,
+                      PASSWORD_HASH_MAX_PENDING=clients, PASSWORD_HASH_WAIT=30)
+    password_hasher.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='reader', email='reader@example.com',
+                            password_hash=generate_password_hash('secret', method=method)))
+        db.session.commit()
+    return app
+
+
+def storm(app, clients, seconds):
+    stop = threading.Event()
+    logins, failures, health = [], [], []
+
+    def login():
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post('/api/auth/login', json={'username': 'reader', 'password': 'secret'})
+            (logins if response.status_code == 200 else failures).append(1)
+
+    def reads():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get('/health')
+            health.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=login) for _ in range(clients)] + [threading.Thread(target=reads)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    health.sort()
+    p99 = health[min(len(health) - 1, int(len(health) * 0.99))]
+    return len(logins) / seconds, len(failures), statistics.median(health), p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', default=Config.PASSWORD_HASH_METHOD)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, nargs='*', default=None,
+                        help='Hashing pool sizes to compare (default: 1, half the CPUs, all CPUs)')
+    parser.add_argument('--repeat', type=int, default=5, help='verify() calls per method when timing methods')
+    args = parser.parse_args()
+
+    time_methods(args.repeat)
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, max(1, cpus // 2), cpus})
+    print(f"\nlogin storm: {args.method}, {args.clients} clients, {args.seconds}s, {cpus} CPUs")
+    for count in workers:
+        app = make_app(args.method, count, args.clients)
+        rate, failed, p50, p99 = storm(app, args.clients, args.seconds)
+        print(f"  workers={count:<3d} {rate:7.1f} logins/s  ({failed} failed)   "
+              f"/health p50 {p50:6.2f} ms  p99 {p99:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
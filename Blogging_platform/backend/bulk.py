@@ -0,0 +1,266 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Post, Category, User
+from rendering import apply_rendering
+from slugs import MAX_SLUG_ATTEMPTS, generate_slug, save_with_unique_slug
+from audit import audit_sink
+from cache import response_cache
+import search
+
+# Only the first errors are reported in full; the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+# Written by the batch INSERT; the counters keep their defaults
+IMPORT_COLUMNS = (
+    'title', 'slug', 'content', 'excerpt', 'content_html', 'reading_time', 'published',
+    'image_url', 'user_id', 'category_id', 'created_at', 'updated_at'
+)
+
+
+class RowError(Exception):
+    """A line of an import that can't become a post"""
+
+
+def _decode(line):
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise RowError(f"Invalid UTF-8: {e}")
+
+
+def _parse(line):
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        raise RowError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise RowError("Each line must be a JSON object")
+
+    title, content = data.get('title'), data.get('content')
+    if not isinstance(title, str) or not title.strip() or not isinstance(content, str) or not content:
+        raise RowError("Title and content are required")
+    if len(title) > 200:
+        raise RowError("Title is longer than 200 characters")
+    slug = data.get('slug')
+    if slug is not None and not isinstance(slug, str):
+        raise RowError("slug must be a string")
+    base_slug = generate_slug(slug or title)
+    if not base_slug:
+        raise RowError("Title has no letters or digits to build a slug from")
+
+    created_at = data.get('created_at')
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise RowError("created_at must be an ISO 8601 timestamp")
+
+    category = data.get('category')
+    if category is not None and not isinstance(category, str):
+        raise RowError("category must be a category name")
+
+    published = data.get('published', False)
+    if not isinstance(published, bool):
+        raise RowError("published must be true or false")
+
+    image_url = data.get('image_url')
+    if image_url is not None and (not isinstance(image_url, str) or len(image_url) > 255):
+        raise RowError("image_url must be a URL of at most 255 characters")
+
+    return {
+        "title": title,
+        "content": content,
+        "base_slug": base_slug,
+        "category": category,
+        "published": published,
+        "image_url": image_url,
+        "created_at": created_at,
+    }
+
+
+class PostImporter:
+    """
+    Imports posts from NDJSON / JSON Lines, one object per line:
+
+        {"title": ..., "content": ..., "slug": ..., "category": "Design",
+         "published": true, "image_url": ..., "created_at": "2024-05-01T09:30:00"}
+
+    Only title and content are required; slug defaults to the title and
+    gets a -2, -3, ... suffix when taken. Lines are read lazily and written
+    `batch_size` at a time, one transaction per batch: slugs and categories
+    for a batch are resolved with a couple of IN queries, the posts go in
+    with one multi-row INSERT, and one audit row records the batch. Bad
+    lines are skipped and reported by line number.
+    """
+
+    def __init__(self, user_id, batch_size=500):
+        self.user_id = user_id
+        self.batch_size = max(1, batch_size)
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self._categories = {}
+
+    def run(self, lines):
+        batch = []
+        for number, line in enumerate(lines, start=1):
+            try:
+                if isinstance(line, bytes):
+                    line = _decode(line)
+                if not line.strip():
+                    continue
+                batch.append((number, _parse(line)))
+            except RowError as e:
+                self._error(number, e)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+        if self.imported:
+            response_cache.invalidate('feed')
+        return self.report()
+
+    def report(self):
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+    def _error(self, number, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": number, "error": str(error)})
+
+    def _resolve_categories(self, rows):
+        names = {row["category"] for _, row in rows if row["category"] is not None} - set(self._categories)
+        if names:
+            self._categories.update(
+                db.session.query(Category.name, Category.id).filter(Category.name.in_(names)).all()
+            )
+
+    def _taken_slugs(self, rows):
+        bases = {row["base_slug"] for _, row in rows}
+        taken = {slug for (slug,) in db.session.query(Post.slug).filter(Post.slug.in_(bases))}
+        # Suffixed variants only matter for the bases that are already taken
+        clashing = bases & taken
+        if clashing:
+            taken |= {slug for (slug,) in db.session.query(Post.slug).filter(
+                or_(*[Post.slug.like(f"{base}-%") for base in clashing])
+            )}
+        return taken
+
+    def _write(self, batch):
+        self._resolve_categories(batch)
+        taken = self._taken_slugs(batch)
+
+        now = datetime.utcnow()
+        posts = []
+        for number, row in batch:
+            category = row["category"]
+            if category is not None and category not in self._categories:
+                self._error(number, f"Unknown category: {category}")
+                continue
+            slug = next((
+                candidate for candidate in (
+                    row["base_slug"] if attempt == 1 else f"{row['base_slug']}-{attempt}"
+                    for attempt in range(1, MAX_SLUG_ATTEMPTS + 1)
+                ) if candidate not in taken
+            ), None)
+            if slug is None:
+                self._error(number, "A post with a similar title already exists")
+                continue
+            taken.add(slug)
+
+            post = Post(
+                title=row["title"],
+                content=row["content"],
+                slug=slug,
+                published=row["published"],
+                image_url=row["image_url"],
+                user_id=self.user_id,
+                category_id=self._categories.get(category)
+            )
+            post.created_at = post.updated_at = row["created_at"] or now
+            apply_rendering(post)
+            posts.append((number, post, row["base_slug"]))
+
+        if not posts:
+            return
+        try:
+            # Core executemany: one multi-row INSERT ... RETURNING per batch (the
+            # ORM would fall back to a statement per row on SQLite)
+            ids = dict(db.session.execute(
+                Post.__table__.insert().returning(Post.slug, Post.id),
+                [{column: getattr(post, column) for column in IMPORT_COLUMNS} for _, post, _ in posts]
+            ).all())
+            for _, post, _ in posts:
+                post.id = ids[post.slug]
+        except IntegrityError:
+            # A slug was taken concurrently: redo this batch post by post
+            db.session.rollback()
+            posts = self._write_one_by_one(posts)
+            if not posts:
+                return
+
+        for _, post, _ in posts:
+            search.index_post(post)
+        audit_sink.record(self.user_id, f"Imported {len(posts)} posts", "post_create")
+        db.session.commit()
+        # Keep memory flat over long imports
+        db.session.expunge_all()
+        self.imported += len(posts)
+
+    def _write_one_by_one(self, posts):
+        written = []
+        for number, post, base_slug in posts:
+            try:
+                saved = save_with_unique_slug(post, base_slug, savepoint=True)
+            except IntegrityError as e:
+                # Anything but a slug clash (e.g. the author or category was deleted meanwhile)
+                self._error(number, f"Rejected by the database: {str(e.orig).splitlines()[0]}")
+                continue
+            if saved:
+                written.append((number, post, base_slug))
+            else:
+                self._error(number, "A post with a similar title already exists")
+        return written
+
+
+def import_posts(lines, user_id, batch_size=500):
+    """Import posts from an iterable of NDJSON lines; returns the report"""
+    return PostImporter(user_id, batch_size).run(lines)
+
+
+def export_posts(user_id=None, batch_size=1000):
+    """
+    Yield posts as NDJSON lines in the format import_posts() reads, oldest
+    first. Rows stream from a server-side cursor `batch_size` at a time,
+    so memory stays flat however many posts there are.
+    """
+    query = db.session.query(
+        Post.id, Post.title, Post.slug, Post.content, Post.published, Post.image_url,
+        Post.created_at, Category.name, User.username
+    ).join(User, User.id == Post.user_id).outerjoin(Category, Category.id == Post.category_id)
+    if user_id is not None:
+        query = query.filter(Post.user_id == user_id)
+
+    for row in query.order_by(Post.id).yield_per(batch_size):
+        yield json.dumps({
+            "id": row.id,
+            "title": row.title,
+            "slug": row.slug,
+            "content": row.content,
+            "category": row.name,
+            "published": bool(row.published),
+            "image_url": row.image_url,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "author": row.username
+        }) + "\n"
@@ -0,0 +1,171 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, make_response, Response
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry TTL"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value, expires = self._data.get(key, (0, None))
+            value = int(value) + 1
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """
+    Backend for anything that speaks the Redis GET/SET EX/INCR subset:
+    a redis-py client, or a local stand-in with the same methods in tests.
+    """
+
+    def __init__(self, client, prefix='blog:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, prefix='blog:'):
+        import redis  # optional dependency, only needed for this backend
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.client.set(self.prefix + key, value, ex=int(ttl))
+        else:
+            self.client.set(self.prefix + key, value)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+
+class ResponseCache:
+    """
+    Caches public JSON responses and invalidates them by tag.
+
+    Every cached view declares tags such as 'feed' or 'post:{slug}'; the
+    cache key embeds the current version of each tag, so invalidate('feed')
+    simply bumps a counter and every dependent entry becomes unreachable
+    (and ages out of the LRU/TTL). Responses carry an ETag derived from the
+    body, so clients can revalidate with If-None-Match and get a 304.
+
+    Writes that only move the like/comment counters invalidate the post page
+    but not 'feed', whose counts catch up within RESPONSE_CACHE_TTL; writes
+    that add, remove or change posts invalidate 'feed' at once.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        kind = app.config.get('RESPONSE_CACHE_BACKEND', 'memory')
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+        if kind == 'redis':
+            self.backend = RedisBackend.from_url(app.config['RESPONSE_CACHE_URL'])
+        elif kind == 'memory':
+            self.backend = MemoryBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+        else:
+            self.backend = None
+        app.extensions['response_cache'] = self
+
+    # --- Tags ---
+
+    def _version(self, tag):
+        value = self.backend.get(f"tag:{tag}")
+        return int(value) if value is not None else 0
+
+    def invalidate(self, *tags):
+        if self.backend is None:
+            return
+        for tag in tags:
+            self.backend.incr(f"tag:{tag}")
+
+    # --- Entries ---
+
+    @staticmethod
+    def _pack(status, etag, body):
+        return f"{status}\n{etag}\n".encode() + body
+
+    @staticmethod
+    def _unpack(value):
+        status, etag, body = value.split(b"\n", 2)
+        return int(status), etag.decode(), body
+
+    def cached(self, *tags, ttl=None):
+        """
+        Decorator for public GET views. Tags may reference view arguments,
+        e.g. @cache.cached('comments:{post_id}').
+        """
+        def wrapper(fn):
+            @wraps(fn)
+            def decorator(*args, **kwargs):
+                if self.backend is None:
+                    return fn(*args, **kwargs)
+
+                resolved = [tag.format(**kwargs) for tag in tags]
+                versions = ",".join(f"{tag}={self._version(tag)}" for tag in resolved)
+                key = f"resp:{request.full_path}|{versions}"
+
+                hit = self.backend.get(key)
+                if hit is not None:
+                    status, etag, body = self._unpack(hit)
+                    response = Response(body, status=status, mimetype='application/json')
+                    response.set_etag(etag)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response.make_conditional(request)
+
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = response.get_data()
+                etag = hashlib.sha1(body).hexdigest()
+                self.backend.set(key, self._pack(response.status_code, etag, body), ttl or self.ttl)
+                response.set_etag(etag)
+                response.headers['X-Cache'] = 'MISS'
+                return response.make_conditional(request)
+            return decorator
+        return wrapper
+
+
+response_cache = ResponseCache()
@@ -11,14 +11,92 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool (ignored for in-memory SQLite): steady connections, extra ones
+    # allowed under bursts, seconds to wait for one, and seconds before a connection
+    # is replaced (whole seconds: Flask-SQLAlchemy coerces pool_timeout to int).
+    # Pre-ping swaps out connections the database dropped (e.g. failover).
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # Compiled SQL cache entries, and runs before a statement is prepared server-side (psycopg 3 only)
+    DB_QUERY_CACHE_SIZE = int(os.environ.get('DB_QUERY_CACHE_SIZE', 1200))
+    DB_PREPARE_THRESHOLD = int(os.environ.get('DB_PREPARE_THRESHOLD', 5))
+    # SQLALCHEMY_ENGINE_OPTIONS is built from these by create_app(), once the final URI is known
+    # Statements at least this slow are counted, logged and listed by /api/admin/db-metrics
+    DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 200))
+    DB_SLOW_QUERY_LOG = int(os.environ.get('DB_SLOW_QUERY_LOG', 50))
     
     # JWT
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET', 'dev-jwt-secret')
+    # Password hashing: any werkzeug method ('pbkdf2:sha256' uses werkzeug's current iteration
+    # count, 'scrypt:32768:8:1') or 'argon2[:time:memory_kib:parallelism]' with argon2-cffi;
+    # hashes with another scheme or weaker parameters are upgraded at login, never downgraded
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 5.0))
+    
+    # Fraction of allowed role checks written to the 'auth' log (denials are always logged)
+    AUTH_LOG_SAMPLE_RATE = float(os.environ.get('AUTH_LOG_SAMPLE_RATE', 0.01))
     
     # Cloudinary
     CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME')
     CLOUDINARY_API_KEY = os.environ.get('CLOUDINARY_API_KEY')
     CLOUDINARY_API_SECRET = os.environ.get('CLOUDINARY_API_SECRET')
     
+    # Image uploads run on a background worker pool: 'cloudinary' or 'local'
+    UPLOAD_BACKEND = os.environ.get('UPLOAD_BACKEND', 'cloudinary')
+    UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', 4))
+    UPLOAD_LOCAL_DIR = os.environ.get('UPLOAD_LOCAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    UPLOAD_LOCAL_URL = os.environ.get('UPLOAD_LOCAL_URL', '/uploads')
+    UPLOAD_TMP_DIR = os.environ.get('UPLOAD_TMP_DIR')
+    
+    # Response cache for public read endpoints: 'memory', 'redis' or 'none'
+    RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL', 60))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    
+    # Audit log writes: 'sync' (in the request transaction), 'async' (batched by a
+    # background writer) or 'wal' (batched, with a replayable write-ahead file)
+    AUDIT_MODE = os.environ.get('AUDIT_MODE', 'async')
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+    # Each process writes its own segment files here; rotated every AUDIT_WAL_SEGMENT_EVENTS events
+    AUDIT_WAL_DIR = os.environ.get('AUDIT_WAL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_wal'))
+    AUDIT_WAL_SEGMENT_EVENTS = int(os.environ.get('AUDIT_WAL_SEGMENT_EVENTS', 10000))
+    AUDIT_WAL_FSYNC = os.environ.get('AUDIT_WAL_FSYNC', 'false').lower() == 'true'
+    # A batch failing this many times is written row by row; rows the database rejects go to the dead-letter file
+    AUDIT_WRITE_ATTEMPTS = int(os.environ.get('AUDIT_WRITE_ATTEMPTS', 3))
+    AUDIT_DEAD_LETTER_PATH = os.environ.get('AUDIT_DEAD_LETTER_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_dead_letter.ndjson'))
+    # `flask archive-audit-logs` moves older rows into monthly gzipped NDJSON files here
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 90))
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_archive'))
+    
+    # Trending ranking: engagement weights, score half-life (hours) and how often
+    # the decay job runs (seconds, 0 to run it only via `flask decay-trending`)
+    TRENDING_LIKE_WEIGHT = float(os.environ.get('TRENDING_LIKE_WEIGHT', 1.0))
+    TRENDING_COMMENT_WEIGHT = float(os.environ.get('TRENDING_COMMENT_WEIGHT', 2.0))
+    TRENDING_HALF_LIFE = float(os.environ.get('TRENDING_HALF_LIFE', 6.0))
+    TRENDING_DECAY_INTERVAL = int(os.environ.get('TRENDING_DECAY_INTERVAL', 300))
+    TRENDING_MIN_SCORE = float(os.environ.get('TRENDING_MIN_SCORE', 0.01))
+    
+    # Posts remembered in the in-process slug -> id map used by post views
+    SLUG_CACHE_SIZE = int(os.environ.get('SLUG_CACHE_SIZE', 10000))
+    
+    # Per-user liked-post sets behind `liked_by_me` on feeds: users kept, posts
+    # remembered per user, and seconds before an entry is re-read from the database
+    LIKED_CACHE_USERS = int(os.environ.get('LIKED_CACHE_USERS', 10000))
+    LIKED_CACHE_MAX_KNOWN = int(os.environ.get('LIKED_CACHE_MAX_KNOWN', 5000))
+    LIKED_CACHE_TTL = int(os.environ.get('LIKED_CACHE_TTL', 60))
+    
+    # Bulk import/export: posts per import transaction (also the most a request
+    # may ask for) and rows fetched per round trip while streaming an export
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    
     # CORS
     FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
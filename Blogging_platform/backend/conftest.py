@@ -0,0 +1,112 @@
+"""
+Shared fixtures for the backend tests.
+
+Every app gets its database from SQLALCHEMY_DATABASE_URI set on the app
+itself (a fresh in-memory SQLite database unless a test asks for another),
+so nothing depends on DATABASE_URL or on which test module ran first.
+Seed data: an editor, a reader, five more editors and 30 published posts
+spread round-robin over the six editors, each liked by the reader.
+"""
+from contextlib import contextmanager
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app
+from audit import audit_sink
+from models import db, User, Post, Like
+
+
+def seed(app):
+    with app.app_context():
+        db.create_all()
+        editor = User(username='editor', email='editor@example.com', password_hash='x', role='editor')
+        reader = User(username='reader', email='reader@example.com', password_hash='x')
+        db.session.add_all([editor, reader])
+        db.session.flush()
+
+        # Several authors so listings actually have distinct users to resolve
+        authors = [editor] + [
+            User(username=f'author{i}', email=f'author{i}@example.com', password_hash='x', role='editor')
+            for i in range(5)
+        ]
+        db.session.add_all(authors[1:])
+        db.session.flush()
+
+        for i in range(30):
+            post = Post(title=f'Post {i}', slug=f'post-{i}', content='x' * 500, published=True,
+                        user_id=authors[i % len(authors)].id)
+            db.session.add(post)
+            db.session.flush()
+            db.session.add(Like(user_id=reader.id, post_id=post.id))
+        db.session.commit()
+
+        return {
+            'editor': create_access_token(identity=str(editor.id), additional_claims={'role': 'editor'}),
+            'reader': create_access_token(identity=str(reader.id), additional_claims={'role': 'reader'}),
+        }
+
+
+@pytest.fixture
+def make_app():
+    """
+    make_app(**config) -> (app, tokens) for a seeded app; `config` overrides
+    the test defaults, e.g. a file database for tests with background writers.
+    Audit rows default to the request transaction so statement counts are deterministic.
+    """
+    def factory(**config):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'AUDIT_MODE': 'sync',
+            'TRENDING_DECAY_INTERVAL': 0,
+            **config
+        })
+        return app, seed(app)
+
+    yield factory
+    # Stop a background audit writer so it can't outlive its database
+    audit_sink.shutdown()
+
+
+@pytest.fixture
+def seeded(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def app(seeded):
+    return seeded[0]
+
+
+@pytest.fixture
+def tokens(seeded):
+    return seeded[1]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@contextmanager
+def _count_queries(app):
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def count_queries():
+    """`with count_queries(app) as statements:` collects the SQL the app runs inside the block"""
+    return _count_queries
@@ -0,0 +1,48 @@
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from models import db, Post, Like, Comment
+
+
+def bump(post_id, counter, delta):
+    """
+    Atomically add `delta` to a denormalized Post counter ('like_count' or 'comment_count').
+    Runs as a single UPDATE ... SET x = x + delta, so concurrent requests never lose updates.
+    """
+    column = getattr(Post, counter)
+    db.session.execute(
+        update(Post).where(Post.id == post_id).values({column: column + delta})
+    )
+
+
+def reconcile_counters(batch_size=1000):
+    """
+    Recompute like_count/comment_count from the likes and comments tables and
+    fix any rows that drifted. Works through posts in id ranges of
+    `batch_size`, one short transaction per range, and returns the number of
+    posts repaired.
+    """
+    likes = (select(func.count(Like.id))
+             .where(Like.post_id == Post.id)
+             .scalar_subquery())
+    # Approved comments that are shown: replies under a flagged parent are hidden with it
+    parent = aliased(Comment)
+    comments = (select(func.count(Comment.id))
+                .outerjoin(parent, parent.id == Comment.parent_id)
+                .where(Comment.post_id == Post.id, Comment.is_approved.is_(True),
+                       or_(Comment.parent_id.is_(None), parent.is_approved.is_(True)))
+                .scalar_subquery())
+
+    max_id = db.session.query(func.max(Post.id)).scalar() or 0
+    repaired = 0
+    for start in range(0, max_id + 1, batch_size):
+        result = db.session.execute(
+            update(Post)
+            .where(Post.id >= start, Post.id < start + batch_size)
+            .where((Post.like_count != likes) | (Post.comment_count != comments))
+            .values(like_count=likes, comment_count=comments)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        repaired += result.rowcount
+    return repaired
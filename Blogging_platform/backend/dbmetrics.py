@@ -0,0 +1,207 @@
+"""
+Connection pool settings and database metrics.
+
+Library/backend/app/dbmetrics.py started from the same code. The two backends are deployed
+separately (Library alone on Vercel) and share no package, so each keeps
+and tests its own version; the module avoids app-specific imports so
+fixes are easy to carry across.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger('db')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that reports how long each checkout waited for a connection (and timeouts)"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            db_metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        db_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def is_memory_sqlite(uri):
+    return uri is None or uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+
+def engine_options(uri, pool_size=10, max_overflow=20, pool_timeout=10, pool_recycle=1800,
+                   pre_ping=True, query_cache_size=1200, prepare_threshold=5):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for `uri`.
+
+    Every engine gets pre-ping (a dead connection left behind by a failover
+    is replaced on checkout instead of failing the request) and a compiled
+    statement cache of `query_cache_size` entries. Pooled databases also get
+    a bounded pool: pool_size connections plus at most max_overflow extra
+    under bursts, callers waiting up to pool_timeout seconds, and connections
+    recycled after pool_recycle seconds. With the psycopg 3 driver
+    (postgresql+psycopg://) statements run `prepare_threshold` times are
+    prepared server-side; psycopg2 has no such option.
+    """
+    options = {'pool_pre_ping': pre_ping, 'query_cache_size': query_cache_size}
+    if is_memory_sqlite(uri):
+        # One shared connection (Flask-SQLAlchemy picks StaticPool); nothing to size
+        return options
+
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+    )
+    if uri.startswith('postgresql+psycopg:'):
+        options['connect_args'] = {'prepare_threshold': prepare_threshold}
+    return options
+
+
+def engine_options_for(config):
+    """engine_options() for config['SQLALCHEMY_DATABASE_URI'] using the DB_* keys of an app config"""
+    return engine_options(
+        config.get('SQLALCHEMY_DATABASE_URI'),
+        pool_size=config.get('DB_POOL_SIZE', 10),
+        max_overflow=config.get('DB_MAX_OVERFLOW', 20),
+        pool_timeout=config.get('DB_POOL_TIMEOUT', 10),
+        pool_recycle=config.get('DB_POOL_RECYCLE', 1800),
+        pre_ping=config.get('DB_POOL_PRE_PING', True),
+        query_cache_size=config.get('DB_QUERY_CACHE_SIZE', 1200),
+        prepare_threshold=config.get('DB_PREPARE_THRESHOLD', 5)
+    )
+
+
+class DBMetrics:
+    """
+    Connection pool and query counters for the metrics endpoint: pool
+    checkouts and how long they waited, new/invalidated connections, and
+    statements slower than DB_SLOW_QUERY_MS (the last DB_SLOW_QUERY_LOG of
+    them are kept, and each is logged to the 'db' logger).
+    """
+
+    def __init__(self, app=None):
+        self.slow_ms = 200
+        self._lock = threading.Lock()
+        self._reset(50)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Call after db.init_app(app)"""
+        self.slow_ms = app.config.get('DB_SLOW_QUERY_MS', 200)
+        self._reset(app.config.get('DB_SLOW_QUERY_LOG', 50))
+        with app.app_context():
+            engine = app.extensions['sqlalchemy'].engine
+        if not event.contains(engine, 'before_cursor_execute', self._before_execute):
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_execute)
+            event.listen(engine, 'handle_error', self._on_error)
+            event.listen(engine, 'checkout', self._on_checkout)
+            event.listen(engine, 'connect', self._on_connect)
+            event.listen(engine, 'invalidate', self._on_invalidate)
+        app.extensions['db_metrics'] = self
+
+    def _reset(self, slow_log_size):
+        with self._lock:
+            self.counters = {
+                "checkouts": 0, "checkout_waits": 0, "checkout_timeouts": 0, "checkout_wait_ms_total": 0.0,
+                "checkout_wait_ms_max": 0.0, "connects": 0, "invalidations": 0,
+                "queries": 0, "query_errors": 0, "slow_queries": 0
+            }
+            self.slow = deque(maxlen=slow_log_size)
+
+    # --- Pool ---
+
+    def record_wait(self, seconds, timed_out=False):
+        waited = seconds * 1000
+        with self._lock:
+            self.counters["checkout_waits"] += 1
+            if timed_out:
+                self.counters["checkout_timeouts"] += 1
+            self.counters["checkout_wait_ms_total"] += waited
+            self.counters["checkout_wait_ms_max"] = max(self.counters["checkout_wait_ms_max"], waited)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.counters["checkouts"] += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.counters["connects"] += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.counters["invalidations"] += 1
+
+    # --- Queries ---
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info['query_start'].pop()) * 1000
+        slow = elapsed >= self.slow_ms
+        with self._lock:
+            self.counters["queries"] += 1
+            if slow:
+                self.counters["slow_queries"] += 1
+                self.slow.append({
+                    "statement": statement[:500],
+                    "duration_ms": round(elapsed, 2),
+                    "at": datetime.utcnow().isoformat()
+                })
+        if slow:
+            logger.warning(json.dumps({"event": "slow_query", "duration_ms": round(elapsed, 2), "statement": statement[:500]}))
+
+    def _on_error(self, context):
+        # A failed statement never reaches after_cursor_execute; drop its start time
+        if context.is_pre_ping or context.connection is None or context.execution_context is None:
+            return
+        starts = context.connection.info.get('query_start')
+        if starts:
+            starts.pop()
+            with self._lock:
+                self.counters["query_errors"] += 1
+
+    # --- Reading ---
+
+    def snapshot(self, engine):
+        """Counters plus the pool's current state"""
+        pool = engine.pool
+        state = {"class": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            state.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=max(pool.overflow(), 0),
+                max_overflow=pool._max_overflow,
+                timeout=pool.timeout()
+            )
+        with self._lock:
+            counters = dict(self.counters)
+            slow = list(self.slow)
+        waits = counters.pop("checkout_waits")
+        counters["checkout_wait_ms_avg"] = round(counters["checkout_wait_ms_total"] / waits, 3) if waits else 0.0
+        counters["checkout_wait_ms_total"] = round(counters["checkout_wait_ms_total"], 3)
+        counters["checkout_wait_ms_max"] = round(counters["checkout_wait_ms_max"], 3)
+        return {
+            "pool": state,
+            "counters": counters,
+            "slow_query_ms": self.slow_ms,
+            "recent_slow_queries": slow[::-1]
+        }
+
+
+db_metrics = DBMetrics()
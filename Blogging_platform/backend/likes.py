@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from models import db, Like
+
+
+class LikedCache:
+    """
+    Per-user LRU of which posts a user has liked.
+
+    Each entry remembers, for the post ids looked at so far, which ones the
+    user liked; liked_among() answers from it and fetches only the unknown
+    ids with one `post_id IN (...)` query. toggle_like() keeps the entry in
+    step through set_liked(). Entries expire after LIKED_CACHE_TTL seconds
+    so likes made through another worker show up, and an entry that knows
+    about more than LIKED_CACHE_MAX_KNOWN posts is started afresh.
+    """
+
+    def __init__(self, app=None):
+        self.max_users = 10000
+        self.max_known = 5000
+        self.ttl = 60
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_users = app.config.get('LIKED_CACHE_USERS', 10000)
+        self.max_known = app.config.get('LIKED_CACHE_MAX_KNOWN', 5000)
+        self.ttl = app.config.get('LIKED_CACHE_TTL', 60)
+        self.clear()
+        app.extensions['liked_cache'] = self
+
+    def _entry(self, user_id):
+        """(liked, known) sets for a user, creating a fresh entry if needed; call with the lock held"""
+        entry = self._data.get(user_id)
+        if entry is None or entry[2] < time.monotonic() or len(entry[1]) > self.max_known:
+            entry = (set(), set(), time.monotonic() + self.ttl)
+            self._data[user_id] = entry
+            while len(self._data) > self.max_users:
+                self._data.popitem(last=False)
+        self._data.move_to_end(user_id)
+        return entry
+
+    def liked_among(self, user_id, post_ids):
+        """The subset of `post_ids` the user has liked"""
+        post_ids = set(post_ids)
+        with self._lock:
+            liked, known, _ = self._entry(user_id)
+            missing = post_ids - known
+
+        if missing:
+            found = {post_id for (post_id,) in db.session.query(Like.post_id).filter(
+                Like.user_id == user_id, Like.post_id.in_(missing)
+            )}
+            with self._lock:
+                liked, known, _ = self._entry(user_id)
+                liked |= found
+                known |= missing
+
+        with self._lock:
+            return post_ids & liked
+
+    def set_liked(self, user_id, post_id, is_liked):
+        with self._lock:
+            liked, known, _ = self._entry(user_id)
+            known.add(post_id)
+            if is_liked:
+                liked.add(post_id)
+            else:
+                liked.discard(post_id)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+liked_cache = LikedCache()
+
+
+def annotate_liked(list_key):
+    """
+    Decorator for public post listings: for a signed-in reader, add
+    `liked_by_me` to every item in response[list_key]. Goes outside
+    @response_cache.cached, so the cached body stays shared between users
+    and only this cheap per-user step runs on every request.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            response = current_app.make_response(fn(*args, **kwargs))
+            try:
+                verify_jwt_in_request(optional=True)
+                identity = get_jwt_identity()
+            except Exception:
+                identity = None
+            if identity is None or response.status_code != 200:
+                return response
+
+            data = response.get_json()
+            items = data.get(list_key, [])
+            liked = liked_cache.liked_among(int(identity), [item["id"] for item in items])
+            for item in items:
+                item["liked_by_me"] = item["id"] in liked
+
+            body = current_app.json.dumps(data).encode()
+            response.set_data(body)
+            response.set_etag(hashlib.sha1(body).hexdigest())
+            response.headers['Vary'] = 'Authorization'
+            return response.make_conditional(request)
+        return decorator
+    return wrapper
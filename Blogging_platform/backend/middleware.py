@@ -1,6 +1,45 @@
+import json
+import logging
+import random
 from functools import wraps
 from flask_jwt_extended import get_jwt, verify_jwt_in_request
-from flask import jsonify
+from flask import jsonify, g, request, current_app
+
+logger = logging.getLogger('auth')
+
+def current_claims():
+    """
+    Claims of the verified token for this request, stored on g.
+    The token is verified at most once per request: when @jwt_required()
+    already ran, its result is reused instead of decoding the JWT again.
+    """
+    if 'jwt_claims' not in g:
+        try:
+            g.jwt_claims = get_jwt()
+        except RuntimeError:
+            # Not verified yet (no @jwt_required() on this view)
+            verify_jwt_in_request()
+            g.jwt_claims = get_jwt()
+    return g.jwt_claims
+
+def log_auth(outcome, claims, required):
+    """
+    One JSON line per auth decision. Denials are always logged, allowed
+    requests only at AUTH_LOG_SAMPLE_RATE (0 disables, 1 logs everything).
+    """
+    if outcome == 'allowed' and random.random() >= current_app.config.get('AUTH_LOG_SAMPLE_RATE', 0.01):
+        return
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    logger.info(json.dumps({
+        "event": "auth",
+        "outcome": outcome,
+        "user_id": claims.get('sub'),
+        "role": claims.get('role'),
+        "required": list(required),
+        "method": request.method,
+        "path": request.path
+    }))
 
 def role_required(*roles):
     """
@@ -11,20 +50,20 @@ def role_required(*roles):
         @wraps(fn)
         def decorator(*args, **kwargs):
             try:
-                verify_jwt_in_request()
+                claims = current_claims()
             except Exception as e:
+                log_auth('invalid_token', {}, roles)
                 return jsonify({"error": "Missing or invalid token", "details": str(e)}), 401
-                
-            claims = get_jwt()
-            print(f"DEBUG: JWT Claims: {claims}") # Server side log
-            
+
             user_role = claims.get('role')
             if not user_role or user_role not in roles:
+                log_auth('forbidden', claims, roles)
                 return jsonify({
                     "msg": f"Access strictly prohibited! Required role(s): {', '.join(roles)}",
                     "your_role": user_role
                 }), 403
-                
+
+            log_auth('allowed', claims, roles)
             return fn(*args, **kwargs)
         return decorator
     return wrapper
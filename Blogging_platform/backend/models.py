@@ -27,14 +27,27 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     slug = db.Column(db.String(200), unique=True, nullable=False)
-    content = db.Column(db.Text, nullable=False)
+    # The body is only loaded when accessed (or undefer()ed); listings use the columns below
+    content = db.deferred(db.Column(db.Text, nullable=False))
+    
+    # Derived from content at write time by rendering.apply_rendering()
+    excerpt = db.Column(db.Text, nullable=True)
+    content_html = db.deferred(db.Column(db.Text, nullable=True))
+    reading_time = db.Column(db.Integer, nullable=True)
     
     # For Cloudinary uploaded media
     image_url = db.Column(db.String(255), nullable=True)
+    # None (no image), 'pending' while the background upload runs, 'ready' or 'failed'
+    image_status = db.Column(db.String(20), nullable=True)
     
     # Draft vs Published control
     published = db.Column(db.Boolean, default=False)
     
+    # Denormalized engagement counters, kept in sync by counters.bump()
+    # (comment_count only counts approved comments)
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -45,6 +58,9 @@ class Post(db.Model):
     # Relationships
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('Like', backref='post', lazy=True, cascade='all, delete-orphan')
+    
+    # Supports the keyset-paginated public feed (published, newest first)
+    __table_args__ = (db.Index('ix_posts_published_created_id', 'published', 'created_at', 'id'),)
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -64,6 +80,17 @@ class Comment(db.Model):
     # Foreign Keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    
+    # Replies point at a top-level comment (threads are one level deep); NULL for top-level comments
+    parent_id = db.Column(db.Integer, db.ForeignKey('comments.id', ondelete='CASCADE'), nullable=True)
+    replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]),
+                              lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+    
+    # Keyset pages of a post's top-level comments, and of the replies in a thread
+    __table_args__ = (
+        db.Index('ix_comments_post_approved_parent_created', 'post_id', 'is_approved', 'parent_id', 'created_at', 'id'),
+        db.Index('ix_comments_parent_approved_created', 'parent_id', 'is_approved', 'created_at', 'id'),
+    )
 
 class Like(db.Model):
     __tablename__ = 'likes'
@@ -77,10 +104,34 @@ class Like(db.Model):
     # Ensure one like per user per post
     __table_args__ = (db.UniqueConstraint('user_id', 'post_id', name='_user_post_uc'),)
 
+class PostTrending(db.Model):
+    """Time-decayed engagement score per post, maintained by trending.py"""
+    __tablename__ = 'post_trending'
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (db.Index('ix_post_trending_score', 'score'),)
+
+class TrendingState(db.Model):
+    """Single row recording when scores were last decayed, so only one worker applies each decay"""
+    __tablename__ = 'trending_state'
+    id = db.Column(db.Integer, primary_key=True)
+    decayed_at = db.Column(db.DateTime, nullable=False)
+
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     action = db.Column(db.String(255), nullable=False)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # Machine-readable kind of action ('login', 'post_like', ...), see audit.ACTION_TYPES
+    action_type = db.Column(db.String(30), nullable=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     user = db.relationship('User', backref='audit_logs')
+    
+    # The admin audit view seeks newest-first, optionally narrowed by user or action type;
+    # rows older than the retention window are archived and deleted in timestamp order
+    __table_args__ = (
+        db.Index('ix_audit_logs_timestamp_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_user_timestamp_id', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_audit_logs_type_timestamp_id', 'action_type', 'timestamp', 'id'),
+    )
@@ -0,0 +1,142 @@
+"""
+Password hashing policy and the bounded pool it runs on.
+
+Library/backend/app/passwords.py started from the same code. The two backends are deployed
+separately (Library alone on Vercel) and share no package, so each keeps
+and tests its own version; the module avoids app-specific imports so
+fixes are easy to carry across.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already waiting for a worker"""
+
+
+class PasswordHasher:
+    """
+    Password hashing policy plus a bounded pool to run it on.
+
+    PASSWORD_HASH_METHOD is any werkzeug method string, e.g. 'pbkdf2:sha256'
+    or 'scrypt:32768:8:1', or 'argon2' / 'argon2:<time_cost>:<memory_cost_kib>:<parallelism>'
+    when argon2-cffi is installed; unset means werkzeug's default method.
+    Parameters left out follow werkzeug's current defaults, so upgrading
+    werkzeug raises them. verify() reports when a stored hash should be
+    replaced on a successful login: when it uses another scheme than the
+    configured one (a deliberate switch), or the same scheme with weaker
+    parameters. A hash stronger than the policy is never downgraded.
+
+    Hashing runs on PASSWORD_HASH_WORKERS threads (hashlib's pbkdf2 and
+    scrypt release the GIL), so at most that many cores are busy hashing
+    while other requests keep being served. At most PASSWORD_HASH_MAX_PENDING
+    hashes may be running or queued; beyond that, callers wait up to
+    PASSWORD_HASH_WAIT seconds for a slot and then get HashingBusy.
+    """
+
+    def __init__(self, app=None):
+        self.method = None
+        self._target = None
+        self._pool = None
+        self._slots = None
+        self.wait = 5.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD')
+        self._target = None
+        workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(app.config.get('PASSWORD_HASH_MAX_PENDING', workers * 8))
+        self.wait = app.config.get('PASSWORD_HASH_WAIT', 5.0)
+        app.extensions['password_hasher'] = self
+
+    # --- Policy ---
+
+    def _is_argon2(self):
+        return bool(self.method) and self.method.startswith('argon2')
+
+    def _argon2(self):
+        from argon2 import PasswordHasher as Argon2Hasher  # optional dependency, only for 'argon2'
+        params = [int(p) for p in self.method.split(':')[1:]]
+        return Argon2Hasher(*params) if params else Argon2Hasher()
+
+    def _hash(self, password):
+        if self._is_argon2():
+            return self._argon2().hash(password)
+        if self.method:
+            return generate_password_hash(password, method=self.method)
+        return generate_password_hash(password)
+
+    def _verify(self, stored_hash, password):
+        if stored_hash.startswith('$argon2'):
+            from argon2.exceptions import VerificationError, InvalidHashError
+            try:
+                return self._argon2().verify(stored_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        return check_password_hash(stored_hash, password)
+
+    @staticmethod
+    def _parse(method):
+        """'pbkdf2:sha256:600000' -> (('pbkdf2', 'sha256'), (600000,)); 'scrypt:32768:8:1' -> (('scrypt',), (32768, 8, 1))"""
+        parts = method.split(':')
+        if parts[0] == 'pbkdf2' and len(parts) == 3 and parts[2].isdigit():
+            return tuple(parts[:2]), (int(parts[2]),)
+        if parts[0] == 'scrypt' and len(parts) == 4 and all(p.isdigit() for p in parts[1:]):
+            return (parts[0],), tuple(int(p) for p in parts[1:])
+        return tuple(parts), ()
+
+    def needs_rehash(self, stored_hash):
+        """True if stored_hash uses another scheme than the policy, or weaker parameters"""
+        if self._is_argon2():
+            if not stored_hash.startswith('$argon2'):
+                return True
+            from argon2 import extract_parameters
+            target, stored = self._argon2(), extract_parameters(stored_hash)
+            return (stored.type != target.type or stored.time_cost < target.time_cost
+                    or stored.memory_cost < target.memory_cost)
+        if self._target is None:
+            # werkzeug fills in defaults ('pbkdf2' -> 'pbkdf2:sha256:<iterations>'), so compare like with like
+            self._target = self._parse(self._hash('').split('$', 1)[0])
+        scheme, params = self._parse(stored_hash.split('$', 1)[0])
+        target_scheme, target_params = self._target
+        if scheme != target_scheme or len(params) != len(target_params):
+            return True
+        return any(have < want for have, want in zip(params, target_params))
+
+    # --- Pool ---
+
+    def _run(self, fn, *args):
+        if self._pool is None:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.wait):
+            raise HashingBusy()
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a new password with the current policy"""
+        return self._run(self._hash, password)
+
+    def verify(self, stored_hash, password):
+        """
+        Check a password against its stored hash.
+        Returns (ok, new_hash): new_hash is set when the password matched but
+        the stored hash uses an outdated policy and should be replaced.
+        """
+        def check():
+            if not self._verify(stored_hash, password):
+                return False, None
+            if self.needs_rehash(stored_hash):
+                return True, self._hash(password)
+            return True, None
+        return self._run(check)
+
+
+password_hasher = PasswordHasher()
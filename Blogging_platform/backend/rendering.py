@@ -0,0 +1,147 @@
+import html
+import math
+import re
+from html.parser import HTMLParser
+
+from sqlalchemy.orm import undefer
+
+from models import db, Post
+
+EXCERPT_LENGTH = 150
+WORDS_PER_MINUTE = 200
+
+# What the rich-text editor (Quill) produces; everything else is dropped
+ALLOWED_TAGS = {
+    'p', 'br', 'strong', 'b', 'em', 'i', 'u', 's', 'a', 'ul', 'ol', 'li',
+    'blockquote', 'pre', 'code', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'img', 'span', 'sub', 'sup',
+}
+ALLOWED_ATTRS = {
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+}
+VOID_TAGS = {'br', 'img'}
+# Dropped together with everything inside them
+SKIP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template'}
+SAFE_URL_RE = re.compile(r"^(https?:|mailto:|/|#)", re.IGNORECASE)
+# Block-level tags that separate words when flattening to text
+BLOCK_TAGS = {'p', 'br', 'li', 'blockquote', 'pre', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'div'}
+
+
+class _Renderer(HTMLParser):
+    """Single pass over the post body producing both its plain text and a sanitized copy"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.html = []
+        self._open = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_CONTENT_TAGS:
+            self._skipping += 1
+            return
+        if self._skipping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+
+        kept = []
+        for name, value in attrs:
+            if name not in ALLOWED_ATTRS.get(tag, ()) or value is None:
+                continue
+            if name in ('href', 'src') and not SAFE_URL_RE.match(value.strip()):
+                continue
+            kept.append(f' {name}="{html.escape(value)}"')
+        if tag == 'a' and any(a.startswith(' target=') for a in kept):
+            kept.append(' rel="noopener noreferrer"')
+        self.html.append(f"<{tag}{''.join(kept)}>")
+        if tag not in VOID_TAGS:
+            self._open.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_CONTENT_TAGS:
+            self._skipping = max(0, self._skipping - 1)
+            return
+        if self._skipping:
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag in self._open:
+            # Close anything left open inside this tag so the output stays well formed
+            while self._open:
+                open_tag = self._open.pop()
+                self.html.append(f"</{open_tag}>")
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        if self._skipping:
+            return
+        self.text.append(data)
+        self.html.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self._open:
+            self.html.append(f"</{self._open.pop()}>")
+
+
+def _render(content):
+    renderer = _Renderer()
+    renderer.feed(content or '')
+    renderer.close()
+    return ' '.join(''.join(renderer.text).split()), ''.join(renderer.html)
+
+
+def plain_text(content):
+    """The words of a post body with all markup removed (unescaped), e.g. for the search index"""
+    return _render(content)[0]
+
+
+def render_content(content):
+    """
+    Derive the stored presentation fields from a post body.
+    Returns (excerpt, content_html, reading_time): the excerpt is escaped
+    plain text cut at a word boundary, content_html the body with anything
+    outside the editor's tag/attribute allowlist removed, reading_time whole
+    minutes at WORDS_PER_MINUTE.
+    """
+    text, content_html = _render(content)
+    if len(text) > EXCERPT_LENGTH:
+        excerpt = text[:EXCERPT_LENGTH].rsplit(' ', 1)[0] + '...'
+    else:
+        excerpt = text
+    words = len(text.split())
+    reading_time = max(1, math.ceil(words / WORDS_PER_MINUTE)) if words else 0
+
+    return html.escape(excerpt, quote=False), content_html, reading_time
+
+
+def apply_rendering(post):
+    """Store the derived fields on a post; call whenever post.content changes"""
+    post.excerpt, post.content_html, post.reading_time = render_content(post.content)
+
+
+def backfill_rendering(batch_size=500, force=False):
+    """
+    Fill excerpt/content_html/reading_time for posts written before they
+    existed (or all posts with force=True, e.g. after changing the
+    allowlist). Commits every `batch_size` posts; returns how many were rendered.
+    """
+    query = Post.query.options(undefer(Post.content)).order_by(Post.id)
+    if not force:
+        query = query.filter(Post.excerpt.is_(None))
+
+    rendered, last_id = 0, 0
+    while True:
+        posts = query.filter(Post.id > last_id).limit(batch_size).all()
+        if not posts:
+            return rendered
+        for post in posts:
+            apply_rendering(post)
+        db.session.commit()
+        rendered += len(posts)
+        last_id = posts[-1].id
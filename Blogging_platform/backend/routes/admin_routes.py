@@ -1,23 +1,108 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import and_, or_
+from datetime import datetime
 from models import db, AuditLog, User
 from middleware import admin_required
+from audit import ACTION_TYPES
+from dbmetrics import db_metrics
+import base64
 
 admin_bp = Blueprint('admin', __name__)
 
+def encode_audit_cursor(log):
+    raw = f"{log.timestamp.isoformat()}|{log.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_audit_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, log_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parse_time(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
 @admin_bp.route('/audit', methods=['GET'])
 @jwt_required()
 @admin_required()
 def get_audit_logs():
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).limit(100).all()
+    """
+    Newest audit entries first, with the author's username joined in.
+    Filters: user_id, action_type, since/until (ISO timestamps).
+    Returns {"logs", "next_cursor"}; pass next_cursor back as ?cursor= for the
+    next page (keyset pagination). ?format=list returns just the list of the
+    first page, the shape older clients expect.
+    """
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+
+    query = db.session.query(
+        AuditLog.id, AuditLog.user_id, AuditLog.action, AuditLog.action_type, AuditLog.timestamp, User.username
+    ).outerjoin(User, User.id == AuditLog.user_id)
+
+    # Each filter lines up with one of the (..., timestamp, id) indexes on audit_logs
+    user_id = request.args.get('user_id', type=int)
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    action_type = request.args.get('action_type')
+    if action_type:
+        if action_type not in ACTION_TYPES:
+            return jsonify({"error": f"action_type must be one of: {', '.join(ACTION_TYPES)}"}), 400
+        query = query.filter(AuditLog.action_type == action_type)
+    since, until = request.args.get('since'), request.args.get('until')
+    if since:
+        since = parse_time(since)
+        if not since:
+            return jsonify({"error": "Invalid since timestamp"}), 400
+        query = query.filter(AuditLog.timestamp >= since)
+    if until:
+        until = parse_time(until)
+        if not until:
+            return jsonify({"error": "Invalid until timestamp"}), 400
+        query = query.filter(AuditLog.timestamp < until)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_audit_cursor(cursor)
+        if not position:
+            return jsonify({"error": "Invalid cursor"}), 400
+        timestamp, log_id = position
+        query = query.filter(or_(
+            AuditLog.timestamp < timestamp,
+            and_(AuditLog.timestamp == timestamp, AuditLog.id < log_id)
+        ))
+
+    logs = query.order_by(AuditLog.timestamp.desc(), AuditLog.id.desc()).limit(limit + 1).all()
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+
     logs_data = [
         {
             'id': log.id,
             'user_id': log.user_id,
             'action': log.action,
+            'action_type': log.action_type,
             'timestamp': log.timestamp.isoformat(),
-            'username': log.user.username if log.user else None
+            'username': log.username
         }
         for log in logs
     ]
-    return jsonify(logs_data), 200
+    if request.args.get('format') == 'list':
+        return jsonify(logs_data), 200
+    return jsonify({
+        "logs": logs_data,
+        "next_cursor": encode_audit_cursor(logs[-1]) if has_more else None
+    }), 200
+
+
+@admin_bp.route('/db-metrics', methods=['GET'])
+@jwt_required()
+@admin_required()
+def get_db_metrics():
+    """Connection pool state, checkout/wait counters and recent slow queries for this worker"""
+    return jsonify(db_metrics.snapshot(db.engine)), 200
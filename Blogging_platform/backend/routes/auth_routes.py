@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 
-from models import db, User, AuditLog
+from models import db, User
+from audit import audit_sink
+from passwords import password_hasher, HashingBusy
 from middleware import admin_required
 
 import traceback
@@ -25,7 +26,7 @@ def register():
             return jsonify({"error": "Email already registered"}), 409
             
         # Create user (defaults to 'reader' role)
-        hashed_password = generate_password_hash(data['password'], method='pbkdf2:sha256')
+        hashed_password = password_hasher.hash(data['password'])
         new_user = User(
             username=data['username'],
             email=data['email'],
@@ -36,6 +37,8 @@ def register():
         db.session.commit()
         
         return jsonify({"message": "User created successfully", "user_id": new_user.id}), 201
+    except HashingBusy:
+        return jsonify({"error": "Too many requests right now, please retry shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         db.session.rollback()
         print(f"REGISTER ERROR: {traceback.format_exc()}")
@@ -51,7 +54,16 @@ def login():
         
     user = User.query.filter_by(username=data['username']).first()
     
-    if user and check_password_hash(user.password_hash, data['password']):
+    try:
+        valid, upgraded_hash = password_hasher.verify(user.password_hash, data['password']) if user else (False, None)
+    except HashingBusy:
+        return jsonify({"error": "Too many login attempts right now, please retry shortly"}), 503, {"Retry-After": "1"}
+    
+    if valid:
+        # Stored with an older hashing policy: replace it now that we have the password
+        if upgraded_hash:
+            user.password_hash = upgraded_hash
+        
         # Include role in JWT claims for middleware checks
         additional_claims = {
             "role": user.role,
@@ -59,8 +71,7 @@ def login():
             "avatar_url": user.avatar_url
         }
         
-        audit = AuditLog(user_id=user.id, action="Logged in")
-        db.session.add(audit)
+        audit_sink.record(user.id, "Logged in", "login")
         db.session.commit()
         
         access_token = create_access_token(
@@ -86,8 +97,7 @@ def login():
 @jwt_required()
 def logout():
     user_id = int(get_jwt_identity())
-    audit = AuditLog(user_id=user_id, action="Logged out")
-    db.session.add(audit)
+    audit_sink.record(user_id, "Logged out", "logout")
     db.session.commit()
     return jsonify({"message": "Logged out successfully"}), 200
 
@@ -124,10 +134,8 @@ def change_user_role(user_id):
         return jsonify({"error": "User not found"}), 404
         
     user.role = new_role
-    db.session.commit()
     # Create audit log entry for role change
-    audit = AuditLog(user_id=user.id, action=f'Changed role to {new_role}')
-    db.session.add(audit)
+    audit_sink.record(user.id, f'Changed role to {new_role}', 'role_change')
     db.session.commit()
     
     return jsonify({"message": f"User role updated to {new_role}"}), 200
@@ -1,11 +1,83 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+import base64
 
-from models import db, Comment, Post, User, AuditLog
+from models import db, Comment, Post, User
 from middleware import editor_or_admin_required
+from counters import bump
+from cache import response_cache
+from audit import audit_sink
+from trending import trending
 
 comment_bp = Blueprint('comments', __name__)
 
+def with_comment_author(query):
+    """Load each comment's author (public fields only) in the same query"""
+    return query.options(
+        joinedload(Comment.comment_author).load_only(User.id, User.username, User.avatar_url)
+    )
+
+def comment_item(c):
+    author = c.comment_author
+    return {
+        "id": c.id,
+        "content": c.content,
+        "created_at": c.created_at,
+        "parent_id": c.parent_id,
+        "author": {
+            "id": author.id,
+            "username": author.username,
+            "avatar_url": author.avatar_url
+        }
+    }
+
+def visible_count(comment):
+    """
+    How many counted comments `comment` stands for while approved: a reply
+    counts only under an approved parent, and a top-level comment carries
+    its approved replies (hiding it hides the thread).
+    """
+    if comment.parent_id is not None:
+        return 1 if comment.parent.is_approved else 0
+    return 1 + db.session.query(func.count(Comment.id)).filter(
+        Comment.parent_id == comment.id, Comment.is_approved.is_(True)
+    ).scalar()
+
+def encode_comment_cursor(comment):
+    raw = f"{comment.created_at.isoformat()}|{comment.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_comment_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, comment_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(comment_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def comment_page(query, per_page):
+    """
+    Oldest-first keyset page of `query` after ?cursor=.
+    Returns (comments, next_cursor), or None for an invalid cursor.
+    """
+    cursor = request.args.get('cursor')
+    if cursor:
+        position = decode_comment_cursor(cursor)
+        if not position:
+            return None
+        created_at, comment_id = position
+        query = query.filter(or_(
+            Comment.created_at > created_at,
+            and_(Comment.created_at == created_at, Comment.id > comment_id)
+        ))
+    comments = query.order_by(Comment.created_at.asc(), Comment.id.asc()).limit(per_page + 1).all()
+    has_more = len(comments) > per_page
+    comments = comments[:per_page]
+    return comments, encode_comment_cursor(comments[-1]) if has_more else None
+
 @comment_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_comment():
@@ -15,6 +87,7 @@ def create_comment():
     
     post_id = data.get('post_id')
     content = data.get('content')
+    parent_id = data.get('parent_id')
     
     if not post_id or not content:
         return jsonify({"error": "post_id and content are required"}), 400
@@ -22,20 +95,35 @@ def create_comment():
     post = Post.query.get(post_id)
     if not post or not post.published:
         return jsonify({"error": "Post not found or not published"}), 404
+    
+    if parent_id:
+        try:
+            parent_id = int(parent_id)
+        except (TypeError, ValueError):
+            return jsonify({"error": "parent_id must be a comment id"}), 400
+        parent = db.session.get(Comment, parent_id)
+        if not parent or parent.post_id != post.id or not parent.is_approved:
+            return jsonify({"error": "Parent comment not found"}), 404
+        # Threads are one level deep: a reply to a reply joins the same thread
+        parent_id = parent.parent_id or parent.id
         
     new_comment = Comment(
         content=content,
         user_id=current_user_id,
         post_id=post_id,
+        parent_id=parent_id or None,
         is_approved=True  # Auto-approved by default in this implementation
     )
     
     db.session.add(new_comment)
     db.session.flush() # to get id if needed
+    bump(post_id, 'comment_count', 1)
+    trending.record(post_id, 'comment')
     
-    audit = AuditLog(user_id=current_user_id, action=f"Commented on post: {post.title}")
-    db.session.add(audit)
+    audit_sink.record(current_user_id, f"Commented on post: {post.title}", "comment_create")
     db.session.commit()
+    # Counter-only change: the feed's comment_count catches up within its TTL, like like_count
+    response_cache.invalidate(f'comments:{post_id}', f'post:{post.slug}')
     
     author = User.query.get(current_user_id)
     return jsonify({
@@ -44,6 +132,7 @@ def create_comment():
             "id": new_comment.id,
             "content": new_comment.content,
             "created_at": new_comment.created_at,
+            "parent_id": new_comment.parent_id,
             "author": {
                 "id": author.id,
                 "username": author.username,
@@ -54,25 +143,71 @@ def create_comment():
 
 
 @comment_bp.route('/post/<int:post_id>', methods=['GET'])
+@response_cache.cached('comments:{post_id}')
 def get_post_comments(post_id):
-    """Public route to get approved comments for a post"""
-    comments = Comment.query.filter_by(post_id=post_id, is_approved=True).order_by(Comment.created_at.asc()).all()
+    """
+    Public route to get approved comments for a post, oldest first.
+    Pages of top-level comments (?per_page=, then ?cursor=next_cursor), each
+    with its reply_count and first `replies` replies (default 3, 0 to skip);
+    the page costs two queries however many threads or replies it holds.
+    """
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 100))
+    reply_limit = max(0, min(request.args.get('replies', 3, type=int), 50))
+    
+    page = comment_page(
+        with_comment_author(Comment.query.filter(
+            Comment.post_id == post_id, Comment.is_approved.is_(True), Comment.parent_id.is_(None)
+        )),
+        per_page
+    )
+    if page is None:
+        return jsonify({"error": "Invalid cursor"}), 400
+    comments, next_cursor = page
+    
+    # The first replies of every thread on the page, plus per-thread totals, in one query
+    replies, reply_counts = {}, {}
+    if comments and reply_limit:
+        ranked = select(
+            Comment.id,
+            func.row_number().over(partition_by=Comment.parent_id, order_by=(Comment.created_at, Comment.id)).label('position'),
+            func.count().over(partition_by=Comment.parent_id).label('total')
+        ).where(
+            Comment.parent_id.in_([c.id for c in comments]), Comment.is_approved.is_(True)
+        ).subquery()
+        rows = with_comment_author(
+            db.session.query(Comment, ranked.c.total).join(ranked, ranked.c.id == Comment.id)
+        ).filter(ranked.c.position <= reply_limit).order_by(ranked.c.position).all()
+        for reply, total in rows:
+            replies.setdefault(reply.parent_id, []).append(comment_item(reply))
+            reply_counts[reply.parent_id] = total
     
     comments_data = []
     for c in comments:
-        author = User.query.get(c.user_id)
-        comments_data.append({
-            "id": c.id,
-            "content": c.content,
-            "created_at": c.created_at,
-            "author": {
-                "id": author.id,
-                "username": author.username,
-                "avatar_url": author.avatar_url
-            }
-        })
+        item = comment_item(c)
+        item["replies"] = replies.get(c.id, [])
+        item["reply_count"] = reply_counts.get(c.id, 0) if reply_limit else None
+        comments_data.append(item)
         
-    return jsonify({"comments": comments_data}), 200
+    return jsonify({"comments": comments_data, "next_cursor": next_cursor}), 200
+
+
+@comment_bp.route('/post/<int:post_id>/thread/<int:comment_id>', methods=['GET'])
+@response_cache.cached('comments:{post_id}')
+def get_comment_replies(post_id, comment_id):
+    """Public route to page through the approved replies to a top-level comment"""
+    per_page = max(1, min(request.args.get('per_page', 50, type=int), 100))
+    
+    page = comment_page(
+        with_comment_author(Comment.query.filter(
+            Comment.parent_id == comment_id, Comment.post_id == post_id, Comment.is_approved.is_(True)
+        )),
+        per_page
+    )
+    if page is None:
+        return jsonify({"error": "Invalid cursor"}), 400
+    replies, next_cursor = page
+    
+    return jsonify({"replies": [comment_item(c) for c in replies], "next_cursor": next_cursor}), 200
 
 
 @comment_bp.route('/<int:comment_id>/flag', methods=['PUT'])
@@ -94,7 +229,12 @@ def flag_comment(comment_id):
         return jsonify({"error": "You can only moderate comments on your own posts"}), 403
         
     comment.is_approved = not comment.is_approved
+    delta = visible_count(comment) * (1 if comment.is_approved else -1)
+    if delta:
+        bump(comment.post_id, 'comment_count', delta)
+        trending.record(comment.post_id, 'comment', delta)
     db.session.commit()
+    response_cache.invalidate(f'comments:{comment.post_id}', f'post:{post.slug}')
     
     status = "approved" if comment.is_approved else "flagged"
     return jsonify({"message": f"Comment has been {status}"}), 200
@@ -115,7 +255,15 @@ def delete_comment(comment_id):
     if comment.user_id != current_user_id and claims.get('role') != 'admin':
         return jsonify({"error": "You can only delete your own comments"}), 403
         
+    post_id, slug = comment.post_id, comment.post.slug
+    # Deleting a top-level comment removes its thread
+    removed = visible_count(comment) if comment.is_approved else 0
+    if removed:
+        bump(post_id, 'comment_count', -removed)
+        trending.record(post_id, 'comment', -removed)
+    db.session.execute(delete(Comment).where(Comment.parent_id == comment.id))
     db.session.delete(comment)
     db.session.commit()
+    response_cache.invalidate(f'comments:{post_id}', f'post:{slug}')
     
     return jsonify({"message": "Comment deleted successfully"}), 200
@@ -1,15 +1,47 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import cloudinary.uploader
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import joinedload, load_only, undefer
+from datetime import datetime
 
-from models import db, Post, Category, User, AuditLog, Like
+from models import db, Post, Category, User, Like
 from middleware import editor_or_admin_required
-import re
+from counters import bump
+from cache import response_cache
+from audit import audit_sink
+from uploads import upload_queue
+from rendering import apply_rendering, render_content
+from slugs import slug_cache, generate_slug, save_with_unique_slug
+from trending import trending
+from likes import liked_cache, annotate_liked
+import bulk
+import search
+import base64
+import math
 
 post_bp = Blueprint('posts', __name__)
 
-def generate_slug(title):
-    return re.sub(r'[\W_]+', '-', title.lower()).strip('-')
+def with_author(query, *post_columns):
+    """Load only the listed Post columns plus the author's public fields in a single JOIN"""
+    return query.options(
+        load_only(*post_columns),
+        joinedload(Post.author).load_only(User.id, User.username, User.avatar_url)
+    )
+
+def parse_category_id(value):
+    """
+    Form value -> (category id or None, error message or None).
+    An empty value means no category.
+    """
+    if not value:
+        return None, None
+    try:
+        category_id = int(value)
+    except ValueError:
+        return None, "category_id must be a category id"
+    if db.session.get(Category, category_id) is None:
+        return None, "Unknown category"
+    return category_id, None
 
 @post_bp.route('', methods=['POST'])
 @jwt_required()
@@ -25,54 +57,85 @@ def create_post():
     
     if not title or not content:
         return jsonify({"error": "Title and content are required"}), 400
+    category_id, error = parse_category_id(category_id)
+    if error:
+        return jsonify({"error": error}), 400
         
-    slug = generate_slug(title)
-        
-    # Check if slug exists
-    if Post.query.filter_by(slug=slug).first():
-        return jsonify({"error": "A post with a similar title already exists. Try a different title."}), 409
-        
-    image_url = None
-    if 'image' in request.files:
-        image_file = request.files['image']
-        if image_file.filename != '':
-            # Upload to Cloudinary
-            upload_result = cloudinary.uploader.upload(
-                image_file, 
-                folder="nexusblog_posts",
-                resource_type="image"
-            )
-            image_url = upload_result.get('secure_url')
+    image_file = request.files.get('image')
+    has_image = image_file is not None and image_file.filename != ''
     
     new_post = Post(
         title=title,
-        slug=slug,
         content=content,
-        image_url=image_url,
+        image_status="pending" if has_image else None,
         published=published,
         user_id=current_user_id,
-        category_id=category_id if category_id else None
+        category_id=category_id
     )
+    apply_rendering(new_post)
     
-    db.session.add(new_post)
-    db.session.flush()
+    # The unique constraint decides: a taken slug gets a -2, -3, ... suffix
+    if not save_with_unique_slug(new_post, generate_slug(title)):
+        return jsonify({"error": "A post with a similar title already exists. Try a different title."}), 409
+    search.index_post(new_post)
     
-    audit = AuditLog(user_id=current_user_id, action=f"Created post: {new_post.title}")
-    db.session.add(audit)
+    audit_sink.record(current_user_id, f"Created post: {title}", "post_create")
+    # Read back before commit() expires the instance, saving a reload
+    post_id, slug = new_post.id, new_post.slug
     db.session.commit()
+    response_cache.invalidate('feed', f'post:{slug}')
+    slug_cache.set(slug, post_id)
+    
+    # Uploaded in the background; image_url is filled in when it finishes
+    image_status = None
+    if has_image:
+        queued = upload_queue.submit(image_file, "nexusblog_posts", post_id=post_id)
+        image_status = "pending" if queued else "failed"
     
     return jsonify({
         "message": "Post created successfully", 
-        "post_id": new_post.id, 
-        "slug": new_post.slug
+        "post_id": post_id, 
+        "slug": slug,
+        "image_status": image_status
     }), 201
 
 
+@post_bp.route('/import', methods=['POST'])
+@jwt_required()
+@editor_or_admin_required()
+def import_posts():
+    """
+    Bulk-create posts from an NDJSON body (one JSON object per line, see
+    bulk.PostImporter), read as it streams in. Returns counts and per-line errors.
+    """
+    current_user_id = int(get_jwt_identity())
+    batch_size = request.args.get('batch_size', current_app.config['IMPORT_BATCH_SIZE'], type=int)
+    batch_size = max(1, min(batch_size, current_app.config['IMPORT_BATCH_SIZE']))
+    
+    report = bulk.import_posts(request.stream, current_user_id, batch_size)
+    return jsonify(report), 200
+
+
+@post_bp.route('/export', methods=['GET'])
+@jwt_required()
+@editor_or_admin_required()
+def export_posts():
+    """Stream posts as NDJSON: all posts for admins, their own for editors"""
+    from flask_jwt_extended import get_jwt
+    claims = get_jwt()
+    user_id = None if claims.get('role') == 'admin' else int(get_jwt_identity())
+    
+    lines = bulk.export_posts(user_id, current_app.config['EXPORT_BATCH_SIZE'])
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': 'attachment; filename=posts.ndjson'
+    })
+
+
 @post_bp.route('/upload', methods=['POST'])
 @jwt_required()
 @editor_or_admin_required()
 def upload_image():
-    """Helper route to upload images to Cloudinary from the editor"""
+    """Helper route to upload images from the editor; stored before responding since the editor needs the URL"""
     if 'image' not in request.files:
         return jsonify({"error": "No image provided"}), 400
         
@@ -81,19 +144,15 @@ def upload_image():
         return jsonify({"error": "No image selected"}), 400
         
     try:
-        upload_result = cloudinary.uploader.upload(
-            image_file,
-            folder="nexusblog_content",
-            resource_type="image"
-        )
-        return jsonify({
-            "url": upload_result.get('secure_url')
-        }), 200
+        url = upload_queue.save(image_file, "nexusblog_content")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    
+    return jsonify({"url": url}), 200
 
 
 @post_bp.route('/categories', methods=['GET'])
+@response_cache.cached('categories', ttl=3600)
 def get_categories():
     """Get all available categories"""
     categories = Category.query.all()
@@ -102,50 +161,202 @@ def get_categories():
     }), 200
 
 
+def feed_item(p):
+    """Summary shape used by the feed listings"""
+    author = p.author
+    return {
+        "id": p.id,
+        "title": p.title,
+        "slug": p.slug,
+        "excerpt": p.excerpt,
+        "reading_time": p.reading_time,
+        "image_url": p.image_url,
+        "created_at": p.created_at,
+        "like_count": p.like_count,
+        "comment_count": p.comment_count,
+        "author": {
+            "username": author.username,
+            "avatar_url": author.avatar_url
+        }
+    }
+
+
+def encode_feed_cursor(post):
+    raw = f"{post.created_at.isoformat()}|{post.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_feed_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, post_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
 @post_bp.route('', methods=['GET'])
+@annotate_liked('posts')
+@response_cache.cached('feed')
 def get_posts():
     """Public route to get all published posts"""
-    # Simple pagination
-    page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    posts = Post.query.filter_by(published=True).order_by(Post.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    query = with_author(
+        Post.query.filter_by(published=True),
+        Post.id, Post.title, Post.slug, Post.excerpt, Post.reading_time, Post.image_url, Post.created_at,
+        Post.like_count, Post.comment_count
     )
+
+    # Keyset pagination: ?cursor= (empty for the first page), then the returned next_cursor.
+    # Seeks on (published, created_at, id), so every page costs the same.
+    if 'cursor' in request.args:
+        per_page = max(1, min(per_page, 100))
+        cursor = request.args.get('cursor')
+        if cursor:
+            position = decode_feed_cursor(cursor)
+            if not position:
+                return jsonify({"error": "Invalid cursor"}), 400
+            created_at, post_id = position
+            query = query.filter(or_(
+                Post.created_at < created_at,
+                and_(Post.created_at == created_at, Post.id < post_id)
+            ))
+
+        posts = query.order_by(Post.created_at.desc(), Post.id.desc()).limit(per_page + 1).all()
+        has_more = len(posts) > per_page
+        posts = posts[:per_page]
+
+        response = {
+            "posts": [feed_item(p) for p in posts],
+            "next_cursor": encode_feed_cursor(posts[-1]) if has_more else None
+        }
+        # Counting is optional so deep pages don't pay for it
+        if request.args.get('include_total', 'false').lower() == 'true':
+            response["total"] = Post.query.filter_by(published=True).count()
+        return jsonify(response), 200
+
+    # Simple pagination; like the cursor path, the total is only counted on request
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(per_page, 100))
+    posts = query.order_by(Post.created_at.desc(), Post.id.desc()).offset((page - 1) * per_page).limit(per_page + 1).all()
+    has_more = len(posts) > per_page
+
+    response = {
+        "posts": [feed_item(p) for p in posts[:per_page]],
+        "current_page": page,
+        "has_more": has_more
+    }
+    if request.args.get('include_total', 'false').lower() == 'true':
+        total = db.session.query(func.count(Post.id)).filter(Post.published.is_(True)).scalar()
+        response["total"] = total
+        response["pages"] = math.ceil(total / per_page)
+    return jsonify(response), 200
+
+
+@post_bp.route('/trending', methods=['GET'])
+@annotate_liked('posts')
+@response_cache.cached('trending', ttl=60)
+def get_trending_posts():
+    """Public route to get published posts ranked by time-decayed likes and comments"""
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
     
-    posts_data = []
-    for p in posts.items:
-        author = User.query.get(p.user_id)
-        posts_data.append({
+    # Over-fetch a little so unpublished posts in the ranking don't shorten the page
+    ranking = trending.top(limit * 2)
+    posts = with_author(
+        Post.query.filter(Post.id.in_([post_id for post_id, _ in ranking]), Post.published.is_(True)),
+        Post.id, Post.title, Post.slug, Post.excerpt, Post.reading_time, Post.image_url, Post.created_at,
+        Post.like_count, Post.comment_count
+    ).all()
+    by_id = {p.id: p for p in posts}
+    
+    results = []
+    for post_id, score in ranking:
+        if post_id in by_id and len(results) < limit:
+            item = feed_item(by_id[post_id])
+            item["score"] = round(score, 4)
+            results.append(item)
+            
+    return jsonify({"posts": results}), 200
+
+
+@post_bp.route('/search', methods=['GET'])
+@annotate_liked('results')
+def search_posts():
+    """Public full-text search over published posts (title, content, category), ranked and highlighted"""
+    query = request.args.get('q', '').strip()
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = max(1, min(request.args.get('per_page', 10, type=int), 50))
+    
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+        
+    matches = search.search_posts(query, per_page + 1, (page - 1) * per_page)
+    has_more = len(matches) > per_page
+    matches = matches[:per_page]
+    
+    posts = with_author(
+        Post.query.filter(Post.id.in_([m[0] for m in matches]), Post.published.is_(True)),
+        Post.id, Post.title, Post.slug, Post.image_url, Post.created_at
+    ).all()
+    by_id = {p.id: p for p in posts}
+    
+    results = []
+    for post_id, rank, title_highlight, snippet in matches:
+        p = by_id.get(post_id)
+        if not p:
+            continue
+        results.append({
             "id": p.id,
             "title": p.title,
             "slug": p.slug,
-            "excerpt": p.content[:150] + "..." if len(p.content) > 150 else p.content,
+            "title_highlight": title_highlight,
+            "snippet": snippet,
+            "rank": round(rank, 6),
             "image_url": p.image_url,
             "created_at": p.created_at,
             "author": {
-                "username": author.username,
-                "avatar_url": author.avatar_url
+                "username": p.author.username,
+                "avatar_url": p.author.avatar_url
             }
         })
         
     return jsonify({
-        "posts": posts_data,
-        "total": posts.total,
-        "pages": posts.pages,
-        "current_page": posts.page
+        "results": results,
+        "page": page,
+        "per_page": per_page,
+        "has_more": has_more
     }), 200
 
 
 @post_bp.route('/<slug>', methods=['GET'])
+@response_cache.cached('post:{slug}')
 def get_post(slug):
     """Public route to get a single post by slug"""
-    post = Post.query.filter_by(slug=slug, published=True).first()
+    options = (undefer(Post.content), undefer(Post.content_html), joinedload(Post.author))
     
-    if not post:
+    # Hot posts skip the slug lookup and load by primary key
+    post = None
+    post_id = slug_cache.get(slug)
+    if post_id is not None:
+        post = db.session.get(Post, post_id, options=options)
+        if post is None or post.slug != slug:
+            # Renamed or deleted (possibly by another process)
+            slug_cache.invalidate(slug)
+            post = None
+    if post is None:
+        post = Post.query.options(*options).filter_by(slug=slug).first()
+        if post:
+            slug_cache.set(slug, post.id)
+    
+    if not post or not post.published:
         return jsonify({"error": "Post not found or not published"}), 404
         
-    author = User.query.get(post.user_id)
+    author = post.author
+    content_html, reading_time = post.content_html, post.reading_time
+    if content_html is None:
+        # Written before rendering was stored and not backfilled yet
+        _, content_html, reading_time = render_content(post.content)
     
     return jsonify({
         "post": {
@@ -153,9 +364,14 @@ def get_post(slug):
             "title": post.title,
             "slug": post.slug,
             "content": post.content,
+            "content_html": content_html,
+            "reading_time": reading_time,
             "image_url": post.image_url,
+            "image_status": post.image_status,
             "created_at": post.created_at,
             "updated_at": post.updated_at,
+            "like_count": post.like_count,
+            "comment_count": post.comment_count,
             "author": {
                 "id": author.id,
                 "username": author.username,
@@ -173,7 +389,10 @@ def get_my_posts():
     """Route for creators to see all their own posts including drafts"""
     current_user_id = int(get_jwt_identity())
     
-    posts = Post.query.filter_by(user_id=current_user_id).order_by(Post.created_at.desc()).all()
+    posts = with_author(
+        Post.query.filter_by(user_id=current_user_id),
+        Post.id, Post.title, Post.slug, Post.image_url, Post.image_status, Post.published, Post.created_at
+    ).order_by(Post.created_at.desc()).all()
     
     posts_data = []
     for p in posts:
@@ -182,10 +401,11 @@ def get_my_posts():
             "title": p.title,
             "slug": p.slug,
             "image_url": p.image_url,
+            "image_status": p.image_status,
             "published": p.published,
             "created_at": p.created_at,
             "author": {
-                "username": User.query.get(p.user_id).username
+                "username": p.author.username
             }
         })
         
@@ -209,29 +429,43 @@ def update_post(post_id):
         return jsonify({"error": "You can only edit your own posts"}), 403
         
     data = request.form
+    old_slug = post.slug
     
     if 'title' in data:
         post.title = data['title']
-        post.slug = generate_slug(data['title'])
     if 'content' in data:
         post.content = data['content']
+        apply_rendering(post)
     if 'published' in data:
         post.published = data['published'].lower() == 'true'
+    if 'category_id' in data:
+        category_id, error = parse_category_id(data['category_id'])
+        if error:
+            db.session.rollback()
+            return jsonify({"error": error}), 400
+        post.category_id = category_id
         
-    # Handle image update
-    if 'image' in request.files:
-        image_file = request.files['image']
-        if image_file.filename != '':
-            upload_result = cloudinary.uploader.upload(
-                image_file, 
-                folder="nexusblog_posts",
-                resource_type="image"
-            )
-            post.image_url = upload_result.get('secure_url')
-            
+    # Handle image update (uploaded in the background, the old image stays until it finishes)
+    image_file = request.files.get('image')
+    has_image = image_file is not None and image_file.filename != ''
+    if has_image:
+        post.image_status = "pending"
+    
+    if 'title' in data and generate_slug(data['title']) != old_slug:
+        if not save_with_unique_slug(post, generate_slug(data['title']), savepoint=True):
+            db.session.rollback()
+            return jsonify({"error": "A post with a similar title already exists. Try a different title."}), 409
+    
+    search.index_post(post)
     db.session.commit()
+    response_cache.invalidate('feed', f'post:{old_slug}', f'post:{post.slug}')
+    slug_cache.invalidate(old_slug, post.slug)
     
-    return jsonify({"message": "Post updated successfully", "slug": post.slug}), 200
+    slug, image_status = post.slug, post.image_status
+    if has_image and not upload_queue.submit(image_file, "nexusblog_posts", post_id=post_id):
+        image_status = "failed"
+    
+    return jsonify({"message": "Post updated successfully", "slug": slug, "image_status": image_status}), 200
 
 
 @post_bp.route('/<int:post_id>', methods=['DELETE'])
@@ -254,8 +488,13 @@ def delete_post(post_id):
     # if post.image_url:
     #    ... extract public_id and delete ...
             
+    slug = post.slug
+    search.remove_post(post.id)
+    trending.remove_post(post.id)
     db.session.delete(post)
     db.session.commit()
+    response_cache.invalidate('feed', 'trending', f'post:{slug}', f'comments:{post_id}')
+    slug_cache.invalidate(slug)
     
     return jsonify({"message": "Post deleted successfully"}), 200
 
@@ -271,37 +510,31 @@ def toggle_like(post_id):
     existing_like = Like.query.filter_by(user_id=current_user_id, post_id=post_id).first()
     if existing_like:
         db.session.delete(existing_like)
+        bump(post_id, 'like_count', -1)
+        trending.record(post_id, 'like', -1)
         action = "Unliked"
     else:
         new_like = Like(user_id=current_user_id, post_id=post_id)
         db.session.add(new_like)
+        bump(post_id, 'like_count', 1)
+        trending.record(post_id, 'like')
         action = "Liked"
         
-    audit = AuditLog(user_id=current_user_id, action=f"{action} post: {post.title}")
-    db.session.add(audit)
+    audit_sink.record(current_user_id, f"{action} post: {post.title}", f"post_{action.lower()}")
     db.session.commit()
+    liked_cache.set_liked(current_user_id, post_id, action == "Liked")
+    # Counter-only change: the post page shows like_count, feed counts catch up within the cache TTL
+    response_cache.invalidate(f'post:{post.slug}')
     return jsonify({"message": f"Successfully {action.lower()} post"}), 200
 
 @post_bp.route('/liked', methods=['GET'])
 @jwt_required()
 def get_liked_posts():
     current_user_id = int(get_jwt_identity())
-    likes = Like.query.filter_by(user_id=current_user_id).order_by(Like.created_at.desc()).all()
-    posts_data = []
-    for like in likes:
-        p = Post.query.get(like.post_id)
-        if p and p.published:
-            author = User.query.get(p.user_id)
-            posts_data.append({
-                "id": p.id,
-                "title": p.title,
-                "slug": p.slug,
-                "excerpt": p.content[:150] + "..." if len(p.content) > 150 else p.content,
-                "image_url": p.image_url,
-                "created_at": p.created_at,
-                "author": {
-                    "username": author.username,
-                    "avatar_url": author.avatar_url
-                }
-            })
-    return jsonify({"posts": posts_data}), 200
+    posts = with_author(
+        Post.query.join(Like, Like.post_id == Post.id)
+            .filter(Like.user_id == current_user_id, Post.published.is_(True)),
+        Post.id, Post.title, Post.slug, Post.excerpt, Post.reading_time, Post.image_url, Post.created_at,
+        Post.like_count, Post.comment_count
+    ).order_by(Like.created_at.desc()).all()
+    return jsonify({"posts": [dict(feed_item(p), liked_by_me=True) for p in posts]}), 200
@@ -0,0 +1,117 @@
+from sqlalchemy import inspect, text
+
+from models import db
+
+# Columns added to existing tables after their first release, in the order
+# they were introduced: (table, column, column definition for ALTER TABLE ... ADD COLUMN).
+# The definitions are valid on both SQLite and PostgreSQL.
+ADDED_COLUMNS = [
+    ('posts', 'like_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('posts', 'comment_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('posts', 'image_status', 'VARCHAR(20)'),
+    ('posts', 'excerpt', 'TEXT'),
+    ('posts', 'content_html', 'TEXT'),
+    ('posts', 'reading_time', 'INTEGER'),
+    ('audit_logs', 'action_type', 'VARCHAR(30)'),
+    ('comments', 'parent_id', 'INTEGER REFERENCES comments(id) ON DELETE CASCADE'),
+]
+
+
+def _fill_counters():
+    from counters import reconcile_counters
+    reconcile_counters()
+    return "recomputed like/comment counters"
+
+
+def _fill_image_status():
+    # Images from before background uploads were stored synchronously
+    db.session.execute(text("UPDATE posts SET image_status = 'ready' WHERE image_url IS NOT NULL"))
+    db.session.commit()
+    return "marked existing post images ready"
+
+
+def _fill_rendering():
+    from rendering import backfill_rendering
+    return f"rendered {backfill_rendering()} posts"
+
+
+# How the action text of rows logged before action_type begins, per type
+ACTION_PREFIXES = [
+    ('login', 'Logged in'),
+    ('logout', 'Logged out'),
+    ('role_change', 'Changed role to '),
+    ('post_create', 'Created post: '),
+    ('post_create', 'Imported '),
+    ('post_like', 'Liked post: '),
+    ('post_unlike', 'Unliked post: '),
+    ('comment_create', 'Commented on post: '),
+]
+
+
+def _fill_action_types():
+    for action_type, prefix in ACTION_PREFIXES:
+        db.session.execute(
+            text("UPDATE audit_logs SET action_type = :type WHERE action_type IS NULL AND action LIKE :pattern"),
+            {"type": action_type, "pattern": prefix + '%'}
+        )
+    db.session.commit()
+    return "classified existing audit log actions"
+
+
+# What fills a newly added column from existing data (one call however many of its columns were added)
+FILLS = {
+    'posts.like_count': _fill_counters,
+    'posts.comment_count': _fill_counters,
+    'posts.image_status': _fill_image_status,
+    'posts.excerpt': _fill_rendering,
+    'posts.content_html': _fill_rendering,
+    'posts.reading_time': _fill_rendering,
+    'audit_logs.action_type': _fill_action_types,
+}
+
+
+def upgrade_schema():
+    """
+    Bring a database created by an older release up to the current models.
+
+    db.create_all() creates missing tables but never alters existing ones,
+    so this adds the ADDED_COLUMNS a table lacks and every model index that
+    is missing, then fills the new columns from existing data (FILLS); a
+    search index created here is filled from the existing posts. Each step checks the live schema first, so it is safe to run after
+    every deploy. Returns the list of changes made.
+    """
+    had_search_index = 'post_search' in inspect(db.engine).get_table_names()
+    db.create_all()
+    inspector = inspect(db.engine)
+    changes = []
+
+    for table, column, definition in ADDED_COLUMNS:
+        existing = {c['name'] for c in inspector.get_columns(table)}
+        if column not in existing:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            changes.append(f"added {table}.{column}")
+    db.session.commit()
+
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {i['name'] for i in inspector.get_indexes(table.name)}
+        columns = {c['name'] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name not in existing and all(c.name in columns for c in index.columns):
+                index.create(db.engine)
+                changes.append(f"created index {index.name}")
+
+    fills = []
+    for change in changes:
+        fill = FILLS.get(change.split(' ', 1)[1]) if change.startswith('added ') else None
+        if fill is not None and fill not in fills:
+            fills.append(fill)
+    for fill in fills:
+        changes.append(fill())
+
+    if not had_search_index:
+        # create_all() just made an empty index: fill it from the existing posts
+        from search import rebuild_index
+        rebuild_index()
+        changes.append("built the search index")
+    return changes
@@ -0,0 +1,131 @@
+import html
+import re
+
+from sqlalchemy import DDL, event, text
+from sqlalchemy.orm import undefer
+
+from models import db, Post, Category
+from rendering import plain_text
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# The database marks matches with these private-use characters; the text around
+# them is escaped before they're swapped for the <mark> tags above
+_MATCH_START = '\ue000'
+_MATCH_END = '\ue001'
+
+# Full-text index over published posts: title, content and category name.
+# SQLite uses an FTS5 table keyed by post id; PostgreSQL a weighted tsvector with a GIN index.
+event.listen(db.metadata, 'after_create', DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_search "
+    "USING fts5(title, content, category, tokenize='porter unicode61')"
+).execute_if(dialect='sqlite'))
+
+event.listen(db.metadata, 'after_create', DDL(
+    "CREATE TABLE IF NOT EXISTS post_search ("
+    " post_id INTEGER PRIMARY KEY REFERENCES posts(id) ON DELETE CASCADE,"
+    " title TEXT NOT NULL, content TEXT NOT NULL, category TEXT,"
+    " document tsvector NOT NULL)"
+).execute_if(dialect='postgresql'))
+
+event.listen(db.metadata, 'after_create', DDL(
+    "CREATE INDEX IF NOT EXISTS ix_post_search_document ON post_search USING GIN (document)"
+).execute_if(dialect='postgresql'))
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def index_post(post):
+    """
+    Add, refresh or drop a post in the search index (only published posts are
+    searchable). The body is indexed as plain text, so markup is neither
+    searchable nor echoed back in snippets.
+    """
+    if not post.published:
+        remove_post(post.id)
+        return
+
+    category = db.session.get(Category, post.category_id) if post.category_id else None
+    params = {"id": post.id, "title": post.title, "content": plain_text(post.content), "category": category.name if category else ""}
+
+    if _dialect() == 'postgresql':
+        db.session.execute(text("""
+            INSERT INTO post_search (post_id, title, content, category, document)
+            VALUES (:id, :title, :content, :category,
+                    setweight(to_tsvector('english', :title), 'A') ||
+                    setweight(to_tsvector('english', :category), 'B') ||
+                    setweight(to_tsvector('english', :content), 'C'))
+            ON CONFLICT (post_id) DO UPDATE SET
+                title = EXCLUDED.title, content = EXCLUDED.content,
+                category = EXCLUDED.category, document = EXCLUDED.document
+        """), params)
+    else:
+        db.session.execute(text("DELETE FROM post_search WHERE rowid = :id"), params)
+        db.session.execute(text(
+            "INSERT INTO post_search (rowid, title, content, category) VALUES (:id, :title, :content, :category)"
+        ), params)
+
+
+def remove_post(post_id):
+    if _dialect() == 'postgresql':
+        db.session.execute(text("DELETE FROM post_search WHERE post_id = :id"), {"id": post_id})
+    else:
+        db.session.execute(text("DELETE FROM post_search WHERE rowid = :id"), {"id": post_id})
+
+
+def rebuild_index():
+    """Re-index every published post, e.g. after enabling search on an existing database"""
+    db.session.execute(text("DELETE FROM post_search"))
+    for post in Post.query.options(undefer(Post.content)).filter_by(published=True).yield_per(500):
+        index_post(post)
+    db.session.commit()
+
+
+def _highlighted(fragment):
+    """Escape an indexed fragment and turn the database's match markers into <mark> tags"""
+    escaped = html.escape(fragment or '', quote=False)
+    return escaped.replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_END, HIGHLIGHT_END)
+
+
+def search_posts(query, limit, offset):
+    """
+    Ranked matches for a free-text query.
+    Returns a list of (post_id, rank, title_highlight, snippet), best first;
+    the highlights are escaped HTML with matches wrapped in <mark>.
+    """
+    terms = TOKEN_RE.findall(query)
+    if not terms:
+        return []
+
+    if _dialect() == 'postgresql':
+        rows = db.session.execute(text(f"""
+            SELECT post_id,
+                   ts_rank_cd(document, q) AS rank,
+                   ts_headline('english', title, q, 'StartSel={_MATCH_START}, StopSel={_MATCH_END}, HighlightAll=true'),
+                   ts_headline('english', content, q, 'StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=30, MinWords=10')
+            FROM post_search, plainto_tsquery('english', :q) AS q
+            WHERE document @@ q
+            ORDER BY rank DESC, post_id DESC
+            LIMIT :limit OFFSET :offset
+        """), {"q": " ".join(terms), "limit": limit, "offset": offset})
+    else:
+        # Quote every term so user input can't inject FTS5 syntax; the last one matches as a prefix
+        match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+        rows = db.session.execute(text(f"""
+            SELECT rowid,
+                   bm25(post_search, 10.0, 1.0, 4.0) AS rank,
+                   highlight(post_search, 0, '{_MATCH_START}', '{_MATCH_END}'),
+                   snippet(post_search, 1, '{_MATCH_START}', '{_MATCH_END}', '...', 24)
+            FROM post_search
+            WHERE post_search MATCH :match
+            ORDER BY rank, rowid DESC
+            LIMIT :limit OFFSET :offset
+        """), {"match": match.strip(), "limit": limit, "offset": offset})
+        # bm25() is lower-is-better; flip it so both dialects report higher-is-better
+        return [(row[0], -row[1], _highlighted(row[2]), _highlighted(row[3])) for row in rows]
+
+    return [(row[0], row[1], _highlighted(row[2]), _highlighted(row[3])) for row in rows]
@@ -0,0 +1,100 @@
+import re
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+
+# Tried as slug, slug-2, ... slug-N before giving up
+MAX_SLUG_ATTEMPTS = 50
+
+
+class SlugCache:
+    """
+    Bounded in-process LRU of slug -> post id, so post views can fetch the
+    post by primary key instead of looking the slug up first. Entries are
+    hints: readers re-check the loaded post's slug, so an entry left stale
+    by another process only costs one extra query.
+    """
+
+    def __init__(self, app=None, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('SLUG_CACHE_SIZE', 10000)
+        self.clear()
+        app.extensions['slug_cache'] = self
+
+    def get(self, slug):
+        with self._lock:
+            post_id = self._data.get(slug)
+            if post_id is not None:
+                self._data.move_to_end(slug)
+            return post_id
+
+    def set(self, slug, post_id):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[slug] = post_id
+            self._data.move_to_end(slug)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *slugs):
+        with self._lock:
+            for slug in slugs:
+                self._data.pop(slug, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+slug_cache = SlugCache()
+
+
+def generate_slug(title):
+    return re.sub(r'[\W_]+', '-', title.lower()).strip('-')
+
+
+def _is_slug_conflict(error):
+    # SQLite: "UNIQUE constraint failed: posts.slug"; PostgreSQL: '... constraint "posts_slug_key"'
+    return 'slug' in str(error.orig)
+
+
+def save_with_unique_slug(post, base_slug, savepoint=False):
+    """
+    Flush `post` with `base_slug`, or base_slug-2, -3, ... when the unique
+    constraint on posts.slug rejects it; no SELECT beforehand, so a new
+    title normally costs just the INSERT. Returns False if every candidate
+    is taken.
+
+    With savepoint=False a conflict rolls back the whole session, so the
+    post must be the only pending change (create). Pass savepoint=True when
+    the session holds other changes that have to survive (update).
+    """
+    for attempt in range(1, MAX_SLUG_ATTEMPTS + 1):
+        slug = base_slug if attempt == 1 else f"{base_slug}-{attempt}"
+        try:
+            if savepoint:
+                # begin_nested() flushes the other pending changes first; only the slug is retried
+                with db.session.begin_nested():
+                    post.slug = slug
+                    db.session.add(post)
+            else:
+                post.slug = slug
+                db.session.add(post)
+                db.session.flush()
+            return True
+        except IntegrityError as e:
+            if not savepoint:
+                db.session.rollback()
+            if not _is_slug_conflict(e):
+                raise
+    return False
@@ -0,0 +1,234 @@
+"""
+Tests for the batched audit log writer (async mode, write-ahead file
+replay, back-pressure when the queue is full), the paginated admin audit
+endpoint and archival of old entries.
+"""
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, inspect, text
+
+from audit import audit_sink, archive_audit_logs
+from models import db, AuditLog, User
+from schema import upgrade_schema
+from flask_jwt_extended import create_access_token
+
+
+
+@pytest.fixture
+def setup_audit(make_app):
+    """setup_audit(**config) -> (app, tokens) on a file database"""
+    def factory(**config):
+        # The writer thread needs its own connection, which an in-memory SQLite database can't share
+        database = os.path.join(tempfile.mkdtemp(prefix='audit_'), 'blog.db')
+        return make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}', AUDIT_FLUSH_INTERVAL=0.05, **config)
+    return factory
+
+
+def audit_actions(app):
+    with app.app_context():
+        return [a for (a,) in db.session.query(AuditLog.action).order_by(AuditLog.id)]
+
+
+def test_like_writes_audit_in_background(setup_audit):
+    app, tokens = setup_audit(AUDIT_MODE='async')
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+
+    # Statements issued on the request thread (the writer thread runs concurrently)
+    on_request = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if threading.current_thread() is threading.main_thread():
+            on_request.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        assert client.post('/api/posts/3/like', headers=editor).status_code == 200
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    assert on_request and not any('audit_logs' in s for s in on_request)
+
+    for post_id in range(4, 14):
+        client.post(f'/api/posts/{post_id}/like', headers=editor)
+    assert audit_sink.flush()
+    actions = audit_actions(app)
+    assert actions == [f'Liked post: Post {i}' for i in range(2, 13)]
+    audit_sink.shutdown()
+
+
+def wal_files(wal_dir):
+    return sorted(os.listdir(wal_dir))
+
+
+def test_wal_replays_only_uncommitted_events(setup_audit):
+    wal_dir = tempfile.mkdtemp(prefix='audit_wal_')
+    app, _ = setup_audit(AUDIT_MODE='wal', AUDIT_WAL_DIR=wal_dir)
+    with app.app_context():
+        audit_sink.record(1, 'Logged in')
+    assert audit_sink.flush()
+    assert audit_actions(app) == ['Logged in']
+    # This process's segment records that its one event is committed
+    [segment, committed] = wal_files(wal_dir)
+    assert segment.startswith(f'audit-{os.getpid()}-') and committed == segment + '.committed'
+    with open(os.path.join(wal_dir, committed)) as f:
+        assert f.read() == '1'
+
+    # Simulate a crashed worker: one event committed, one that never reached the database, a torn line
+    crashed = os.path.join(wal_dir, 'audit-1-dead.wal')
+    with open(crashed, 'w') as f:
+        f.write('{"user_id": 1, "action": "Committed", "timestamp": "2026-01-01T00:00:00"}\n'
+                '{"user_id": 1, "action": "Logged out", "timestamp": "2026-01-01T00:00:01"}\n{"user_id": 1, "ac')
+    with open(crashed + '.committed', 'w') as f:
+        f.write('1')
+    audit_sink.shutdown()
+    audit_sink.init_app(app)
+    assert audit_sink.flush()
+    assert audit_actions(app) == ['Logged in', 'Logged out']
+    # Both old segments were fully committed and removed; only the new, empty one is left
+    [segment] = wal_files(wal_dir)
+    assert os.path.getsize(os.path.join(wal_dir, segment)) == 0
+
+
+def test_wal_segments_rotate_and_are_deleted(setup_audit):
+    wal_dir = tempfile.mkdtemp(prefix='audit_wal_')
+    app, _ = setup_audit(AUDIT_MODE='wal', AUDIT_WAL_DIR=wal_dir, AUDIT_WAL_SEGMENT_EVENTS=2)
+    with app.app_context():
+        for i in range(5):
+            audit_sink.record(1, f'event {i}')
+    assert audit_sink.flush()
+    assert audit_actions(app) == [f'event {i}' for i in range(5)]
+    # Two full segments deleted once committed; the active one holds the fifth event
+    [segment, committed] = wal_files(wal_dir)
+    with open(os.path.join(wal_dir, segment)) as f:
+        assert [json.loads(line)['action'] for line in f] == ['event 4']
+
+
+def test_rejected_events_are_dead_lettered_and_replayed(setup_audit):
+    wal_dir = tempfile.mkdtemp(prefix='audit_wal_')
+    dead_letter = os.path.join(wal_dir, 'dead.ndjson')
+    app, _ = setup_audit(AUDIT_MODE='wal', AUDIT_WAL_DIR=wal_dir, AUDIT_WRITE_ATTEMPTS=2,
+                         AUDIT_DEAD_LETTER_PATH=dead_letter)
+    with app.app_context():
+        audit_sink.record(1, 'before')
+        audit_sink.record(None, 'no user')  # violates audit_logs.user_id NOT NULL
+        audit_sink.record(1, 'after')
+    # The writer gives up on the batch, writes the good events and moves on
+    assert audit_sink.flush()
+    with app.app_context():
+        audit_sink.record(1, 'later')
+    assert audit_sink.flush()
+    assert audit_actions(app) == ['before', 'after', 'later']
+    with open(dead_letter) as f:
+        [entry] = [json.loads(line) for line in f]
+    assert entry['event']['action'] == 'no user' and 'NOT NULL' in entry['error']
+
+    # Only the rejected event is left to replay after a restart
+    [segment, committed] = wal_files(wal_dir)[:2]
+    with open(os.path.join(wal_dir, committed)) as f:
+        assert f.read() == '1 2 3'
+    audit_sink.shutdown()
+    audit_sink.init_app(app)
+    assert audit_sink.flush()
+    assert audit_actions(app) == ['before', 'after', 'later']
+    with open(dead_letter) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_full_queue_falls_back_to_request_transaction(setup_audit):
+    app, _ = setup_audit(AUDIT_MODE='async', AUDIT_QUEUE_SIZE=1, AUDIT_ENQUEUE_TIMEOUT=0)
+    audit_sink._start = lambda: None  # no writer, so the queue stays full
+    try:
+        with app.app_context():
+            audit_sink.record(1, 'queued')
+            audit_sink.record(1, 'overflow')
+            db.session.commit()
+    finally:
+        del audit_sink._start
+    assert audit_actions(app) == ['overflow']
+
+
+def seed_audit_logs(app, count):
+    """`count` entries an hour apart, alternating between two users and action types"""
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', password_hash='x', role='admin')
+        db.session.add(admin)
+        db.session.flush()
+        start = datetime(2026, 1, 1)
+        db.session.add_all([
+            AuditLog(user_id=1 + i % 2, action=f'event {i}', action_type=('post_like', 'login')[i % 2],
+                     timestamp=start + timedelta(hours=i))
+            for i in range(count)
+        ])
+        db.session.commit()
+        return create_access_token(identity=str(admin.id), additional_claims={'role': 'admin'})
+
+
+def test_admin_audit_pagination_and_filters(app, count_queries):
+    token = seed_audit_logs(app, 50)
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # The newest entries, usernames joined in one query
+    with count_queries(app) as statements:
+        page = client.get('/api/admin/audit?limit=20', headers=headers).get_json()
+    logs = page['logs']
+    assert [log['action'] for log in logs] == [f'event {i}' for i in range(49, 29, -1)] and page['next_cursor']
+    assert logs[0]['username'] == 'reader' and logs[1]['username'] == 'editor'
+    assert len([s for s in statements if 'audit_logs' in s]) == 1
+
+    seen, cursor = [], ''
+    while cursor is not None:
+        page = client.get(f'/api/admin/audit?limit=7&action_type=login&cursor={cursor}', headers=headers).get_json()
+        seen.extend(log['action'] for log in page['logs'])
+        cursor = page['next_cursor']
+    assert seen == [f'event {i}' for i in range(49, 0, -2)]
+
+    window = client.get('/api/admin/audit?user_id=1&since=2026-01-01T10:00:00&until=2026-01-01T20:00:00',
+                        headers=headers).get_json()
+    assert [log['action'] for log in window['logs']] == [f'event {i}' for i in (18, 16, 14, 12, 10)]
+    assert window['next_cursor'] is None
+
+    # Older clients can still ask for a bare list
+    legacy = client.get('/api/admin/audit?limit=3&format=list', headers=headers).get_json()
+    assert [log['action'] for log in legacy] == ['event 49', 'event 48', 'event 47']
+
+    assert client.get('/api/admin/audit?cursor=nope', headers=headers).status_code == 400
+    assert client.get('/api/admin/audit?action_type=nope', headers=headers).status_code == 400
+
+
+def test_archive_moves_old_entries_to_monthly_files(app):
+    seed_audit_logs(app, 24 * 45)  # 2026-01-01 to 2026-02-14
+    archive_dir = tempfile.mkdtemp(prefix='audit_archive_')
+
+    with app.app_context():
+        archived = archive_audit_logs(datetime(2026, 2, 10), archive_dir, batch_size=100)
+        remaining = AuditLog.query.count()
+        oldest = db.session.query(db.func.min(AuditLog.timestamp)).scalar()
+    assert archived == 24 * 40 and remaining == 24 * 5 and oldest == datetime(2026, 2, 10)
+
+    with gzip.open(os.path.join(archive_dir, 'audit-2026-01.ndjson.gz'), 'rt') as f:
+        january = [json.loads(line) for line in f]
+    with gzip.open(os.path.join(archive_dir, 'audit-2026-02.ndjson.gz'), 'rt') as f:
+        february = [json.loads(line) for line in f]
+    assert len(january) == 24 * 31 and len(february) == 24 * 9
+    assert january[0] == {'id': 1, 'user_id': 1, 'action': 'event 0', 'action_type': 'post_like',
+                          'timestamp': '2026-01-01T00:00:00'}
+
+
+def test_upgrade_adds_and_classifies_action_type(app):
+    with app.app_context():
+        db.session.execute(text("DROP INDEX ix_audit_logs_type_timestamp_id"))
+        db.session.execute(text("ALTER TABLE audit_logs DROP COLUMN action_type"))
+        db.session.execute(text(
+            "INSERT INTO audit_logs (user_id, action, timestamp) VALUES "
+            "(1, 'Logged in', '2025-01-01'), (1, 'Unliked post: Post 1', '2025-01-01'), (1, 'Something else', '2025-01-01')"
+        ))
+        db.session.commit()
+        changes = upgrade_schema()
+        assert changes[:2] == ['added audit_logs.action_type', 'created index ix_audit_logs_type_timestamp_id']
+        assert [row.action_type for row in AuditLog.query.order_by(AuditLog.id)] == ['login', 'post_unlike', None]
+        assert 'ix_audit_logs_type_timestamp_id' in {i['name'] for i in inspect(db.engine).get_indexes('audit_logs')}
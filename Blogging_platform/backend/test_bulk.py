@@ -0,0 +1,110 @@
+"""
+Tests for bulk NDJSON import/export: batching, bulk slug and category
+resolution, per-line errors, and the streamed export round trip.
+"""
+import json
+
+from models import db, Post, Category, AuditLog
+from bulk import PostImporter
+import search
+
+
+def ndjson(*rows):
+    return "\n".join(row if isinstance(row, str) else json.dumps(row) for row in rows) + "\n"
+
+
+def test_import_reports_errors_and_resolves_slugs(app, tokens, count_queries):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    with app.app_context():
+        db.session.add(Category(name='Design'))
+        db.session.commit()
+        audit_rows = AuditLog.query.count()
+
+    body = ndjson(
+        {"title": "Migrated grids", "content": "<p>Layout notes</p>", "category": "Design", "published": True},
+        {"title": "Post 0", "content": "Same title as a seeded post"},
+        '{"title": "broken',
+        {"title": "No body"},
+        "",
+        {"title": "Twice", "content": "a", "created_at": "2020-01-02T03:04:05"},
+        {"title": "Twice", "content": "b", "category": "Gardening"},
+        {"title": "Twice", "content": "c"},
+        {"title": "Quoted flag", "content": "d", "published": "false"},
+    )
+    with count_queries(app) as statements:
+        response = client.post('/api/posts/import?batch_size=2', data=body,
+                               content_type='application/x-ndjson', headers=editor)
+    assert response.status_code == 200
+    report = response.get_json()
+    assert report["imported"] == 4 and report["failed"] == 4
+    assert [(e["line"], e["error"].split(':')[0]) for e in report["errors"]] == [
+        (3, "Invalid JSON"), (4, "Title and content are required"), (7, "Unknown category"),
+        (9, "published must be true or false")
+    ]
+    # One INSERT per batch, not per post
+    assert sum(s.startswith('INSERT INTO posts') for s in statements) == 3
+
+    with app.app_context():
+        imported = {p.slug: p for p in Post.query.filter(Post.id > 30)}
+        assert sorted(imported) == ['migrated-grids', 'post-0-2', 'twice', 'twice-2']
+        assert imported['migrated-grids'].excerpt == 'Layout notes'
+        assert imported['migrated-grids'].category.name == 'Design'
+        assert imported['twice'].created_at.year == 2020
+        assert [m[0] for m in search.search_posts('grids', 10, 0)] == [imported['migrated-grids'].id]
+        assert AuditLog.query.count() == audit_rows + 3
+
+
+def test_wrongly_typed_fields_are_reported_per_line(app):
+    with app.app_context():
+        report = PostImporter(user_id=1).run([
+            json.dumps({"title": "Numbered", "content": "x", "slug": 42}),
+            json.dumps({"title": "Listed", "content": "x", "category": ["Design"]}),
+            json.dumps({"title": "Mapped", "content": "x", "category": {"name": "Design"}}),
+            '{"title": "Bytes", "content": "caf\xe9"}'.encode('latin-1'),
+            json.dumps({"title": "Fine", "content": "x"}).encode(),
+        ])
+        assert report["imported"] == 1 and report["failed"] == 4
+        assert [(e["line"], e["error"].split(':')[0]) for e in report["errors"]] == [
+            (1, "slug must be a string"), (2, "category must be a category name"),
+            (3, "category must be a category name"), (4, "Invalid UTF-8")
+        ]
+
+
+def test_concurrent_slug_clash_falls_back_to_row_by_row(app):
+    with app.app_context():
+        importer = PostImporter(user_id=1)
+        importer._taken_slugs = lambda rows: set()  # as if post-1 was created after the lookup
+        report = importer.run([json.dumps({"title": "Post 1", "content": "x"}),
+                               json.dumps({"title": "Fresh", "content": "y"})])
+        assert report["imported"] == 2
+        assert {p.slug for p in Post.query.filter(Post.id > 30)} == {'post-1-2', 'fresh'}
+
+
+def test_other_integrity_errors_are_reported_per_line(app):
+    with app.app_context():
+        # No author: the batch INSERT and then every row fail on posts.user_id NOT NULL
+        report = PostImporter(user_id=None).run([json.dumps({"title": "Orphan", "content": "x"})])
+        assert report["imported"] == 0 and report["failed"] == 1
+        assert report["errors"][0]["line"] == 1 and report["errors"][0]["error"].startswith("Rejected by the database")
+        assert Post.query.filter_by(slug='orphan').count() == 0
+
+
+def test_export_streams_importable_lines(app, tokens):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+
+    response = client.get('/api/posts/export', headers=editor)
+    assert response.status_code == 200 and response.is_streamed
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # Editors get only their own posts
+    assert [row["slug"] for row in rows] == [f'post-{i}' for i in range(0, 30, 6)]
+    assert rows[0]["content"] == 'x' * 500 and rows[0]["author"] == 'editor'
+
+    reimported = client.post('/api/posts/import', data=ndjson(*rows),
+                             content_type='application/x-ndjson', headers=editor).get_json()
+    assert reimported["imported"] == 5 and reimported["failed"] == 0
+    assert client.get('/api/posts/export', headers={
+        'Authorization': f"Bearer {tokens['reader']}"
+    }).status_code == 403
+
@@ -0,0 +1,136 @@
+"""
+Tests for paginated, threaded comments: cursor pages, reply previews and
+a query count that doesn't grow with the number of comments or authors.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text
+
+from counters import reconcile_counters
+from models import db, Comment, Post, User
+from schema import upgrade_schema
+
+
+def seed_thread(app, post_id, top_level, replies_each):
+    """`top_level` comments a minute apart, each with `replies_each` replies, from rotating authors"""
+    with app.app_context():
+        users = [u.id for u in User.query.all()]
+        start = datetime(2026, 1, 1)
+        for i in range(top_level):
+            top = Comment(content=f'comment {i}', post_id=post_id, user_id=users[i % len(users)],
+                          created_at=start + timedelta(minutes=i))
+            db.session.add(top)
+            db.session.flush()
+            db.session.add_all([
+                Comment(content=f'reply {i}.{j}', post_id=post_id, parent_id=top.id,
+                        user_id=users[(i + j) % len(users)], created_at=top.created_at + timedelta(seconds=j + 1))
+                for j in range(replies_each)
+            ])
+        post = db.session.get(Post, post_id)
+        post.comment_count = top_level * (1 + replies_each)
+        db.session.commit()
+
+
+def test_comment_pages_cost_the_same(app, count_queries):
+    seed_thread(app, 1, 5, 1)
+    seed_thread(app, 2, 120, 6)
+    client = app.test_client()
+
+    counts = []
+    for url in ('/api/comments/post/1', '/api/comments/post/2?per_page=40&replies=5'):
+        with count_queries(app) as statements:
+            assert client.get(url).status_code == 200
+        counts.append(len(statements))
+    print(f"GET /api/comments/post/<id>: queries per page {counts}")
+    assert counts[0] == counts[1] == 2
+
+    seen, cursor = [], ''
+    while cursor is not None:
+        data = client.get(f'/api/comments/post/2?per_page=50&cursor={cursor}').get_json()
+        seen.extend(c['content'] for c in data['comments'])
+        cursor = data['next_cursor']
+    assert seen == [f'comment {i}' for i in range(120)]
+
+    first = client.get('/api/comments/post/2?per_page=1').get_json()['comments'][0]
+    assert first['reply_count'] == 6 and [r['content'] for r in first['replies']] == ['reply 0.0', 'reply 0.1', 'reply 0.2']
+
+    # The rest of a thread pages the same way
+    replies = client.get(f"/api/comments/post/2/thread/{first['id']}?per_page=4").get_json()
+    assert [r['content'] for r in replies['replies']] == [f'reply 0.{j}' for j in range(4)]
+    more = client.get(f"/api/comments/post/2/thread/{first['id']}?cursor={replies['next_cursor']}").get_json()
+    assert [r['content'] for r in more['replies']] == ['reply 0.4', 'reply 0.5'] and more['next_cursor'] is None
+
+
+def test_replies_and_thread_deletion(app, tokens):
+    client = app.test_client()
+    reader = {'Authorization': f"Bearer {tokens['reader']}"}
+
+    top = client.post('/api/comments/', json={'post_id': 1, 'content': 'Top'}, headers=reader).get_json()['comment']
+    reply = client.post('/api/comments/', json={'post_id': 1, 'content': 'Reply', 'parent_id': top['id']},
+                        headers=reader).get_json()['comment']
+    # Replying to a reply stays in the same thread
+    nested = client.post('/api/comments/', json={'post_id': 1, 'content': 'Nested', 'parent_id': reply['id']},
+                         headers=reader).get_json()['comment']
+    assert reply['parent_id'] == top['id'] and nested['parent_id'] == top['id']
+    assert client.post('/api/comments/', json={'post_id': 2, 'content': 'x', 'parent_id': top['id']},
+                       headers=reader).status_code == 404
+
+    comments = client.get('/api/comments/post/1').get_json()['comments']
+    assert len(comments) == 1 and comments[0]['reply_count'] == 2
+    assert client.get('/api/posts/post-0').get_json()['post']['comment_count'] == 3
+
+    assert client.delete(f"/api/comments/{top['id']}", headers=reader).status_code == 200
+    assert client.get('/api/comments/post/1').get_json()['comments'] == []
+    assert client.get('/api/posts/post-0').get_json()['post']['comment_count'] == 0
+    with app.app_context():
+        assert Comment.query.count() == 0
+
+
+def test_flagging_a_thread_updates_the_count(app, tokens):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    reader = {'Authorization': f"Bearer {tokens['reader']}"}
+    comment_count = lambda: client.get('/api/posts/post-0').get_json()['post']['comment_count']
+    with app.app_context():
+        reconcile_counters()  # the seed data bypasses the routes
+
+    top = client.post('/api/comments/', json={'post_id': 1, 'content': 'Top'}, headers=reader).get_json()['comment']
+    replies = [client.post('/api/comments/', json={'post_id': 1, 'content': f'Reply {i}', 'parent_id': top['id']},
+                           headers=reader).get_json()['comment'] for i in range(2)]
+    assert client.post('/api/comments/', json={'post_id': 1, 'content': 'x', 'parent_id': 'abc'},
+                       headers=reader).status_code == 400
+    assert comment_count() == 3
+
+    # Hiding one reply, then the thread, counts each comment once
+    client.put(f"/api/comments/{replies[0]['id']}/flag", headers=editor)
+    assert comment_count() == 2
+    client.put(f"/api/comments/{top['id']}/flag", headers=editor)
+    assert comment_count() == 0
+    # A reply under a hidden parent stays hidden whatever its own state
+    client.put(f"/api/comments/{replies[0]['id']}/flag", headers=editor)
+    assert comment_count() == 0
+    with app.app_context():
+        assert reconcile_counters() == 0
+
+    client.put(f"/api/comments/{top['id']}/flag", headers=editor)
+    assert comment_count() == 3
+    with app.app_context():
+        assert reconcile_counters() == 0
+
+
+def test_upgrade_adds_parent_id(app):
+    with app.app_context():
+        db.session.execute(text("DROP TABLE comments"))
+        db.session.execute(text(
+            "CREATE TABLE comments (id INTEGER PRIMARY KEY, content TEXT NOT NULL, created_at DATETIME, "
+            "is_approved BOOLEAN, user_id INTEGER NOT NULL REFERENCES users(id), "
+            "post_id INTEGER NOT NULL REFERENCES posts(id))"
+        ))
+        db.session.commit()
+        changes = upgrade_schema()
+        assert 'added comments.parent_id' in changes
+        assert {'ix_comments_post_approved_parent_created', 'ix_comments_parent_approved_created'} <= {
+            i['name'] for i in inspect(db.engine).get_indexes('comments')
+        }
+    client = app.test_client()
+    assert client.get('/api/comments/post/1').get_json()['comments'] == []
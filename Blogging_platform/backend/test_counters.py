@@ -0,0 +1,65 @@
+"""
+Tests for the denormalized like/comment counters on Post, their repair job,
+and adding them to a database created before they existed.
+"""
+from sqlalchemy import text
+
+from counters import reconcile_counters
+from models import db, Post, Comment
+from schema import upgrade_schema
+
+
+def counts(app, post_id=1):
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        return post.like_count, post.comment_count
+
+
+def test_likes_and_comments_keep_counters_current(app, tokens):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    reader = {'Authorization': f"Bearer {tokens['reader']}"}
+    with app.app_context():
+        reconcile_counters()  # the seed data bypasses the routes
+    assert counts(app) == (1, 0)
+
+    client.post('/api/posts/1/like', headers=editor)
+    assert counts(app) == (2, 0)
+    client.post('/api/posts/1/like', headers=editor)  # toggles back
+    assert counts(app) == (1, 0)
+
+    comment_id = client.post('/api/comments/', json={'post_id': 1, 'content': 'Hi'},
+                             headers=reader).get_json()['comment']['id']
+    assert counts(app) == (1, 1)
+    client.put(f'/api/comments/{comment_id}/flag', headers=editor)
+    assert counts(app) == (1, 0)
+
+
+def test_reconcile_repairs_drift(app):
+    with app.app_context():
+        reconcile_counters()
+        db.session.add(Comment(content='Hidden', user_id=2, post_id=2, is_approved=False))
+        db.session.add(Comment(content='Shown', user_id=2, post_id=2))
+        db.session.execute(text("UPDATE posts SET like_count = 7 WHERE id IN (1, 3)"))
+        db.session.commit()
+
+        assert reconcile_counters(batch_size=2) == 3
+        assert [(p.like_count, p.comment_count) for p in Post.query.filter(Post.id <= 3).order_by(Post.id)] == [
+            (1, 0), (1, 1), (1, 0)
+        ]
+        assert reconcile_counters() == 0
+
+
+def test_upgrade_adds_counters_to_an_old_database(app):
+    with app.app_context():
+        # The posts table as it was before the counters (SQLite >= 3.35 can drop columns)
+        db.session.execute(text("DROP INDEX ix_posts_published_created_id"))
+        db.session.execute(text("ALTER TABLE posts DROP COLUMN like_count"))
+        db.session.execute(text("ALTER TABLE posts DROP COLUMN comment_count"))
+        db.session.commit()
+
+        changes = upgrade_schema()
+        assert changes == ['added posts.like_count', 'added posts.comment_count',
+                           'created index ix_posts_published_created_id', 'recomputed like/comment counters']
+        assert db.session.get(Post, 1).like_count == 1
+        assert upgrade_schema() == []
@@ -0,0 +1,77 @@
+"""
+Tests for the engine options built from DB_* settings and the pool /
+slow-query counters behind /api/admin/db-metrics.
+"""
+import os
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import exc, text
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from models import db
+from dbmetrics import InstrumentedQueuePool, db_metrics, engine_options
+
+
+def test_engine_options():
+    assert engine_options('sqlite://') == {'pool_pre_ping': True, 'query_cache_size': 1200}
+
+    options = engine_options('postgresql://blog@db/blog', pool_size=5, max_overflow=2, pool_recycle=600)
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert (options['pool_size'], options['max_overflow'], options['pool_recycle']) == (5, 2, 600)
+    assert 'connect_args' not in options  # psycopg2 can't prepare statements
+    assert engine_options('postgresql+psycopg://blog@db/blog')['connect_args'] == {'prepare_threshold': 5}
+
+
+def test_options_follow_the_uri_the_app_ends_up_with():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'DB_POOL_SIZE': 3})
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_pre_ping': True, 'query_cache_size': 1200}
+
+    database = os.path.join(tempfile.mkdtemp(prefix='dbmetrics_'), 'blog.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'DB_POOL_SIZE': 3})
+    with app.app_context():
+        assert db.engine.pool.size() == 3
+
+
+def test_pool_wait_timeouts_and_slow_queries():
+    # A one-connection pool on a file database, so a second checkout has to wait
+    database = os.path.join(tempfile.mkdtemp(prefix='dbmetrics_'), 'blog.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}', 'TESTING': True,
+        'DB_POOL_SIZE': 1, 'DB_MAX_OVERFLOW': 0, 'DB_POOL_TIMEOUT': 1,
+        'DB_SLOW_QUERY_MS': 0, 'DB_SLOW_QUERY_LOG': 3
+    })
+
+    with app.app_context():
+        db.create_all()
+        token = create_access_token(identity='1', additional_claims={'role': 'admin'})
+        engine = db.engine
+
+    held = engine.connect()
+    errors = []
+    def checkout():
+        try:
+            engine.connect().close()
+        except exc.TimeoutError as e:
+            errors.append(e)
+    waiter = threading.Thread(target=checkout)
+    waiter.start()
+    waiter.join()
+    held.execute(text("SELECT 1"))
+    # A failing statement must not leave its start time behind
+    with pytest.raises(exc.OperationalError):
+        held.execute(text("SELECT * FROM no_such_table"))
+    assert held.info['query_start'] == []
+    held.close()
+    assert len(errors) == 1
+
+    metrics = app.test_client().get('/api/admin/db-metrics', headers={'Authorization': f"Bearer {token}"}).get_json()
+    assert metrics["pool"]["class"] == 'InstrumentedQueuePool'
+    assert (metrics["pool"]["size"], metrics["pool"]["max_overflow"], metrics["pool"]["timeout"]) == (1, 0, 1)
+    counters = metrics["counters"]
+    assert counters["checkout_timeouts"] == 1 and counters["checkout_wait_ms_max"] >= 1000
+    assert counters["slow_queries"] == counters["queries"] > 0 and counters["query_errors"] == 1
+    assert len(metrics["recent_slow_queries"]) == 3
+    assert app.test_client().get('/api/admin/db-metrics').status_code == 401
@@ -0,0 +1,53 @@
+"""
+Tests for `liked_by_me` on feeds: the shared cached feed body is annotated
+per reader from the liked-post cache, with at most one IN query per page.
+"""
+
+from likes import liked_cache
+
+
+def test_feed_is_annotated_for_signed_in_readers(app, tokens, count_queries):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    reader = {'Authorization': f"Bearer {tokens['reader']}"}
+
+    anonymous = client.get('/api/posts?cursor=')
+    assert all('liked_by_me' not in p for p in anonymous.get_json()['posts'])
+
+    # The reader liked every post: one IN query on top of the (now cached) feed
+    with count_queries(app) as statements:
+        posts = client.get('/api/posts?cursor=', headers=reader).get_json()['posts']
+    assert [p['liked_by_me'] for p in posts] == [True] * 10
+    assert len(statements) == 1 and ' IN ' in statements[0]
+
+    # Known posts are answered from the cache
+    with count_queries(app) as statements:
+        response = client.get('/api/posts?cursor=', headers=reader)
+    assert statements == []
+    assert response.headers['Vary'] == 'Authorization'
+    assert response.headers['ETag'] != anonymous.headers['ETag']
+    assert client.get('/api/posts?cursor=', headers={
+        **reader, 'If-None-Match': response.headers['ETag']
+    }).status_code == 304
+
+    # Toggling a like updates the cached set, so the cached feed shows it at once
+    first = posts[0]['id']
+    client.post(f'/api/posts/{first}/like', headers=editor)
+    client.post(f'/api/posts/{first}/like', headers=reader)
+    editor_posts = client.get('/api/posts?cursor=', headers=editor).get_json()['posts']
+    reader_posts = client.get('/api/posts?cursor=', headers=reader).get_json()['posts']
+    assert [p['id'] for p in editor_posts if p['liked_by_me']] == [first]
+    assert [p['id'] for p in reader_posts if not p['liked_by_me']] == [first]
+
+
+def test_cache_evicts_least_recently_used_users(app):
+    app.config['LIKED_CACHE_USERS'] = 2
+    liked_cache.init_app(app)
+    with app.app_context():
+        assert liked_cache.liked_among(2, [1, 2]) == {1, 2}
+        liked_cache.liked_among(1, [1])
+        liked_cache.liked_among(2, [3])
+        liked_cache.liked_among(3, [1])
+        assert list(liked_cache._data) == [2, 3]
+        assert liked_cache._data[2][1] == {1, 2, 3}
+
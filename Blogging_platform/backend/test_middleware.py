@@ -0,0 +1,45 @@
+"""
+Tests for the role-check middleware: one token verification per request
+and structured, sampled auth log lines.
+"""
+import json
+import logging
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(json.loads(record.getMessage()))
+
+
+def test_token_verified_once_and_decisions_logged(app, tokens, client):
+
+    # Every JWT decode asks the manager for the key, so this counts verifications
+    decodes = []
+    manager = app.extensions['flask-jwt-extended']
+    manager.decode_key_loader(lambda header, payload: decodes.append(1) or app.config['JWT_SECRET_KEY'])
+
+    capture = Capture()
+    logging.getLogger('auth').addHandler(capture)
+    try:
+        app.config['AUTH_LOG_SAMPLE_RATE'] = 0
+        editor = {'Authorization': f"Bearer {tokens['editor']}"}
+        assert client.get('/api/posts/my_posts', headers=editor).status_code == 200
+        assert len(decodes) == 1 and capture.lines == []
+
+        reader = {'Authorization': f"Bearer {tokens['reader']}"}
+        assert client.get('/api/posts/my_posts', headers=reader).status_code == 403
+        assert capture.lines == [{
+            "event": "auth", "outcome": "forbidden", "user_id": "2", "role": "reader",
+            "required": ["admin", "editor"], "method": "GET", "path": "/api/posts/my_posts"
+        }]
+
+        app.config['AUTH_LOG_SAMPLE_RATE'] = 1
+        client.get('/api/posts/my_posts', headers=editor)
+        assert capture.lines[-1]["outcome"] == "allowed" and capture.lines[-1]["user_id"] == "1"
+    finally:
+        logging.getLogger('auth').removeHandler(capture)
+
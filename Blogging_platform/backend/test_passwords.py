@@ -0,0 +1,89 @@
+"""
+Tests for the password hashing policy: transparent rehash on login (never
+to weaker parameters) and the bounded hashing pool.
+"""
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from models import db, User
+from passwords import password_hasher
+
+
+@pytest.fixture
+def setup_policy(make_app):
+    def setup(**config):
+        app, _ = make_app(PASSWORD_HASH_METHOD='pbkdf2:sha256:2000', **config)
+        with app.app_context():
+            user = User.query.filter_by(username='reader').first()
+            user.password_hash = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+            db.session.commit()
+        return app
+    return setup
+
+
+def stored_method(app):
+    with app.app_context():
+        return User.query.filter_by(username='reader').first().password_hash.split('$', 1)[0]
+
+
+def test_login_upgrades_outdated_hash(setup_policy):
+    app = setup_policy()
+    client = app.test_client()
+
+    assert client.post('/api/auth/login', json={'username': 'reader', 'password': 'wrong'}).status_code == 401
+    assert stored_method(app) == 'pbkdf2:sha256:1000'
+
+    assert client.post('/api/auth/login', json={'username': 'reader', 'password': 'secret'}).status_code == 200
+    assert stored_method(app) == 'pbkdf2:sha256:2000'
+    assert client.post('/api/auth/login', json={'username': 'reader', 'password': 'secret'}).status_code == 200
+
+    # Switching scheme works the same way
+    app.config['PASSWORD_HASH_METHOD'] = 'scrypt:16384:8:1'
+    password_hasher.init_app(app)
+    assert client.post('/api/auth/login', json={'username': 'reader', 'password': 'secret'}).status_code == 200
+    assert stored_method(app) == 'scrypt:16384:8:1'
+
+    response = client.post('/api/auth/register', json={'username': 'new', 'email': 'new@example.com', 'password': 'pw'})
+    assert response.status_code == 201
+    with app.app_context():
+        assert User.query.filter_by(username='new').first().password_hash.startswith('scrypt:16384:8:1$')
+
+
+def test_stronger_hashes_are_kept(setup_policy):
+    app = setup_policy()
+    with app.app_context():
+        user = User.query.filter_by(username='reader').first()
+        user.password_hash = generate_password_hash('secret', method='pbkdf2:sha256:5000')
+        db.session.commit()
+    assert app.test_client().post('/api/auth/login', json={'username': 'reader', 'password': 'secret'}).status_code == 200
+    assert stored_method(app) == 'pbkdf2:sha256:5000'
+
+    assert not password_hasher.needs_rehash(generate_password_hash('x', method='pbkdf2:sha256:2000'))
+    assert password_hasher.needs_rehash(generate_password_hash('x', method='pbkdf2:sha512:5000'))
+    assert password_hasher.needs_rehash(generate_password_hash('x', method='scrypt:16384:8:1'))
+
+
+def test_default_policy_keeps_existing_hashes(make_app):
+    # The default is the method the app always used, at werkzeug's current iteration count
+    make_app()
+    assert not password_hasher.needs_rehash(generate_password_hash('x', method='pbkdf2:sha256'))
+    assert password_hasher.needs_rehash(generate_password_hash('x', method='pbkdf2:sha256:600000'))
+    assert password_hasher.hash('x').split('$', 1)[0] == generate_password_hash('x', method='pbkdf2:sha256').split('$', 1)[0]
+
+    make_app(PASSWORD_HASH_METHOD='scrypt:16384:8:1')
+    assert not password_hasher.needs_rehash(generate_password_hash('x', method='scrypt:32768:8:1'))
+    assert password_hasher.needs_rehash(generate_password_hash('x', method='scrypt:16384:4:1'))
+
+
+def test_saturated_pool_rejects_logins(setup_policy):
+    app = setup_policy(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_WAIT=0)
+    client = app.test_client()
+
+    password_hasher._slots.acquire()  # another login is already hashing
+    try:
+        response = client.post('/api/auth/login', json={'username': 'reader', 'password': 'secret'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    finally:
+        password_hasher._slots.release()
+    assert client.post('/api/auth/login', json={'username': 'reader', 'password': 'secret'}).status_code == 200
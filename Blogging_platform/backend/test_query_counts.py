@@ -0,0 +1,87 @@
+"""
+Query-count regression test for the post listings.
+
+Runs the app against an in-memory SQLite database and fails if the number
+of SQL statements issued by a listing endpoint grows with the page size
+(i.e. an N+1 lookup crept back in).
+"""
+import re
+
+from models import db, User, Post, Like
+
+
+def queries_for(app, count_queries, url, token=None):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    client = app.test_client()
+    with count_queries(app) as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
+
+
+def test_listing_query_counts_are_constant(app, tokens, count_queries):
+
+    small = queries_for(app, count_queries, '/api/posts?per_page=5')
+    large = queries_for(app, count_queries, '/api/posts?per_page=25')
+    print(f"GET /api/posts: {small} queries for 5 posts, {large} for 25")
+    assert small == large == 1
+
+    # Offset pages don't count unless asked to
+    client = app.test_client()
+    last = client.get('/api/posts?per_page=7&page=5').get_json()
+    assert len(last['posts']) == 2 and last['has_more'] is False and 'total' not in last
+    counted = client.get('/api/posts?per_page=7&include_total=true').get_json()
+    assert (counted['total'], counted['pages'], counted['has_more']) == (30, 5, True)
+
+    # 5 of the 30 posts belong to 'editor'; add more to compare against
+    with app.app_context():
+        editor = User.query.filter_by(username='editor').first()
+        before = queries_for(app, count_queries, '/api/posts/my_posts', tokens['editor'])
+        for i in range(10):
+            db.session.add(Post(title=f'Draft {i}', slug=f'draft-{i}', content='draft', user_id=editor.id))
+        db.session.commit()
+    after = queries_for(app, count_queries, '/api/posts/my_posts', tokens['editor'])
+    print(f"GET /api/posts/my_posts: {before} queries before, {after} after adding drafts")
+    assert before == after
+
+    with app.app_context():
+        reader = User.query.filter_by(username='reader').first()
+        before = queries_for(app, count_queries, '/api/posts/liked', tokens['reader'])
+        Like.query.filter(Like.user_id == reader.id, Like.post_id > 10).delete()
+        db.session.commit()
+    after = queries_for(app, count_queries, '/api/posts/liked', tokens['reader'])
+    print(f"GET /api/posts/liked: {before} queries for 30 likes, {after} for 10")
+    assert before == after
+
+
+def test_feed_cursor_pages_cost_the_same(app, count_queries):
+    client = app.test_client()
+
+    seen, counts, cursor = [], [], ''
+    while cursor is not None:
+        with count_queries(app) as statements:
+            data = client.get(f'/api/posts?per_page=7&cursor={cursor}').get_json()
+        counts.append(len(statements))
+        seen.extend(p['id'] for p in data['posts'])
+        cursor = data['next_cursor']
+
+    print(f"GET /api/posts?cursor=: {len(counts)} pages, queries per page {counts}")
+    assert sorted(seen) == list(range(1, 31)) and len(seen) == len(set(seen))
+    assert len(set(counts)) == 1
+
+
+def test_listings_never_load_post_body(app, tokens, count_queries):
+    client = app.test_client()
+    body = re.compile(r'posts\.content\b|posts\.content_html\b')
+
+    for url, token in [('/api/posts', None), ('/api/posts?cursor=', None), ('/api/posts/liked', tokens['reader'])]:
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        with count_queries(app) as statements:
+            assert client.get(url, headers=headers).status_code == 200
+        assert not any(body.search(s) for s in statements), url
+
+    # The single-post page gets the full body and the author in one query
+    with count_queries(app) as statements:
+        post = client.get('/api/posts/post-1').get_json()['post']
+    assert post['content'] == 'x' * 500 and len(statements) == 1
+
@@ -0,0 +1,65 @@
+"""
+Tests for the excerpt / sanitized HTML / reading time stored with each post.
+"""
+
+from sqlalchemy import text
+
+from rendering import render_content, backfill_rendering
+from models import db, Post
+from schema import upgrade_schema
+
+
+def test_render_content():
+    body = ('<h1>Title</h1><p>Hello <strong>world</strong> &amp; '
+            '<a href="javascript:alert(1)" onclick="x()">link</a></p>'
+            '<script>alert(1)</script><img src="https://cdn.example.com/a.png" onerror="x()">'
+            '<p>' + 'word ' * 399 + '</p>')
+    excerpt, content_html, reading_time = render_content(body)
+
+    assert excerpt.startswith('Title Hello world &amp; link word')
+    assert excerpt.endswith('...') and len(excerpt) <= 160 and not excerpt.endswith(' ...')
+    assert '<script' not in content_html and 'alert' not in content_html
+    assert 'javascript:' not in content_html and 'onclick' not in content_html and 'onerror' not in content_html
+    assert '<a>link</a>' in content_html and '<img src="https://cdn.example.com/a.png">' in content_html
+    assert reading_time == 3  # 404 words at 200 wpm, rounded up
+
+    assert render_content('<p>Short</p>') == ('Short', '<p>Short</p>', 1)
+    assert render_content('<p><em>unclosed') == ('unclosed', '<p><em>unclosed</em></p>', 1)
+    assert render_content('') == ('', '', 0)
+
+
+def test_posts_store_rendered_fields(app, tokens):
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['editor']}"}
+
+    client.post('/api/posts', headers=headers, data={
+        'title': 'Rendered', 'content': '<p>First <b>draft</b></p><script>x()</script>', 'published': 'true'})
+    post = client.get('/api/posts/rendered').get_json()['post']
+    assert post['content_html'] == '<p>First <b>draft</b></p>' and post['reading_time'] == 1
+    assert client.get('/api/posts?per_page=1').get_json()['posts'][0]['excerpt'] == 'First draft'
+
+    client.put(f"/api/posts/{post['id']}", headers=headers, data={'content': '<p>Second</p>'})
+    assert client.get('/api/posts?per_page=1').get_json()['posts'][0]['excerpt'] == 'Second'
+
+    # Posts seeded without the derived fields are filled in by the backfill
+    with app.app_context():
+        assert Post.query.filter(Post.excerpt.is_(None)).count() == 30
+        assert backfill_rendering(batch_size=7) == 30
+        assert Post.query.filter(Post.excerpt.is_(None)).count() == 0
+        assert db.session.get(Post, 1).reading_time == 1
+
+
+def test_unrendered_posts_are_rendered_on_read(client):
+    # Seeded posts have no stored rendering yet
+    post = client.get('/api/posts/post-0').get_json()['post']
+    assert post['content_html'] == 'x' * 500 and post['reading_time'] == 1
+
+
+def test_upgrade_adds_and_fills_rendered_fields(app):
+    with app.app_context():
+        for column in ('excerpt', 'content_html', 'reading_time'):
+            db.session.execute(text(f"ALTER TABLE posts DROP COLUMN {column}"))
+        db.session.commit()
+        changes = upgrade_schema()
+        assert changes[-1] == 'rendered 30 posts'
+        assert Post.query.filter(Post.excerpt.is_(None)).count() == 0
@@ -0,0 +1,77 @@
+"""
+Tests for the public response cache: hits, ETag revalidation and
+write-driven invalidation, against both the in-process backend and a
+Redis stand-in.
+"""
+
+from cache import response_cache, RedisBackend
+
+
+class LocalRedis:
+    """Just enough of the redis-py API (GET, SET EX, INCR) for RedisBackend"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    def incr(self, key):
+        value = int(self.data.get(key, b'0')) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+
+def check_cache_behaviour(app, tokens, count_queries):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    reader = {'Authorization': f"Bearer {tokens['reader']}"}
+
+    first = client.get('/api/posts/post-0')
+    assert first.headers['X-Cache'] == 'MISS'
+    with count_queries(app) as statements:
+        second = client.get('/api/posts/post-0')
+    assert second.headers['X-Cache'] == 'HIT' and not statements
+    assert second.get_data() == first.get_data()
+
+    # Clients revalidate with the ETag
+    etag = first.headers['ETag']
+    assert client.get('/api/posts/post-0', headers={'If-None-Match': etag}).status_code == 304
+
+    # Commenting invalidates the comments list and the post (comment_count);
+    # like likes, it leaves the feed to its TTL
+    assert client.get('/api/comments/post/1').get_json()['comments'] == []
+    client.get('/api/posts')
+    client.post('/api/comments/', json={'post_id': 1, 'content': 'Nice'}, headers=reader)
+    client.post('/api/posts/1/like', headers=editor)
+    assert client.get('/api/posts').headers['X-Cache'] == 'HIT'
+    comments = client.get('/api/comments/post/1')
+    assert comments.headers['X-Cache'] == 'MISS' and len(comments.get_json()['comments']) == 1
+    post = client.get('/api/posts/post-0')
+    assert post.headers['X-Cache'] == 'MISS' and post.get_json()['post']['comment_count'] == 1
+    assert client.get('/api/posts/post-0', headers={'If-None-Match': etag}).status_code == 200
+
+    # Editing a post invalidates the feed and the old and new slugs
+    client.get('/api/posts')
+    client.put('/api/posts/1', data={'title': 'Renamed'}, headers=editor)
+    assert client.get('/api/posts/post-0').status_code == 404
+    assert client.get('/api/posts/renamed').get_json()['post']['title'] == 'Renamed'
+    assert client.get('/api/posts').headers['X-Cache'] == 'MISS'
+
+    # Unrelated entries stay cached
+    client.get('/api/posts/post-2')
+    client.post('/api/comments/', json={'post_id': 1, 'content': 'Again'}, headers=reader)
+    assert client.get('/api/posts/post-2').headers['X-Cache'] == 'HIT'
+
+
+def test_memory_backend(app, tokens, count_queries):
+    check_cache_behaviour(app, tokens, count_queries)
+
+
+def test_redis_backend(app, tokens, count_queries):
+    response_cache.backend = RedisBackend(LocalRedis())
+    check_cache_behaviour(app, tokens, count_queries)
+
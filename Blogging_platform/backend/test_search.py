@@ -0,0 +1,102 @@
+"""
+Tests for full-text search: ranking, prefix matching, escaped highlights,
+and keeping the index in step with edits and deletes.
+"""
+from sqlalchemy import text
+
+from models import db, Category, Post
+from search import search_posts
+from schema import upgrade_schema
+
+
+def create(client, headers, title, content):
+    response = client.post('/api/posts', data={'title': title, 'content': content, 'published': 'true'},
+                           headers=headers)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['post_id']
+
+
+def search(client, q):
+    response = client.get('/api/posts/search', query_string={'q': q})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['results']
+
+
+def test_ranking_and_prefix_matching(client, tokens):
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    create(client, editor, 'Gardening basics', '<p>Soil, water and a little patience.</p>')
+    create(client, editor, 'Weekend notes', '<p>Some gardening in the afternoon.</p>')
+
+    # A title match outranks a body match
+    assert [r['title'] for r in search(client, 'gardening')] == ['Gardening basics', 'Weekend notes']
+    # The last term matches as a prefix, so results show up while typing
+    assert [r['title'] for r in search(client, 'garden')] == ['Gardening basics', 'Weekend notes']
+    assert [r['title'] for r in search(client, 'weekend aftern')] == ['Weekend notes']
+    assert search(client, 'patien"ce OR *') == []
+    assert client.get('/api/posts/search').status_code == 400
+
+
+def test_markup_is_not_indexed_and_highlights_are_escaped(client, tokens):
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    create(client, editor, 'Tags & <b>markup</b>',
+           '<p class="intro">Escaping <strong>matters</strong>: a &lt;script&gt; tag is text here.</p>')
+
+    # Tag and attribute names in the body are not searchable
+    assert search(client, 'strong') == []
+    assert search(client, 'intro') == []
+
+    [result] = search(client, 'script')
+    assert result['snippet'] == 'Escaping matters: a &lt;<mark>script</mark>&gt; tag is text here.'
+    [result] = search(client, 'markup')
+    assert result['title_highlight'] == 'Tags &amp; &lt;b&gt;<mark>markup</mark>&lt;/b&gt;'
+
+
+def test_index_follows_edits_and_deletes(client, tokens):
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    post_id = create(client, editor, 'Draft title', '<p>Original wording</p>')
+    assert [r['id'] for r in search(client, 'original')] == [post_id]
+
+    client.put(f'/api/posts/{post_id}', data={'title': 'Final title', 'content': '<p>Revised wording</p>'},
+               headers=editor)
+    assert search(client, 'original') == [] and search(client, 'draft') == []
+    assert [r['id'] for r in search(client, 'revised')] == [post_id]
+    assert search(client, 'final')[0]['slug'] == 'final-title'
+
+    # Unpublishing takes a post out of search
+    client.put(f'/api/posts/{post_id}', data={'published': 'false'}, headers=editor)
+    assert search(client, 'revised') == []
+    client.put(f'/api/posts/{post_id}', data={'published': 'true'}, headers=editor)
+    assert [r['id'] for r in search(client, 'revised')] == [post_id]
+
+    client.delete(f'/api/posts/{post_id}', headers=editor)
+    assert search(client, 'revised') == []
+
+
+def test_category_must_be_a_known_id(client, tokens, app):
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    with app.app_context():
+        db.session.add(Category(name='Gardening'))
+        db.session.commit()
+        category_id = Category.query.filter_by(name='Gardening').one().id
+
+    for bad in ('abc', '9999'):
+        response = client.post('/api/posts', data={'title': 'Soil', 'content': '<p>x</p>', 'category_id': bad},
+                               headers=editor)
+        assert response.status_code == 400
+    post_id = create(client, editor, 'Soil', '<p>Compost notes</p>')
+    assert client.put(f'/api/posts/{post_id}', data={'category_id': 'abc'}, headers=editor).status_code == 400
+
+    # The category name is searchable once it is set
+    assert search(client, 'gardening') == []
+    client.put(f'/api/posts/{post_id}', data={'category_id': str(category_id)}, headers=editor)
+    assert [r['id'] for r in search(client, 'gardening')] == [post_id]
+
+
+def test_upgrade_fills_a_new_search_index(app, client):
+    with app.app_context():
+        db.session.execute(text("DROP TABLE post_search"))
+        db.session.commit()
+        assert 'built the search index' in upgrade_schema()
+        # The seeded posts never went through the routes, so only the rebuild indexed them
+        published = Post.query.filter_by(published=True).count()
+        assert published and len(search_posts('post', 100, 0)) == published
@@ -0,0 +1,61 @@
+"""
+Tests for slug handling: suffixing on conflict via the unique constraint
+and the slug -> post id cache used by post views.
+"""
+
+from cache import response_cache
+from models import db, Post
+from slugs import slug_cache
+
+
+def test_duplicate_titles_get_suffixes(app, tokens, count_queries):
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['editor']}"}
+
+    with count_queries(app) as statements:
+        first = client.post('/api/posts', headers=headers, data={'title': 'Hello World', 'content': 'a'})
+    assert first.get_json()['slug'] == 'hello-world'
+    assert not any(s.startswith('SELECT') and 'FROM posts' in s for s in statements)
+
+    slugs = [client.post('/api/posts', headers=headers, data={'title': 'Hello, world!', 'content': 'b'}).get_json()['slug']
+             for _ in range(2)]
+    assert slugs == ['hello-world-2', 'hello-world-3']
+
+    # Renaming onto a taken slug suffixes too, and keeps the other edits
+    post_id = first.get_json()['post_id']
+    response = client.put(f'/api/posts/{post_id}', headers=headers, data={'title': 'Post 0', 'content': 'edited'})
+    assert response.get_json()['slug'] == 'post-0-2'
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        assert post.title == 'Post 0' and post.content == 'edited'
+
+
+def test_post_views_use_slug_cache(app, tokens, count_queries):
+    # Measure the view itself, not the response cache in front of it
+    app.config['RESPONSE_CACHE_BACKEND'] = 'none'
+    response_cache.init_app(app)
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['editor']}"}
+
+    # Posts 1, 7, 13, ... belong to the editor
+    client.get('/api/posts/post-6')
+    assert slug_cache.get('post-6') == 7
+    with count_queries(app) as statements:
+        assert client.get('/api/posts/post-6').status_code == 200
+    assert len(statements) == 1 and 'posts.id = ?' in statements[0] and 'posts.slug = ?' not in statements[0]
+
+    # Renamed: the old slug is gone, the new one resolves
+    client.put('/api/posts/7', headers=headers, data={'title': 'Fresh'})
+    assert slug_cache.get('post-6') is None
+    assert client.get('/api/posts/post-6').status_code == 404
+    assert client.get('/api/posts/fresh').get_json()['post']['id'] == 7
+
+    # A stale entry (e.g. left by another process) falls back to the slug lookup
+    slug_cache.set('post-12', 7)
+    assert client.get('/api/posts/post-12').get_json()['post']['id'] == 13
+    assert slug_cache.get('post-12') == 13
+
+    client.delete('/api/posts/13', headers=headers)
+    assert slug_cache.get('post-12') is None
+    assert client.get('/api/posts/post-12').status_code == 404
+
@@ -0,0 +1,56 @@
+"""
+Tests for the trending ranking: incremental score updates from likes and
+comments, decay, rebuild from the engagement tables, and the endpoint.
+"""
+from datetime import datetime, timedelta
+
+from models import db, PostTrending
+from trending import trending
+
+
+def scores(app):
+    with app.app_context():
+        return {row.post_id: round(row.score, 4) for row in PostTrending.query.all()}
+
+
+def test_engagement_updates_scores_incrementally(app, tokens, count_queries):
+    client = app.test_client()
+    editor = {'Authorization': f"Bearer {tokens['editor']}"}
+    reader = {'Authorization': f"Bearer {tokens['reader']}"}
+
+    client.post('/api/posts/5/like', headers=editor)
+    client.post('/api/posts/3/like', headers=editor)
+    client.post('/api/comments/', json={'post_id': 3, 'content': 'Hot take'}, headers=reader)
+    assert scores(app) == {5: 1.0, 3: 3.0}
+
+    with count_queries(app) as statements:
+        posts = client.get('/api/posts/trending').get_json()['posts']
+    assert [(p['id'], p['score']) for p in posts] == [(3, 3.0), (5, 1.0)]
+    assert len(statements) == 2 and not any('likes' in s for s in statements)
+
+    # Unliking takes the weight back, never below zero
+    client.post('/api/posts/3/like', headers=editor)
+    client.post('/api/posts/5/like', headers=editor)
+    assert scores(app) == {5: 0.0, 3: 2.0}
+
+
+def test_decay_and_rebuild(app):
+    start = datetime(2026, 3, 1, 12, 0)
+    with app.app_context():
+        trending.decay(now=start)  # first run only records the starting point
+        trending.record(1, 'like', 4)
+        trending.record(2, 'comment')
+        db.session.commit()
+
+        assert trending.decay(now=start + timedelta(hours=6)) == 0.5
+        assert trending.decay(now=start + timedelta(hours=6)) is None
+        assert [(p, round(s, 4)) for p, s in trending.top(10)] == [(1, 2.0), (2, 1.0)]
+
+        # Faded scores are dropped
+        trending.decay(now=start + timedelta(hours=6 * 10))
+        assert trending.top(10) == []
+
+        # The seeded likes are all recent, one per post
+        assert trending.rebuild() == 30
+        assert all(abs(score - 1.0) < 0.01 for _, score in trending.top(100))
+
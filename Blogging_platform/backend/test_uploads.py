@@ -0,0 +1,91 @@
+"""
+Tests for the background image upload pipeline using the local storage backend.
+"""
+import io
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import text
+from werkzeug.datastructures import FileStorage
+
+from models import db, Post
+from schema import upgrade_schema
+from uploads import upload_queue
+
+
+@pytest.fixture
+def local_uploads(make_app):
+    root = tempfile.mkdtemp(prefix='uploads_')
+    app, tokens = make_app(UPLOAD_BACKEND='local', UPLOAD_LOCAL_DIR=root, UPLOAD_LOCAL_URL='/uploads',
+                           UPLOAD_TMP_DIR=tempfile.mkdtemp(prefix='spool_'))
+    return app, tokens, root
+
+
+def test_post_image_uploads_in_background(local_uploads):
+    app, tokens, root = local_uploads
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['editor']}"}
+    image = os.urandom(3 * 1024 * 1024)
+
+    response = client.post('/api/posts', headers=headers, data={
+        'title': 'With image', 'content': 'Body', 'published': 'true',
+        'image': (io.BytesIO(image), 'cover.PNG'),
+    })
+    assert response.status_code == 201
+    assert response.get_json()['image_status'] == 'pending'
+    post_id = response.get_json()['post_id']
+
+    upload_queue.drain(timeout=10)
+    with app.app_context():
+        post = Post.query.get(post_id)
+        assert post.image_status == 'ready'
+        assert post.image_url.startswith('/uploads/nexusblog_posts/') and post.image_url.endswith('.png')
+        with open(os.path.join(root, post.image_url[len('/uploads/'):]), 'rb') as f:
+            assert f.read() == image
+
+    # The cached post page picks up the finished upload
+    assert client.get('/api/posts/with-image').get_json()['post']['image_status'] == 'ready'
+
+
+def test_editor_upload_returns_url(local_uploads):
+    app, tokens, root = local_uploads
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['editor']}"}
+
+    response = client.post('/api/posts/upload', headers=headers,
+                           data={'image': (io.BytesIO(b'fake image bytes'), 'inline.jpg')})
+    assert response.status_code == 200
+    url = response.get_json()['url']
+    assert url.startswith('/uploads/nexusblog_content/')
+    with open(os.path.join(root, url[len('/uploads/'):]), 'rb') as f:
+        assert f.read() == b'fake image bytes'
+
+
+class BrokenStream(io.BytesIO):
+    def read(self, *args):
+        raise OSError('client went away')
+
+
+def test_unreadable_upload_marks_post_failed(local_uploads):
+    app, tokens, _ = local_uploads
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {tokens['editor']}"}
+    client.get('/api/posts/post-0')
+
+    # The request body can't be spooled once the post is already committed as pending
+    assert upload_queue.submit(FileStorage(BrokenStream(), 'cover.png'), 'nexusblog_posts', 1) is False
+    upload_queue.drain(timeout=10)
+    with app.app_context():
+        assert Post.query.get(1).image_status == 'failed'
+    assert os.listdir(upload_queue.tmp_dir) == []
+    assert client.get('/api/posts/post-0').get_json()['post']['image_status'] == 'failed'
+
+
+def test_upgrade_marks_existing_images_ready(app):
+    with app.app_context():
+        db.session.execute(text("ALTER TABLE posts DROP COLUMN image_status"))
+        db.session.execute(text("UPDATE posts SET image_url = '/uploads/old.png' WHERE id = 1"))
+        db.session.commit()
+        assert 'marked existing post images ready' in upgrade_schema()
+        assert [p.image_status for p in Post.query.filter(Post.id <= 2).order_by(Post.id)] == ['ready', None]
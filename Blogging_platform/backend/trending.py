@@ -0,0 +1,161 @@
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Like, Comment, PostTrending, TrendingState
+
+
+class TrendingRanker:
+    """
+    Trending scores kept in the post_trending table.
+
+    A like or comment adds its weight to the post's score with a single
+    upsert in the request's transaction (an unlike or deleted comment takes
+    it back), so reading the ranking is one indexed ORDER BY score query,
+    never an aggregate over likes. Scores decay exponentially with
+    TRENDING_HALF_LIFE hours: every TRENDING_DECAY_INTERVAL seconds a
+    background job multiplies all scores by 0.5 ** (elapsed / half_life)
+    and drops posts whose score has faded below TRENDING_MIN_SCORE.
+    Engagement since the last run counts at full weight, so the ranking is
+    exact to within one decay interval.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.weights = {'like': 1.0, 'comment': 2.0}
+        self.half_life = 6 * 3600.0
+        self.min_score = 0.01
+        self._thread = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.shutdown()
+        self.app = app
+        self.weights = {
+            'like': app.config.get('TRENDING_LIKE_WEIGHT', 1.0),
+            'comment': app.config.get('TRENDING_COMMENT_WEIGHT', 2.0),
+        }
+        self.half_life = app.config.get('TRENDING_HALF_LIFE', 6.0) * 3600
+        self.min_score = app.config.get('TRENDING_MIN_SCORE', 0.01)
+        self.interval = app.config.get('TRENDING_DECAY_INTERVAL', 300)
+        self._stop = threading.Event()
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='trending-decay', daemon=True)
+            self._thread.start()
+        app.extensions['trending'] = self
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+
+    # --- Incremental updates (called inside the request's transaction) ---
+
+    def record(self, post_id, kind, count=1):
+        """Add engagement of `kind` ('like' or 'comment'); a negative count takes it back"""
+        delta = self.weights[kind] * count
+        if delta > 0:
+            dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+            statement = dialect.insert(PostTrending).values(post_id=post_id, score=delta)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[PostTrending.post_id],
+                set_={"score": PostTrending.score + delta}
+            ))
+        elif delta < 0:
+            # Never below zero: the engagement being removed has already partly decayed
+            db.session.execute(
+                update(PostTrending).where(PostTrending.post_id == post_id)
+                .values(score=case((PostTrending.score > -delta, PostTrending.score + delta), else_=0.0))
+            )
+
+    def remove_post(self, post_id):
+        db.session.execute(delete(PostTrending).where(PostTrending.post_id == post_id))
+
+    # --- Reading ---
+
+    def top(self, limit):
+        """[(post_id, score)] of the highest-scoring posts, best first"""
+        return db.session.query(PostTrending.post_id, PostTrending.score).filter(
+            PostTrending.score >= self.min_score
+        ).order_by(PostTrending.score.desc(), PostTrending.post_id.desc()).limit(limit).all()
+
+    # --- Decay ---
+
+    def decay(self, now=None):
+        """
+        Apply the decay for the time since the last run and commit. Safe to
+        call from several workers: the state row is claimed with a
+        compare-and-set, so each interval is applied once. Returns the factor
+        applied, or None if another worker got there first.
+        """
+        now = now or datetime.utcnow()
+        state = db.session.get(TrendingState, 1)
+        if state is None:
+            db.session.add(TrendingState(id=1, decayed_at=now))
+            db.session.commit()
+            return None
+
+        elapsed = (now - state.decayed_at).total_seconds()
+        if elapsed <= 0:
+            return None
+        claimed = db.session.execute(
+            update(TrendingState)
+            .where(TrendingState.id == 1, TrendingState.decayed_at == state.decayed_at)
+            .values(decayed_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return None
+
+        factor = 0.5 ** (elapsed / self.half_life)
+        db.session.execute(
+            update(PostTrending).values(score=PostTrending.score * factor)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(delete(PostTrending).where(PostTrending.score < self.min_score))
+        db.session.commit()
+        return factor
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.app.app_context():
+                    self.decay()
+            except Exception as e:
+                print(f"TRENDING DECAY ERROR: {e}")
+
+    def rebuild(self, now=None, window_half_lives=10):
+        """
+        Recompute every score from the likes and comments tables (first
+        deployment, or after changing weights). Engagement older than
+        `window_half_lives` half-lives is ignored as it no longer matters.
+        """
+        now = now or datetime.utcnow()
+        since = now - timedelta(seconds=window_half_lives * self.half_life)
+        scores = {}
+        for kind, model, condition in (
+            ('like', Like, Like.created_at >= since),
+            ('comment', Comment, (Comment.created_at >= since) & Comment.is_approved.is_(True)),
+        ):
+            rows = db.session.query(model.post_id, model.created_at).filter(condition).yield_per(5000)
+            for post_id, created_at in rows:
+                age = (now - created_at).total_seconds()
+                scores[post_id] = scores.get(post_id, 0.0) + self.weights[kind] * 0.5 ** (max(age, 0) / self.half_life)
+
+        db.session.execute(delete(PostTrending))
+        db.session.execute(delete(TrendingState))
+        db.session.add(TrendingState(id=1, decayed_at=now))
+        rows = [{"post_id": post_id, "score": score} for post_id, score in scores.items() if score >= self.min_score]
+        if rows:
+            db.session.execute(PostTrending.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
+
+
+trending = TrendingRanker()
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from sqlalchemy import update
+
+from models import db, Post
+
+# Bytes copied per read when spooling request bodies and writing to storage
+CHUNK_SIZE = 1024 * 1024
+
+
+class CloudinaryStorage:
+    """Uploads with Cloudinary's chunked upload API, reading the spooled file piece by piece"""
+
+    # Cloudinary requires chunks of at least 5MB
+    chunk_size = 6 * 1024 * 1024
+
+    def save(self, path, filename, folder):
+        import cloudinary.uploader
+        result = cloudinary.uploader.upload_large(
+            path,
+            folder=folder,
+            resource_type="image",
+            chunk_size=self.chunk_size
+        )
+        return result.get('secure_url')
+
+
+class LocalStorage:
+    """Writes uploads under `root` and serves them from `base_url` (development and tests)"""
+
+    def __init__(self, root, base_url='/uploads'):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def save(self, path, filename, folder):
+        name = f"{uuid.uuid4().hex}{os.path.splitext(filename)[1].lower()}"
+        target_dir = os.path.join(self.root, folder)
+        os.makedirs(target_dir, exist_ok=True)
+        with open(path, 'rb') as src, open(os.path.join(target_dir, name), 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        return f"{self.base_url}/{folder}/{name}"
+
+
+class UploadQueue:
+    """
+    Moves image uploads off the request thread.
+
+    The request only spools the incoming file to a temporary file (in
+    CHUNK_SIZE pieces, never the whole image in memory) and returns; a local
+    worker pool then streams it to the storage backend and writes the result
+    to Post.image_url/image_status. The database row is the only record of
+    an upload's state, so any worker process can answer for it.
+    Editor images are needed in the response, so save() stores them inline.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.storage = None
+        self._pool = None
+        self._latest = {}
+        self._futures = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('UPLOAD_BACKEND', 'cloudinary') == 'local':
+            self.storage = LocalStorage(app.config['UPLOAD_LOCAL_DIR'], app.config.get('UPLOAD_LOCAL_URL', '/uploads'))
+        else:
+            self.storage = CloudinaryStorage()
+        self._pool = ThreadPoolExecutor(
+            max_workers=app.config.get('UPLOAD_WORKERS', 4),
+            thread_name_prefix='upload'
+        )
+        self.tmp_dir = app.config.get('UPLOAD_TMP_DIR') or tempfile.gettempdir()
+        app.extensions['upload_queue'] = self
+
+    # --- Request side ---
+
+    def _spool(self, file_storage):
+        fd, path = tempfile.mkstemp(prefix='upload_', dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                shutil.copyfileobj(file_storage.stream, out, CHUNK_SIZE)
+        except Exception:
+            os.remove(path)
+            raise
+        return path
+
+    def save(self, file_storage, folder):
+        """Store an upload before returning (editor images); returns its URL"""
+        path = self._spool(file_storage)
+        try:
+            return self.storage.save(path, file_storage.filename, folder)
+        finally:
+            os.remove(path)
+
+    def submit(self, file_storage, folder, post_id):
+        """
+        Spool a post image and queue its upload. Call after the post is
+        committed with image_status 'pending'; returns False (and marks the
+        post failed) if the request body couldn't be read.
+        """
+        try:
+            path = self._spool(file_storage)
+        except Exception as e:
+            print(f"UPLOAD ERROR ({file_storage.filename}): {e}")
+            self._attach(post_id, None)
+            return False
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            # Only the most recent image for a post may win
+            self._latest[post_id] = job_id
+            future = self._pool.submit(self._run, job_id, path, file_storage.filename, folder, post_id)
+            self._futures.add(future)
+        future.add_done_callback(self._futures.discard)
+        return True
+
+    def drain(self, timeout=None):
+        """Block until every queued upload has finished (tests, shutdown)"""
+        wait(list(self._futures), timeout=timeout)
+
+    # --- Worker side ---
+
+    def _run(self, job_id, path, filename, folder, post_id):
+        url = None
+        try:
+            url = self.storage.save(path, filename, folder)
+        except Exception as e:
+            print(f"UPLOAD ERROR ({filename}): {e}")
+        finally:
+            os.remove(path)
+
+        with self._lock:
+            is_latest = self._latest.get(post_id) == job_id
+            if is_latest:
+                del self._latest[post_id]
+
+        if is_latest:
+            self._attach(post_id, url)
+
+    def _attach(self, post_id, url):
+        from cache import response_cache
+
+        with self.app.app_context():
+            values = {"image_status": "ready", "image_url": url} if url else {"image_status": "failed"}
+            db.session.execute(update(Post).where(Post.id == post_id).values(**values))
+            db.session.commit()
+            slug = db.session.query(Post.slug).filter(Post.id == post_id).scalar()
+            response_cache.invalidate('feed', f'post:{slug}')
+
+
+upload_queue = UploadQueue()
@@ -3,13 +3,15 @@ import api from '../services/api';
 
 const AdminAudit = () => {
     const [logs, setLogs] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
 
-    const fetchLogs = async () => {
+    const fetchLogs = async (cursor) => {
         try {
-            const res = await api.get('/admin/audit');
-            setLogs(res.data);
+            const res = await api.get('/admin/audit', { params: cursor ? { cursor } : {} });
+            setLogs(cursor ? [...logs, ...res.data.logs] : res.data.logs);
+            setNextCursor(res.data.next_cursor);
         } catch (err) {
             setError('Failed to load audit logs');
         } finally {
@@ -47,6 +49,14 @@ const AdminAudit = () => {
                     ))}
                 </tbody>
             </table>
+            {nextCursor && (
+                <button
+                    onClick={() => fetchLogs(nextCursor)}
+                    className="mt-4 px-4 py-2 text-indigo-600 border border-indigo-100 rounded-lg hover:bg-indigo-50"
+                >
+                    Load older entries
+                </button>
+            )}
         </div>
     );
 };
@@ -9,7 +9,11 @@ const PostDetail = () => {
     const { user } = useAuth();
     const [post, setPost] = useState(null);
     const [comments, setComments] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [newComment, setNewComment] = useState('');
+    const [replyTo, setReplyTo] = useState(null);
+    const [replyText, setReplyText] = useState('');
+    const [replyCursors, setReplyCursors] = useState({});
     const [isLoading, setIsLoading] = useState(true);
     const [isSubmitting, setIsSubmitting] = useState(false);
 
@@ -21,6 +25,7 @@ const PostDetail = () => {
                 // Fetch comments after post is loaded
                 const commResponse = await api.get(`/comments/post/${response.data.post.id}`);
                 setComments(commResponse.data.comments);
+                setNextCursor(commResponse.data.next_cursor);
             } catch (error) {
                 console.error("Error fetching post data:", error);
             } finally {
@@ -40,7 +45,8 @@ const PostDetail = () => {
                 post_id: post.id,
                 content: newComment
             });
-            setComments([resp.data.comment, ...comments]);
+            setComments([{ ...resp.data.comment, replies: [], reply_count: 0 }, ...comments]);
+            setPost({ ...post, comment_count: post.comment_count + 1 });
             setNewComment('');
         } catch (err) {
             console.error("Failed to post comment:", err);
@@ -49,6 +55,55 @@ const PostDetail = () => {
         }
     };
 
+    const loadMoreComments = async () => {
+        try {
+            const resp = await api.get(`/comments/post/${post.id}`, { params: { cursor: nextCursor } });
+            setComments([...comments, ...resp.data.comments]);
+            setNextCursor(resp.data.next_cursor);
+        } catch (err) {
+            console.error("Failed to load comments:", err);
+        }
+    };
+
+    // The first replies come with each comment; the rest of a thread is paged from where they stop
+    const loadMoreReplies = async (comment) => {
+        try {
+            const params = { per_page: 20 };
+            if (replyCursors[comment.id]) params.cursor = replyCursors[comment.id];
+            const resp = await api.get(`/comments/post/${post.id}/thread/${comment.id}`, { params });
+            const known = new Set(comment.replies.map(r => r.id));
+            const replies = [...comment.replies, ...resp.data.replies.filter(r => !known.has(r.id))];
+            setComments(comments.map(c => c.id === comment.id ? { ...c, replies } : c));
+            setReplyCursors({ ...replyCursors, [comment.id]: resp.data.next_cursor });
+        } catch (err) {
+            console.error("Failed to load replies:", err);
+        }
+    };
+
+    const handleReplySubmit = async (e, comment) => {
+        e.preventDefault();
+        if (!replyText.trim() || !user) return;
+
+        setIsSubmitting(true);
+        try {
+            const resp = await api.post('/comments/', {
+                post_id: post.id,
+                content: replyText,
+                parent_id: comment.id
+            });
+            setComments(comments.map(c => c.id === comment.id
+                ? { ...c, replies: [...c.replies, resp.data.comment], reply_count: c.reply_count + 1 }
+                : c));
+            setPost({ ...post, comment_count: post.comment_count + 1 });
+            setReplyText('');
+            setReplyTo(null);
+        } catch (err) {
+            console.error("Failed to post reply:", err);
+        } finally {
+            setIsSubmitting(false);
+        }
+    };
+
     if (isLoading) return (
         <div className="flex justify-center items-center h-64">
             <div className="animate-spin rounded-full h-12 w-12 border-t-2 border-b-2 border-indigo-600"></div>
@@ -107,7 +162,7 @@ const PostDetail = () => {
 
                     <div
                         className="prose prose-indigo max-w-none text-gray-700 leading-relaxed"
-                        dangerouslySetInnerHTML={{ __html: post.content }}
+                        dangerouslySetInnerHTML={{ __html: post.content_html || post.content }}
                     />
                 </div>
             </article>
@@ -116,7 +171,7 @@ const PostDetail = () => {
             <section className="bg-white rounded-2xl shadow-sm border border-gray-100 p-8">
                 <h3 className="text-2xl font-bold text-gray-900 mb-8 flex items-center">
                     <MessageSquare className="w-6 h-6 mr-3 text-indigo-600" />
-                    Comments ({comments.length})
+                    Comments ({post.comment_count})
                 </h3>
 
                 {user ? (
@@ -166,11 +221,65 @@ const PostDetail = () => {
                             <p className="text-gray-700 pl-11 leading-relaxed">
                                 {comment.content}
                             </p>
+
+                            <div className="pl-11 mt-4 space-y-4">
+                                {comment.replies.map((reply) => (
+                                    <div key={reply.id} className="border-l-2 border-gray-100 pl-4">
+                                        <div className="flex items-center mb-1">
+                                            <h5 className="font-semibold text-gray-900 text-sm mr-2">{reply.author.username}</h5>
+                                            <p className="text-xs text-gray-500">{new Date(reply.created_at).toLocaleString()}</p>
+                                        </div>
+                                        <p className="text-gray-700 text-sm leading-relaxed">{reply.content}</p>
+                                    </div>
+                                ))}
+                                {comment.replies.length < comment.reply_count && replyCursors[comment.id] !== null && (
+                                    <button
+                                        onClick={() => loadMoreReplies(comment)}
+                                        className="text-sm text-indigo-600 hover:underline"
+                                    >
+                                        Show more replies ({comment.reply_count - comment.replies.length})
+                                    </button>
+                                )}
+                                {user && (replyTo === comment.id ? (
+                                    <form onSubmit={(e) => handleReplySubmit(e, comment)} className="flex gap-2">
+                                        <input
+                                            value={replyText}
+                                            onChange={(e) => setReplyText(e.target.value)}
+                                            placeholder="Write a reply..."
+                                            className="flex-1 bg-gray-50 border border-gray-200 rounded-lg px-3 py-2 text-sm focus:ring-2 focus:ring-indigo-500 focus:border-transparent outline-none"
+                                            autoFocus
+                                        />
+                                        <button
+                                            type="submit"
+                                            disabled={isSubmitting || !replyText.trim()}
+                                            className="bg-indigo-600 text-white px-3 rounded-lg hover:bg-indigo-700 transition-colors disabled:opacity-50"
+                                        >
+                                            <Send className="w-4 h-4" />
+                                        </button>
+                                    </form>
+                                ) : (
+                                    <button
+                                        onClick={() => { setReplyTo(comment.id); setReplyText(''); }}
+                                        className="text-sm text-gray-500 hover:text-indigo-600 transition-colors"
+                                    >
+                                        Reply
+                                    </button>
+                                ))}
+                            </div>
                         </div>
                     )) : (
                         <p className="text-gray-500 text-center py-4">No comments yet. Be the first to comment!</p>
                     )}
                 </div>
+
+                {nextCursor && (
+                    <button
+                        onClick={loadMoreComments}
+                        className="mt-8 w-full py-3 text-indigo-600 font-semibold border border-indigo-100 rounded-xl hover:bg-indigo-50 transition-colors"
+                    >
+                        Load more comments
+                    </button>
+                )}
             </section>
         </div>
     );
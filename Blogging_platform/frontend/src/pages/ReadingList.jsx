@@ -78,7 +78,7 @@ const ReadingList = () => {
                                     <Link to={`/post/${post.slug}`} className="text-xl font-bold text-gray-900 hover:text-indigo-600 transition-colors line-clamp-2">
                                         {post.title}
                                     </Link>
-                                    <p className="text-gray-500 text-sm mt-2 line-clamp-2">{post.excerpt}</p>
+                                    <div className="text-gray-500 text-sm mt-2 line-clamp-2" dangerouslySetInnerHTML={{ __html: post.excerpt }} />
                                 </div>
                                 <div className="flex items-center gap-4 mt-4 text-xs text-gray-400">
                                     <div className="flex items-center gap-1">
@@ -5,13 +5,16 @@ from flask_jwt_extended import JWTManager
 from flask_mail import Mail
 from dotenv import load_dotenv
 from .models import db
+from .passwords import password_hasher
+from .dbmetrics import db_metrics, engine_options_for
 
 load_dotenv()
 
 mail = Mail()
 jwt = JWTManager()
 
-def create_app():
+def create_app(config=None):
+    """Build the app from the environment, with `config` (a dict) overriding it, e.g. in tests"""
     # ---------------------------------------------------
     # PATH CONFIGURATION
     # ---------------------------------------------------
@@ -26,8 +29,27 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Connection pool and statement caching (see app/dbmetrics.py); pre-ping and
+    # recycling replace connections left dead by a database restart or failover
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 10))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    app.config['DB_QUERY_CACHE_SIZE'] = int(os.getenv('DB_QUERY_CACHE_SIZE', 1200))
+    app.config['DB_PREPARE_THRESHOLD'] = int(os.getenv('DB_PREPARE_THRESHOLD', 5))
+    app.config['DB_SLOW_QUERY_MS'] = float(os.getenv('DB_SLOW_QUERY_MS', 200))
+    app.config['DB_SLOW_QUERY_LOG'] = int(os.getenv('DB_SLOW_QUERY_LOG', 50))
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY')
     
+    # Password hashing policy (see app/passwords.py); werkzeug's default (scrypt) unless set,
+    # hashes with another scheme or weaker parameters are upgraded at login
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    app.config['PASSWORD_HASH_WAIT'] = float(os.getenv('PASSWORD_HASH_WAIT', 5.0))
+    
     # Mail Config
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
     app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
@@ -36,11 +58,17 @@ def create_app():
     app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
     app.config['MAIL_DEFAULT_SENDER'] = (os.getenv('MAIL_DEFAULT_SENDER_NAME'), os.getenv('MAIL_DEFAULT_SENDER_EMAIL'))
 
+    app.config.update(config or {})
+    # Derived last, from the database actually used
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options_for(app.config))
+
     # Initialize Extensions
     CORS(app)
     db.init_app(app)
+    db_metrics.init_app(app)
     jwt.init_app(app)
     mail.init_app(app)
+    password_hasher.init_app(app)
 
     # Blueprints
     from .routes.auth import auth_bp
@@ -1,6 +1,6 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from .passwords import password_hasher
 
 db = SQLAlchemy()
 
@@ -15,10 +15,14 @@ class User(db.Model):
     borrows = db.relationship('History', backref='user', lazy=True)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # A match against an outdated hash upgrades it in place; the caller's commit stores it
+        valid, upgraded_hash = password_hasher.verify(self.password_hash, password)
+        if upgraded_hash:
+            self.password_hash = upgraded_hash
+        return valid
 
     def to_dict(self):
         return {
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt
 from ..models import db, Book, History, User
+from ..dbmetrics import db_metrics
 from sqlalchemy import func
 from datetime import datetime
 
@@ -107,3 +108,9 @@ def manage_book(book_id):
         book.category = data.get('category', book.category)
         db.session.commit()
         return jsonify({"message": "Book updated successfully", "book": book.to_dict()})
+
+@admin_bp.route('/db-metrics', methods=['GET'])
+@admin_required
+def db_metrics_report():
+    """Connection pool state, checkout/wait counters and recent slow queries for this worker"""
+    return jsonify(db_metrics.snapshot(db.engine))
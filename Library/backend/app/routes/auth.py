@@ -5,6 +5,7 @@ from flask_jwt_extended import (
 )
 from datetime import datetime, timedelta
 from ..models import db, User, TokenBlocklist, RefreshToken
+from ..passwords import HashingBusy
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -16,7 +17,12 @@ def login():
         
     user = User.query.filter_by(email=data['email']).first()
     
-    if user and user.check_password(data['password']):
+    try:
+        valid = user is not None and user.check_password(data['password'])
+    except HashingBusy:
+        return jsonify({"message": "Too many login attempts right now, please retry shortly"}), 503, {"Retry-After": "1"}
+    
+    if valid:
         access_token = create_access_token(identity=str(user.id), additional_claims={"role": user.role, "is_admin": user.is_admin})
         refresh_token = create_refresh_token(identity=str(user.id))
         
@@ -75,7 +81,10 @@ def register():
         return jsonify({"message": "User already exists"}), 400
         
     new_user = User(email=email)
-    new_user.set_password(password)
+    try:
+        new_user.set_password(password)
+    except HashingBusy:
+        return jsonify({"message": "Too many requests right now, please retry shortly"}), 503, {"Retry-After": "1"}
     db.session.add(new_user)
     db.session.commit()
     
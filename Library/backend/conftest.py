@@ -0,0 +1,36 @@
+"""
+Shared fixtures for the backend tests: the app runs against a fresh
+in-memory SQLite database set on the app itself, so nothing depends on
+DATABASE_URL or the other settings in .env.
+"""
+import pytest
+
+from app import create_app
+from app.models import db
+
+
+@pytest.fixture
+def make_app():
+    """make_app(**config) -> app with its tables created; config overrides the test defaults"""
+    def factory(**config):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'SECRET_KEY': 'test-secret',
+            'JWT_SECRET_KEY': 'test-jwt-secret-with-enough-bytes-for-hs256',
+            **config
+        })
+        with app.app_context():
+            db.create_all()
+        return app
+    return factory
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,29 @@
+"""Tests for the pool options and the /api/admin/db-metrics endpoint."""
+import os
+import tempfile
+
+from flask_jwt_extended import create_access_token
+
+from app.dbmetrics import engine_options
+from app.models import db
+
+
+def test_pool_options_follow_the_configured_database(make_app):
+    assert make_app().config['SQLALCHEMY_ENGINE_OPTIONS'] == engine_options('sqlite://')
+
+    database = os.path.join(tempfile.mkdtemp(prefix='library_'), 'library.db')
+    app = make_app(SQLALCHEMY_DATABASE_URI=f'sqlite:///{database}', DB_POOL_SIZE=2, DB_MAX_OVERFLOW=1)
+    with app.app_context():
+        assert (db.engine.pool.size(), db.engine.pool._max_overflow) == (2, 1)
+
+
+def test_db_metrics_requires_admin(app, client):
+    with app.app_context():
+        admin = create_access_token(identity='1', additional_claims={'is_admin': True})
+        employee = create_access_token(identity='2', additional_claims={'is_admin': False})
+
+    response = client.get('/api/admin/db-metrics', headers={'Authorization': f'Bearer {admin}'})
+    assert response.status_code == 200
+    metrics = response.get_json()
+    assert metrics["counters"]["queries"] > 0 and metrics["pool"]["class"] == 'StaticPool'
+    assert client.get('/api/admin/db-metrics', headers={'Authorization': f'Bearer {employee}'}).status_code == 403
@@ -0,0 +1,62 @@
+"""Tests for the password hashing policy: rehash on login and the bounded hashing pool."""
+
+from werkzeug.security import generate_password_hash
+
+from app.models import db, User
+from app.passwords import password_hasher
+
+
+def add_user(app, stored_hash):
+    with app.app_context():
+        db.session.add(User(email='reader@example.com', password_hash=stored_hash))
+        db.session.commit()
+
+
+def stored_method(app):
+    with app.app_context():
+        return User.query.filter_by(email='reader@example.com').first().password_hash.split('$', 1)[0]
+
+
+def login(client, password):
+    return client.post('/api/auth/login', json={'email': 'reader@example.com', 'password': password})
+
+
+def test_default_policy_keeps_werkzeug_hashes(app, client):
+    # Hashes the app has always stored (werkzeug's default scrypt) are left alone
+    stored = generate_password_hash('secret')
+    add_user(app, stored)
+    assert login(client, 'secret').status_code == 200
+    with app.app_context():
+        assert User.query.first().password_hash == stored
+
+
+def test_weaker_hash_is_upgraded_on_login(make_app):
+    app = make_app(PASSWORD_HASH_METHOD='scrypt:32768:8:1')
+    client = app.test_client()
+    add_user(app, generate_password_hash('secret', method='scrypt:16384:8:1'))
+
+    assert login(client, 'wrong').status_code == 401
+    assert stored_method(app) == 'scrypt:16384:8:1'
+    assert login(client, 'secret').status_code == 200
+    assert stored_method(app) == 'scrypt:32768:8:1'
+
+
+def test_stronger_hash_is_not_downgraded(make_app):
+    app = make_app(PASSWORD_HASH_METHOD='scrypt:16384:8:1')
+    add_user(app, generate_password_hash('secret', method='scrypt:32768:8:1'))
+    assert login(app.test_client(), 'secret').status_code == 200
+    assert stored_method(app) == 'scrypt:32768:8:1'
+
+
+def test_saturated_pool_rejects_logins(make_app):
+    app = make_app(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_MAX_PENDING=1, PASSWORD_HASH_WAIT=0)
+    client = app.test_client()
+    add_user(app, generate_password_hash('secret'))
+
+    password_hasher._slots.acquire()  # another login is already hashing
+    try:
+        response = login(client, 'secret')
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    finally:
+        password_hasher._slots.release()
+    assert login(client, 'secret').status_code == 200
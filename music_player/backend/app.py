@@ -1,75 +1,97 @@
-from flask import Flask, jsonify, send_from_directory, Response
+from flask import Flask, jsonify, send_from_directory, Response, request
 from flask_cors import CORS
+from werkzeug.security import safe_join
 import os
 import math
-# mutagen is the library that reads audio metadata
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TALB
+import mimetypes
+import threading
+import time
+
+from library import MusicIndex, InvalidCursor, SORT_KEYS, FILTER_FIELDS, to_track
+from cover_cache import CoverCache, COVER_SIZES
+from streaming import OpenFileCache, send_audio
+from search import SearchIndex
+from waveform import WaveformStore
+from watcher import LibraryWatcher
 
 # 1. Setup pathS
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MUSIC_DIR = os.path.join(BASE_DIR, 'music')
+MUSIC_DIR = os.environ.get('MUSIC_DIR', os.path.join(BASE_DIR, 'music'))
 
 BUILD_DIR = os.path.join(BASE_DIR, 'build')
 
+# Persistent metadata index (SQLite), rebuilt only for changed files
+INDEX_PATH = os.environ.get('MUSIC_INDEX_PATH', os.path.join(BASE_DIR, 'music_index.db'))
+
 if not os.path.exists(MUSIC_DIR):
     os.makedirs(MUSIC_DIR)
 
-app = Flask(__name__, static_folder=BUILD_DIR)
-CORS(app)
+# Cold scans of a large library parse tags across this many processes
+SCAN_WORKERS = int(os.environ.get('MUSIC_SCAN_WORKERS', os.cpu_count() or 1))
 
-def format_duration(seconds):
-    minutes = math.floor(seconds / 60)
-    secs = math.floor(seconds % 60)
-    return f"{minutes}:{secs:02d}"
+library = MusicIndex(MUSIC_DIR, INDEX_PATH, workers=SCAN_WORKERS)
 
-def get_file_metadata(filename):
-    filepath = os.path.join(MUSIC_DIR, filename)
-    
-    # Defaults
-    title = os.path.splitext(filename)[0]
-    artist = "Unknown Artist"
-    album = "Unknown Album"
-    duration_str = "--:--"
-    has_cover = False
+# Extracted album art + thumbnails, content-addressed on disk and LRU in memory
+COVER_CACHE_DIR = os.environ.get('MUSIC_COVER_CACHE', os.path.join(BASE_DIR, 'cover_cache'))
+covers = CoverCache(MUSIC_DIR, COVER_CACHE_DIR,
+                    max_bytes=int(os.environ.get('MUSIC_COVER_MEMORY_MB', 32)) * 1024 * 1024)
+library.add_listener(covers.on_index_change)
 
-    try:
-        audio = MP3(filepath, ID3=ID3)
-        
-        if audio.info:
-            duration_str = format_duration(audio.info.length)
-
-        if audio.tags:
-            if 'TIT2' in audio.tags: title = str(audio.tags['TIT2'])
-            if 'TPE1' in audio.tags: artist = str(audio.tags['TPE1'])
-            if 'TALB' in audio.tags: album = str(audio.tags['TALB'])
-            for key in audio.tags.keys():
-                if key.startswith('APIC:'):
-                    has_cover = True
-                    break
-                    
-    except Exception as e:
-        print(f"Error reading {filename}: {e}")
+# Open descriptors for recently streamed tracks (range requests use pread on them)
+open_files = OpenFileCache(max_files=int(os.environ.get('MUSIC_OPEN_FILES', 64)))
+library.add_listener(open_files.on_index_change)
 
-    if has_cover:
-        cover_url = f"/api/cover/{filename}"
-    else:
-        cover_url = None 
-
-    return {
-        "id": f"local_{filename}",
-        "title": title,
-        "artist": artist,
-        "category": "My Library", 
-        "album": album,
-        "duration": duration_str,
-        "url": f"/music/{filename}",
-        "cover": cover_url
-    }
+# Inverted index over title/artist/album for /api/music/search
+search_index = SearchIndex()
+search_index.rebuild(library.rows())
+library.add_listener(search_index.on_index_change)
+
+# Optional peak/loudness analysis (needs numpy + ffmpeg), decoded once per file in the background
+waveforms = WaveformStore(MUSIC_DIR, INDEX_PATH,
+                          workers=int(os.environ.get('MUSIC_WAVEFORM_WORKERS', 2)),
+                          enabled=os.environ.get('MUSIC_WAVEFORMS', 'on') != 'off')
+library.add_listener(waveforms.on_index_change)
+
+# Background watcher keeps the index (and in-memory playlist) up to date
+POLL_INTERVAL = float(os.environ.get('MUSIC_POLL_INTERVAL', 5))
+RESCAN_INTERVAL = float(os.environ.get('MUSIC_RESCAN_INTERVAL', 3600))
+watcher = LibraryWatcher(library, poll_interval=POLL_INTERVAL, rescan_interval=RESCAN_INTERVAL)
+_background_lock = threading.Lock()
+_background_started = False
+
+app = Flask(__name__, static_folder=BUILD_DIR)
+CORS(app)
+
+@app.before_request
+def start_background():
+    """
+    Start the watcher and the waveform backfill in the process that serves
+    requests, not at import: importing the module (tests, tooling, the debug
+    reloader's parent) has no side effects, and each server worker gets one
+    watcher.
+    """
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+        if os.environ.get('MUSIC_WATCHER', 'on') != 'off':
+            watcher.start()
+        waveforms.backfill(library.rows())
+
+MAX_PAGE_SIZE = 500
 
 # 4. API: Get All Music
 @app.route('/api/music', methods=['GET'])
 def get_music():
+    # ?limit= or ?cursor= switches to the paginated, filterable view of the local library:
+    #   ?limit=50&cursor=...&sort=title|artist|duration&order=asc|desc&artist=&album=&category=
+    # (other parameters, e.g. a cache-busting ?t=, keep the plain playlist)
+    if 'limit' in request.args or 'cursor' in request.args:
+        return get_music_page()
+
     playlist = []
     
     playlist.extend([
@@ -80,41 +102,154 @@ def get_music():
         }
     ])
 
-    # Scan Local Folder
-    if os.path.exists(MUSIC_DIR):
-        files = sorted(os.listdir(MUSIC_DIR))
-        for filename in files:
-            if filename.lower().endswith('.mp3'):
-                metadata = get_file_metadata(filename)
-                playlist.append(metadata)
+    # Local Folder (kept current by the background watcher)
+    playlist.extend(library.tracks())
 
     return jsonify(playlist)
 
-# API: Serve Embedded Album Art
+def parse_limit(default):
+    """?limit= as an int in 1..MAX_PAGE_SIZE, `default` when absent, None when invalid"""
+    value = request.args.get('limit', '')
+    if value == '':
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        return None
+    return limit if 1 <= limit <= MAX_PAGE_SIZE else None
+
+def get_music_page():
+    sort = request.args.get('sort', 'title')
+    order = request.args.get('order', 'asc')
+    limit = parse_limit(50)
+
+    if sort not in SORT_KEYS:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORT_KEYS)}"}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({"error": "order must be asc or desc"}), 400
+    if limit is None:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    filters = {field: request.args[field] for field in FILTER_FIELDS if request.args.get(field)}
+
+    try:
+        page = library.page(sort=sort, order=order, filters=filters,
+                            cursor=request.args.get('cursor'), limit=limit)
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(page)
+
+# API: Search Title / Artist / Album (last word matches as a prefix for type-ahead)
+@app.route('/api/music/search', methods=['GET'])
+def search_music():
+    query = request.args.get('q', '').strip()
+    limit = parse_limit(20)
+
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    if limit is None:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    total, results, total_is_estimate = search_index.search(query, limit)
+    tracks = []
+    for score, filename in results:
+        row = library.get(filename)
+        if row is not None:
+            tracks.append(dict(to_track(row), score=round(score, 3)))
+
+    return jsonify({"query": query, "tracks": tracks, "total": total, "total_is_estimate": total_is_estimate})
+
+# API: Serve Embedded Album Art (?size=64|256|full)
 @app.route('/api/cover/<path:filename>')
 def get_cover(filename):
-    filepath = os.path.join(MUSIC_DIR, filename)
+    size = request.args.get('size', 'full')
+    if size not in COVER_SIZES:
+        return f"Invalid size, expected one of: {', '.join(COVER_SIZES)}", 400
+
+    if library.get(filename) is None:
+        return "No Cover Found", 404
+
     try:
-        audio = MP3(filepath, ID3=ID3)
-        if audio.tags:
-            for key in audio.tags.keys():
-                if key.startswith('APIC:'):
-                    art = audio.tags[key]
-                    return Response(art.data, mimetype=art.mime)
+        cover = covers.get(filename, size)
     except Exception as e:
         print(f"Error extracting cover: {e}")
-    
-    return "No Cover Found", 404
+        cover = None
+
+    if cover is None:
+        return "No Cover Found", 404
+
+    response = Response(cover.data, mimetype=cover.mimetype)
+    response.set_etag(cover.etag)
+    response.last_modified = cover.mtime
+    response.cache_control.public = True
+    if request.args.get('v'):
+        # Playlist cover URLs carry ?v=<mtime>, so such a URL never changes content
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        # A bare URL shows whatever the file holds now; revalidate with the ETag
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# API: Waveform peaks + integrated loudness (?format=json|raw)
+@app.route('/api/waveform/<path:filename>')
+def get_waveform(filename):
+    row = library.get(filename)
+    if row is None:
+        return jsonify({"error": "Track not found"}), 404
+    if not waveforms.enabled:
+        return jsonify({"error": "Waveform analysis is not available (requires numpy and ffmpeg)"}), 503
+
+    found = waveforms.get(row)
+    if found is None:
+        failed = waveforms.failure(row)
+        if failed is not None and failed[1] > time.time():
+            retry_after = math.ceil(failed[1] - time.time())
+            return jsonify({"status": "failed", "error": failed[0], "retry_after": retry_after}), 422, \
+                {"Retry-After": str(retry_after)}
+        waveforms.schedule(row)
+        return jsonify({"status": "pending"}), 202
+    peaks, loudness = found
+
+    if request.args.get('format') == 'raw':
+        # Interleaved int8 (min, max) pairs
+        response = Response(peaks, mimetype='application/octet-stream')
+        if loudness is not None:
+            response.headers['X-Loudness-LUFS'] = str(loudness)
+    else:
+        samples = [b - 256 if b > 127 else b for b in peaks]
+        response = jsonify({
+            "points": len(samples) // 2,
+            "peaks": samples,
+            "loudness": loudness
+        })
+
+    response.set_etag(f"{int(row['mtime'])}-{row['size']}-{request.args.get('format', 'json')}")
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
 
 # API: Categories
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
     return jsonify(["My Library", "Electronic", "Classical", "Pop", "Rock"])
 
-#  File Server: Stream Audio
-@app.route('/music/<path:filename>')
+#  File Server: Stream Audio (Range / 206, ETag, If-None-Match, If-Range)
+@app.route('/music/<path:filename>', methods=['GET', 'HEAD'])
 def serve_music(filename):
-    return send_from_directory(MUSIC_DIR, filename)
+    # Files the index doesn't track get the plain static file handling
+    if library.get(filename) is None:
+        return send_from_directory(MUSIC_DIR, filename)
+
+    filepath = safe_join(MUSIC_DIR, filename)
+    try:
+        entry = open_files.get(filepath)
+    except FileNotFoundError:
+        return "File Not Found", 404
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    return send_audio(request, entry, mimetype)
 
 # ---------------------------------------------------------
 # Serve React App 
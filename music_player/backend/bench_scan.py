@@ -0,0 +1,78 @@
+"""
+Benchmark cold scans of the music index.
+
+Generates a corpus of synthetic MP3s (silent MPEG-1 Layer III frames plus
+ID3 tags and a small cover) and measures files/sec of MusicIndex.refresh()
+on an empty index for an increasing number of worker processes.
+
+    python bench_scan.py --files 5000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, APIC
+
+from library import MusicIndex
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding -> 417 byte frames (~26 ms each)
+FRAME_HEADER = bytes([0xFF, 0xFB, 0x90, 0x64])
+FRAME_SIZE = 417
+
+
+def make_mp3(path, seconds, index, cover):
+    frames = int(seconds / 0.026)
+    with open(path, 'wb') as f:
+        f.write((FRAME_HEADER + b'\x00' * (FRAME_SIZE - 4)) * frames)
+
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=f"Track {index}"))
+    tags.add(TPE1(encoding=3, text=f"Artist {index % 200}"))
+    tags.add(TALB(encoding=3, text=f"Album {index % 1000}"))
+    tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=cover))
+    tags.save(path)
+
+
+def make_corpus(directory, count, seconds):
+    cover = os.urandom(32 * 1024)
+    for i in range(count):
+        make_mp3(os.path.join(directory, f"track_{i:06d}.mp3"), seconds, i, cover)
+
+
+def run(music_dir, workers):
+    db_dir = tempfile.mkdtemp(prefix="bench_index_")
+    try:
+        index = MusicIndex(music_dir, os.path.join(db_dir, 'index.db'), workers=workers)
+        started = time.perf_counter()
+        updated, _ = index.refresh()
+        elapsed = time.perf_counter() - started
+        index.close()
+        return updated, elapsed
+    finally:
+        shutil.rmtree(db_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--seconds', type=float, default=30, help="length of each synthetic track")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    music_dir = tempfile.mkdtemp(prefix="bench_music_")
+    try:
+        print(f"Generating {args.files} synthetic MP3s in {music_dir}...")
+        make_corpus(music_dir, args.files, args.seconds)
+
+        print(f"\n{'workers':>8} {'files':>8} {'seconds':>9} {'files/s':>9}")
+        for workers in sorted(set(args.workers)):
+            updated, elapsed = run(music_dir, workers)
+            print(f"{workers:>8} {updated:>8} {elapsed:>9.2f} {updated / elapsed:>9.0f}")
+    finally:
+        shutil.rmtree(music_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Latency benchmark for the /api/music/search inverted index.
+
+Builds a SearchIndex over a synthetic library (random multi-word titles,
+a few thousand artists and albums) and times a mix of full-word, multi-word
+and type-ahead prefix queries, reporting p50/p99/max in milliseconds.
+
+    python bench_search.py --tracks 100000 --queries 5000
+"""
+import argparse
+import random
+import string
+import time
+
+from search import SearchIndex
+
+
+def make_words(count, rng):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))))
+    return sorted(words)
+
+
+def make_rows(tracks, rng):
+    words = make_words(20000, rng)
+    artists = [" ".join(rng.sample(words, 2)).title() for _ in range(5000)]
+    albums = [" ".join(rng.sample(words, rng.randint(1, 3))).title() for _ in range(15000)]
+    return [
+        {
+            "filename": f"track_{i:06d}.mp3",
+            "title": " ".join(rng.sample(words, rng.randint(1, 4))).title(),
+            "artist": rng.choice(artists),
+            "album": rng.choice(albums),
+        }
+        for i in range(tracks)
+    ], words
+
+
+def make_queries(rows, count, rng):
+    queries = []
+    for _ in range(count):
+        row = rng.choice(rows)
+        words = row["title"].split() + row["artist"].split()
+        kind = rng.random()
+        if kind < 0.4:
+            # Type-ahead: a prefix of one word
+            word = rng.choice(words)
+            queries.append(word[:rng.randint(1, len(word))])
+        elif kind < 0.7:
+            queries.append(rng.choice(words))
+        else:
+            picked = rng.sample(words, min(len(words), 2))
+            picked[-1] = picked[-1][:rng.randint(1, len(picked[-1]))]
+            queries.append(" ".join(picked))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tracks', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows, _ = make_rows(args.tracks, rng)
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.rebuild(rows)
+    print(f"Indexed {len(index)} tracks in {time.perf_counter() - started:.2f}s")
+
+    # Incremental updates: re-add 1% of the library one row at a time
+    started = time.perf_counter()
+    for row in rows[:max(1, args.tracks // 100)]:
+        index.on_index_change([row], [])
+    print(f"Incremental update: {(time.perf_counter() - started) / max(1, args.tracks // 100) * 1e6:.0f} us/track")
+
+    latencies = []
+    for query in make_queries(rows, args.queries, rng):
+        started = time.perf_counter()
+        index.search(query, 20)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    print(f"{len(latencies)} queries: p50={pct(0.50):.2f}ms p99={pct(0.99):.2f}ms max={latencies[-1]:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Load benchmark for /music/<filename> range streaming.
+
+Simulates many listeners seeking at random through long tracks: each client
+repeatedly requests a random `Range: bytes=<start>-<start+chunk>` slice over a
+keep-alive connection and every response is checked (206, Content-Range,
+body length). Reports throughput and latency percentiles.
+
+By default a temporary library of long synthetic tracks is generated and the
+app is served in-process with werkzeug's threaded server:
+
+    python bench_streaming.py --clients 200 --duration 15
+
+Use --url to point the benchmark at an already running server instead:
+
+    python bench_streaming.py --url http://localhost:5000 --track "Ajab Si.mp3"
+"""
+import argparse
+import http.client
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+from bench_scan import make_mp3
+
+
+def client(host, port, paths, sizes, chunk, deadline, latencies, errors):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    while time.monotonic() < deadline:
+        path = random.choice(paths)
+        size = sizes[path]
+        start = random.randrange(0, max(1, size - chunk))
+        end = min(size, start + chunk) - 1
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Range': f"bytes={start}-{end}"})
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            errors.append("connection")
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+        if (response.status != 206 or len(body) != end - start + 1
+                or response.getheader('Content-Range') != f"bytes {start}-{end}/{size}"):
+            errors.append(response.status)
+    conn.close()
+
+
+def probe_sizes(host, port, paths):
+    sizes = {}
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    for path in paths:
+        conn.request('HEAD', path)
+        response = conn.getresponse()
+        response.read()
+        sizes[path] = int(response.getheader('Content-Length'))
+    conn.close()
+    return sizes
+
+
+def serve_in_process(tracks, minutes):
+    music_dir = tempfile.mkdtemp(prefix="bench_stream_")
+    print(f"Generating {tracks} synthetic {minutes}-minute tracks in {music_dir}...")
+    for i in range(tracks):
+        make_mp3(os.path.join(music_dir, f"long_{i:03d}.mp3"), minutes * 60, i, os.urandom(1024))
+
+    os.environ['MUSIC_DIR'] = music_dir
+    os.environ['MUSIC_INDEX_PATH'] = os.path.join(music_dir, 'index.db')
+    os.environ['MUSIC_COVER_CACHE'] = os.path.join(music_dir, 'covers')
+    os.environ['MUSIC_WATCHER'] = 'off'
+    from werkzeug.serving import make_server
+    import app as music_app
+    music_app.library.refresh()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, music_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    paths = [f"/music/long_{i:03d}.mp3" for i in range(tracks)]
+    return server, music_dir, paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="base URL of a running server (default: serve in-process)")
+    parser.add_argument('--track', action='append', help="track filename to request (with --url)")
+    parser.add_argument('--tracks', type=int, default=4, help="synthetic tracks to generate")
+    parser.add_argument('--minutes', type=int, default=60, help="length of each synthetic track")
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=10, help="seconds to run")
+    parser.add_argument('--chunk', type=int, default=256 * 1024, help="bytes per range request")
+    args = parser.parse_args()
+
+    server = music_dir = None
+    if args.url:
+        if not args.track:
+            parser.error("--url requires at least one --track")
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname, parsed.port or 80
+        paths = [f"/music/{quote(track)}" for track in args.track]
+    else:
+        server, music_dir, paths = serve_in_process(args.tracks, args.minutes)
+        host, port = server.host, server.port
+
+    try:
+        sizes = probe_sizes(host, port, paths)
+        latencies, errors = [], []
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=client, args=(host, port, paths, sizes, args.chunk, deadline, latencies, errors))
+            for _ in range(args.clients)
+        ]
+        started = time.monotonic()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        if not latencies:
+            print("No successful requests")
+            return
+        latencies.sort()
+        pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+        print(f"\nclients={args.clients} requests={len(latencies)} errors={len(errors)} elapsed={elapsed:.1f}s")
+        print(f"throughput: {len(latencies) / elapsed:.0f} req/s, "
+              f"{len(latencies) * args.chunk / elapsed / 2**20:.1f} MiB/s")
+        print(f"latency ms: p50={pct(0.50):.1f} p90={pct(0.90):.1f} p99={pct(0.99):.1f} "
+              f"mean={statistics.mean(latencies) * 1000:.1f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if music_dir is not None:
+            shutil.rmtree(music_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Shared fixtures for the backend tests.
+
+app.py configures itself from the environment at import, so the session
+fixture points every path at a temporary copy of the sample library before
+importing it. The watcher and waveform analysis stay off; tests that need
+the index current call library.refresh() themselves.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'music')
+
+
+def copy_samples(target, count=None):
+    names = sorted(os.listdir(SAMPLE_DIR))[:count]
+    for name in names:
+        shutil.copy2(os.path.join(SAMPLE_DIR, name), os.path.join(target, name))
+    return names
+
+
+@pytest.fixture(scope='session')
+def server():
+    """The imported app module, serving a temporary copy of music/"""
+    root = tempfile.mkdtemp(prefix='music_')
+    music_dir = os.path.join(root, 'music')
+    os.makedirs(music_dir)
+    copy_samples(music_dir)
+    os.environ.update(
+        MUSIC_DIR=music_dir,
+        MUSIC_INDEX_PATH=os.path.join(root, 'music_index.db'),
+        MUSIC_COVER_CACHE=os.path.join(root, 'cover_cache'),
+        MUSIC_SCAN_WORKERS='1',
+        MUSIC_WATCHER='off',
+        MUSIC_WAVEFORMS='off',
+    )
+    sys.modules.pop('app', None)
+    import app as server
+    server.library.refresh()
+    return server
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
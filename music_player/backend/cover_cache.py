@@ -0,0 +1,222 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from mutagen.id3 import ID3, ID3NoHeaderError
+
+# Pillow is optional: without it every size is served as the original image
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# ?size= values -> longest edge in pixels (None = original embedded image)
+COVER_SIZES = {"64": 64, "256": 256, "full": None}
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/jpg": "jpg", "image/png": "png", "image/gif": "gif", "image/webp": "webp"}
+MIMETYPES = {"jpg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+
+
+class Cover:
+    __slots__ = ("data", "mimetype", "etag", "mtime")
+
+    def __init__(self, data, mimetype, etag, mtime):
+        self.data = data
+        self.mimetype = mimetype
+        self.etag = etag
+        self.mtime = mtime
+
+
+class CoverCache:
+    """
+    Content-addressed cache for embedded album art.
+
+    The APIC frame of each MP3 is extracted once and stored on disk under the
+    SHA-1 of the image bytes, next to pre-generated thumbnails for every
+    COVER_SIZES entry. A small pointer file maps (filename, mtime, size) to that
+    digest, so identical album art shared by a whole album is stored once and a
+    warm lookup never opens the MP3. Recently served covers are also kept in
+    an in-memory LRU holding at most `max_bytes` of image data.
+    """
+
+    def __init__(self, music_dir, cache_dir, max_bytes=32 * 1024 * 1024):
+        self.music_dir = music_dir
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._warmer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cover-warmer")
+
+        os.makedirs(os.path.join(cache_dir, "by_file"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+
+    # --- Disk layout ---
+
+    def _pointer_path(self, filename, st):
+        key = f"{filename}|{st.st_mtime_ns}|{st.st_size}".encode("utf-8")
+        return os.path.join(self.cache_dir, "by_file", hashlib.sha1(key).hexdigest())
+
+    def _object_path(self, digest, variant, ext):
+        return os.path.join(self.cache_dir, "objects", digest[:2], f"{digest}_{variant}.{ext}")
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # --- Extraction ---
+
+    def _extract(self, filepath):
+        try:
+            tags = ID3(filepath)
+        except ID3NoHeaderError:
+            return None
+        for key in tags.keys():
+            if key.startswith('APIC:'):
+                art = tags[key]
+                return art.data, art.mime
+        return None
+
+    def _thumbnail(self, data, px):
+        img = Image.open(io.BytesIO(data))
+        img.thumbnail((px, px))
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=85, optimize=True)
+        return out.getvalue()
+
+    def _build(self, filename, filepath, st):
+        """Extract the cover once and write the original plus every thumbnail variant"""
+        art = self._extract(filepath)
+        pointer = self._pointer_path(filename, st)
+        if art is None:
+            self._write(pointer, b"")
+            return None
+
+        data, mime = art
+        digest = hashlib.sha1(data).hexdigest()
+        ext = EXTENSIONS.get((mime or "").lower(), "jpg")
+
+        original = self._object_path(digest, "full", ext)
+        if not os.path.exists(original):
+            self._write(original, data)
+
+        if Image is not None:
+            for variant, px in COVER_SIZES.items():
+                path = self._object_path(digest, variant, "jpg")
+                if px is None or os.path.exists(path):
+                    continue
+                try:
+                    self._write(path, self._thumbnail(data, px))
+                except Exception as e:
+                    print(f"Error resizing cover for {filename}: {e}")
+                    break
+
+        self._write(pointer, f"{digest} {ext}".encode("ascii"))
+        return digest, ext
+
+    def _variant_path(self, digest, ext, variant):
+        """(variant actually served, path) for a requested variant of a stored cover"""
+        path = self._object_path(digest, variant, "jpg")
+        if variant == "full" or not os.path.exists(path):
+            # No Pillow (or the image could not be decoded): fall back to the original
+            return "full", self._object_path(digest, "full", ext)
+        return variant, path
+
+    def _lookup(self, filename, filepath, st):
+        pointer = self._pointer_path(filename, st)
+        try:
+            with open(pointer, "rb") as f:
+                content = f.read().decode("ascii")
+        except FileNotFoundError:
+            return self._build(filename, filepath, st)
+        if not content:
+            return None
+        digest, ext = content.split()
+        return digest, ext
+
+    # --- Public API ---
+
+    def get(self, filename, variant="full"):
+        """Return a Cover for the requested variant, or None if the file has no art"""
+        filepath = os.path.join(self.music_dir, filename)
+        try:
+            st = os.stat(filepath)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+        key = (filename, st.st_mtime_ns, st.st_size, variant)
+        with self._lock:
+            cover = self._memory.get(key)
+            if cover is not None:
+                self._memory.move_to_end(key)
+                return cover
+
+        found = self._lookup(filename, filepath, st)
+        if found is None:
+            return None
+        digest, ext = found
+
+        served, path = self._variant_path(digest, ext, variant)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Cache directory was cleaned behind our back; rebuild from the MP3
+            os.remove(self._pointer_path(filename, st))
+            found = self._build(filename, filepath, st)
+            if found is None:
+                return None
+            digest, ext = found
+            served, path = self._variant_path(digest, ext, variant)
+            with open(path, "rb") as f:
+                data = f.read()
+
+        mimetype = MIMETYPES.get(os.path.splitext(path)[1][1:], "image/jpeg")
+        cover = Cover(data, mimetype, f"{digest}-{served}", st.st_mtime)
+
+        if len(data) <= self.max_bytes:
+            with self._lock:
+                previous = self._memory.pop(key, None)
+                if previous is not None:
+                    self._memory_bytes -= len(previous.data)
+                self._memory[key] = cover
+                self._memory_bytes += len(data)
+                while self._memory_bytes > self.max_bytes:
+                    _, evicted = self._memory.popitem(last=False)
+                    self._memory_bytes -= len(evicted.data)
+        return cover
+
+    def warm(self, filename):
+        """Pre-generate the cover variants for a file in the background"""
+        self._warmer.submit(self._warm, filename)
+
+    def _warm(self, filename):
+        filepath = os.path.join(self.music_dir, filename)
+        try:
+            st = os.stat(filepath)
+            if not os.path.exists(self._pointer_path(filename, st)):
+                self._build(filename, filepath, st)
+        except Exception as e:
+            print(f"Error caching cover for {filename}: {e}")
+
+    def forget(self, filename):
+        with self._lock:
+            for key in [k for k in self._memory if k[0] == filename]:
+                self._memory_bytes -= len(self._memory.pop(key).data)
+
+    def on_index_change(self, rows, removed):
+        """MusicIndex listener: pre-generate art for new files, drop removed ones"""
+        for row in rows:
+            self.forget(row["filename"])
+            if row["has_cover"]:
+                self.warm(row["filename"])
+        for filename in removed:
+            self.forget(filename)
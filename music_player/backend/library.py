@@ -0,0 +1,404 @@
+import os
+import math
+import base64
+import bisect
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# mutagen is the library that reads audio metadata
+from mutagen.mp3 import MP3
+from mutagen.id3 import ID3
+
+DEFAULT_CATEGORY = "My Library"
+
+# Cold scans smaller than this are parsed inline; forking workers costs more than it saves
+PARALLEL_THRESHOLD = 64
+# Files handed to a worker at a time, and written to the index per commit
+SCAN_BATCH_SIZE = 100
+
+
+def format_duration(seconds):
+    minutes = math.floor(seconds / 60)
+    secs = math.floor(seconds % 60)
+    return f"{minutes}:{secs:02d}"
+
+
+def is_music_file(filename):
+    return filename.lower().endswith('.mp3')
+
+
+def get_file_metadata(filepath):
+    """
+    Parse the ID3 tags of a single MP3.
+    Returns the raw fields stored in the index (duration in seconds).
+    """
+    filename = os.path.basename(filepath)
+
+    # Defaults
+    metadata = {
+        "title": os.path.splitext(filename)[0],
+        "artist": "Unknown Artist",
+        "album": "Unknown Album",
+        "duration": None,
+        "has_cover": False,
+    }
+
+    try:
+        audio = MP3(filepath, ID3=ID3)
+
+        if audio.info:
+            metadata["duration"] = audio.info.length
+
+        if audio.tags:
+            if 'TIT2' in audio.tags: metadata["title"] = str(audio.tags['TIT2'])
+            if 'TPE1' in audio.tags: metadata["artist"] = str(audio.tags['TPE1'])
+            if 'TALB' in audio.tags: metadata["album"] = str(audio.tags['TALB'])
+            for key in audio.tags.keys():
+                if key.startswith('APIC:'):
+                    metadata["has_cover"] = True
+                    break
+
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+
+    return metadata
+
+
+def _parse_batch(music_dir, batch):
+    """Worker entry point: parse a batch of (filename, mtime, size) tuples"""
+    return [
+        (name, mtime, size, get_file_metadata(os.path.join(music_dir, name)))
+        for name, mtime, size in batch
+    ]
+
+
+def print_progress(done, total, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"Indexed {done}/{total} files ({rate:.0f} files/s)")
+
+
+# Sort keys for /api/music?sort=...; the filename tiebreak makes every key unique
+SORT_KEYS = {
+    "title": lambda row: (row["title"].casefold(), row["filename"]),
+    "artist": lambda row: (row["artist"].casefold(), row["album"].casefold(),
+                           row["title"].casefold(), row["filename"]),
+    "duration": lambda row: (row["duration"] if row["duration"] is not None else -1.0, row["filename"]),
+}
+FILTER_FIELDS = ("artist", "album", "category")
+# Filtered views kept per library version; filter values come from clients, so this is an LRU
+FILTERED_ORDERS_CACHE_SIZE = 64
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort, order, key):
+    raw = json.dumps([sort, order, list(key)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort, order, key = json.loads(raw)
+        return sort, order, tuple(key)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+
+
+def to_track(row):
+    """Convert an index row into the JSON shape served by /api/music"""
+    filename = row["filename"]
+    duration = row["duration"]
+
+    if row["has_cover"]:
+        cover_url = f"/api/cover/{filename}?v={int(row['mtime'])}"
+    else:
+        cover_url = None
+
+    return {
+        "id": f"local_{filename}",
+        "title": row["title"],
+        "artist": row["artist"],
+        "category": row["category"],
+        "album": row["album"],
+        "duration": format_duration(duration) if duration is not None else "--:--",
+        "url": f"/music/{filename}",
+        "cover": cover_url
+    }
+
+
+class MusicIndex:
+    """
+    Persistent metadata index for MUSIC_DIR.
+
+    Rows are keyed by filename and remember the (mtime, size) they were parsed
+    from, so a refresh only re-reads tags for files that actually changed.
+    The index is also kept in memory so /api/music never touches SQLite or
+    mutagen on the hot path.
+    """
+
+    COLUMNS = ("filename", "mtime", "size", "title", "artist", "album",
+               "duration", "has_cover", "category")
+
+    def __init__(self, music_dir, db_path, workers=1):
+        self.music_dir = music_dir
+        self.db_path = db_path
+        self.workers = max(1, workers or 1)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracks (
+                filename  TEXT PRIMARY KEY,
+                mtime     REAL NOT NULL,
+                size      INTEGER NOT NULL,
+                title     TEXT NOT NULL,
+                artist    TEXT NOT NULL,
+                album     TEXT NOT NULL,
+                duration  REAL,
+                has_cover INTEGER NOT NULL DEFAULT 0,
+                category  TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+        self._rows = {}
+        self._playlist = None
+        # sort -> (sorted keys, filenames), and an LRU of (sort, filters) -> the same
+        # for filtered views; both rebuilt lazily after a change
+        self._orders = {}
+        self._filtered = OrderedDict()
+        self._listeners = []
+        for row in self._conn.execute("SELECT * FROM tracks"):
+            self._rows[row["filename"]] = dict(row)
+
+    def _scan(self):
+        """Stat every MP3 in the music folder without opening it"""
+        found = {}
+        if not os.path.exists(self.music_dir):
+            return found
+        with os.scandir(self.music_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and is_music_file(entry.name):
+                    st = entry.stat()
+                    found[entry.name] = (st.st_mtime, st.st_size)
+        return found
+
+    def _is_stale(self, filename, mtime, size):
+        row = self._rows.get(filename)
+        return row is None or row["mtime"] != mtime or row["size"] != size
+
+    def _build_row(self, filename, mtime, size, metadata):
+        row = dict(metadata)
+        row.update({
+            "filename": filename,
+            "mtime": mtime,
+            "size": size,
+            "has_cover": int(bool(metadata["has_cover"])),
+            "category": DEFAULT_CATEGORY,
+        })
+        return row
+
+    def add_listener(self, callback):
+        """Register callback(updated_rows, removed_filenames), called after every change"""
+        self._listeners.append(callback)
+
+    def _notify(self, rows, removed):
+        for callback in self._listeners:
+            try:
+                callback(rows, removed)
+            except Exception as e:
+                print(f"Index listener failed: {e}")
+
+    def _store(self, rows):
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in self.COLUMNS)
+        with self._lock:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO tracks ({', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row[c] for c in self.COLUMNS) for row in rows]
+            )
+            self._conn.commit()
+            for row in rows:
+                self._rows[row["filename"]] = row
+            self._playlist = None
+            self._orders = {}
+            self._filtered.clear()
+        self._notify(rows, [])
+
+    def _delete(self, filenames):
+        if not filenames:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM tracks WHERE filename = ?",
+                                   [(f,) for f in filenames])
+            self._conn.commit()
+            for filename in filenames:
+                self._rows.pop(filename, None)
+            self._playlist = None
+            self._orders = {}
+            self._filtered.clear()
+        self._notify([], list(filenames))
+
+    def refresh(self, progress=None):
+        """
+        Bring the index in line with the music folder.
+        Only new or modified files are parsed; returns (updated, removed) counts.
+
+        Large batches of stale files (e.g. the first scan of a big library) are
+        spread across a process pool of `workers`; results are written to the
+        index batch by batch as they finish, and progress(done, total, elapsed)
+        is called after each batch.
+        """
+        found = self._scan()
+
+        stale = [(name, mtime, size) for name, (mtime, size) in found.items()
+                 if self._is_stale(name, mtime, size)]
+        removed = [name for name in list(self._rows) if name not in found]
+
+        batches = [stale[i:i + SCAN_BATCH_SIZE] for i in range(0, len(stale), SCAN_BATCH_SIZE)]
+        started = time.monotonic()
+        done = 0
+
+        if self.workers > 1 and len(stale) >= PARALLEL_THRESHOLD:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [pool.submit(_parse_batch, self.music_dir, batch) for batch in batches]
+                for future in as_completed(futures):
+                    done += self._store_parsed(future.result())
+                    if progress:
+                        progress(done, len(stale), time.monotonic() - started)
+        else:
+            for batch in batches:
+                done += self._store_parsed(_parse_batch(self.music_dir, batch))
+                if progress:
+                    progress(done, len(stale), time.monotonic() - started)
+
+        self._delete(removed)
+
+        return done, len(removed)
+
+    def _store_parsed(self, parsed):
+        self._store([self._build_row(name, mtime, size, metadata)
+                     for name, mtime, size, metadata in parsed])
+        return len(parsed)
+
+    def update_file(self, filename):
+        """
+        Incrementally re-index a single file after a filesystem event.
+        Returns True if the index changed.
+        """
+        if not is_music_file(filename):
+            return False
+
+        filepath = os.path.join(self.music_dir, filename)
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            return self.remove_file(filename)
+
+        if not self._is_stale(filename, st.st_mtime, st.st_size):
+            return False
+
+        metadata = get_file_metadata(filepath)
+        self._store([self._build_row(filename, st.st_mtime, st.st_size, metadata)])
+        return True
+
+    def remove_file(self, filename):
+        if filename not in self._rows:
+            return False
+        self._delete([filename])
+        return True
+
+    def get(self, filename):
+        return self._rows.get(filename)
+
+    def rows(self):
+        with self._lock:
+            return list(self._rows.values())
+
+    def tracks(self):
+        """Playlist entries for every indexed file, ordered by filename"""
+        with self._lock:
+            if self._playlist is None:
+                self._playlist = [to_track(self._rows[name]) for name in sorted(self._rows)]
+            return self._playlist
+
+    def _order(self, sort, filters):
+        """Sorted (keys, filenames) for one sort field and filter combination"""
+        with self._lock:
+            if not filters:
+                order = self._orders.get(sort)
+                if order is None:
+                    key_fn = SORT_KEYS[sort]
+                    ordered = sorted((key_fn(row), name) for name, row in self._rows.items())
+                    order = self._orders[sort] = ([key for key, _ in ordered], [name for _, name in ordered])
+                return order
+
+            cache_key = (sort, filters)
+            order = self._filtered.get(cache_key)
+            if order is not None:
+                self._filtered.move_to_end(cache_key)
+                return order
+
+            base_keys, base_names = self._order(sort, ())
+            keys, names = [], []
+            for key, name in zip(base_keys, base_names):
+                row = self._rows[name]
+                if all(row[field].casefold() == value for field, value in filters):
+                    keys.append(key)
+                    names.append(name)
+
+            self._filtered[cache_key] = (keys, names)
+            if len(self._filtered) > FILTERED_ORDERS_CACHE_SIZE:
+                self._filtered.popitem(last=False)
+            return keys, names
+
+    def page(self, sort="title", order="asc", filters=None, cursor=None, limit=50):
+        """
+        One page of tracks plus the cursor for the next one.
+
+        Each (sort, filters) view is computed once per library change; after
+        that a page is a bisect on the sorted keys plus `limit` rows, so its
+        cost does not depend on the size of the library.
+        """
+        filters = tuple(sorted((field, value.casefold()) for field, value in (filters or {}).items()))
+        keys, names = self._order(sort, filters)
+
+        if cursor:
+            cursor_sort, cursor_order, after = decode_cursor(cursor)
+            if (cursor_sort, cursor_order) != (sort, order):
+                raise InvalidCursor("Cursor does not match the requested sort")
+            after = tuple(after)
+            try:
+                if order == "asc":
+                    start = bisect.bisect_right(keys, after)
+                else:
+                    start = bisect.bisect_left(keys, after) - 1
+            except TypeError:
+                raise InvalidCursor("Cursor does not match the requested sort")
+        else:
+            start = 0 if order == "asc" else len(keys) - 1
+
+        if order == "asc":
+            positions = range(start, min(start + limit, len(keys)))
+            has_more = start + limit < len(keys)
+        else:
+            positions = range(start, max(start - limit, -1), -1)
+            has_more = start - limit >= 0
+
+        with self._lock:
+            tracks = [to_track(self._rows[names[i]]) for i in positions if names[i] in self._rows]
+        next_cursor = encode_cursor(sort, order, keys[positions[-1]]) if has_more and tracks else None
+
+        return {"tracks": tracks, "next_cursor": next_cursor, "total": len(keys)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
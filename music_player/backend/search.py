@@ -0,0 +1,157 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+import unicodedata
+
+# Relative importance of a match in each tag
+FIELD_WEIGHTS = {"title": 3.0, "artist": 2.0, "album": 1.0}
+# Completions considered for the last (type-ahead) term of a query: the shortest
+# (highest-scoring) ones, ties broken alphabetically. Matches reachable only
+# through the rest are dropped and the total is flagged as an estimate.
+MAX_PREFIX_EXPANSION = 64
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase, strip accents and split on anything that isn't a letter or digit"""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN_RE.findall(text)
+
+
+class SearchIndex:
+    """
+    In-memory inverted index over title, artist and album.
+
+    Every token maps to {filename: weight}; a sorted vocabulary supports
+    prefix lookups for the last term of a query (type-ahead). Documents are
+    added and removed one at a time, so it can follow MusicIndex changes
+    without ever being rebuilt.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._vocabulary = []
+        self._doc_tokens = {}
+        self._titles = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    # --- Maintenance ---
+
+    def add(self, row):
+        with self._lock:
+            self._add(row, keep_sorted=True)
+
+    def _add(self, row, keep_sorted):
+        filename = row["filename"]
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(row.get(field) or ""):
+                weights[token] = weights.get(token, 0.0) + weight
+
+        self._remove(filename)
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                if keep_sorted:
+                    bisect.insort(self._vocabulary, token)
+            posting[filename] = weight
+        self._doc_tokens[filename] = tuple(weights)
+        self._titles[filename] = (row.get("title") or "").casefold()
+
+    def remove(self, filename):
+        with self._lock:
+            self._remove(filename)
+
+    def _remove(self, filename):
+        for token in self._doc_tokens.pop(filename, ()):
+            posting = self._postings[token]
+            posting.pop(filename, None)
+            if not posting:
+                del self._postings[token]
+                i = bisect.bisect_left(self._vocabulary, token)
+                del self._vocabulary[i]
+        self._titles.pop(filename, None)
+
+    def rebuild(self, rows):
+        with self._lock:
+            self._postings, self._vocabulary, self._doc_tokens, self._titles = {}, [], {}, {}
+            for row in rows:
+                self._add(row, keep_sorted=False)
+            self._vocabulary = sorted(self._postings)
+
+    def on_index_change(self, rows, removed):
+        """MusicIndex listener"""
+        with self._lock:
+            for row in rows:
+                self._add(row, keep_sorted=True)
+            for filename in removed:
+                self._remove(filename)
+
+    # --- Querying ---
+
+    def _completions(self, prefix):
+        """(the best MAX_PREFIX_EXPANSION tokens starting with prefix, whether any were left out)"""
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix[:-1] + chr(ord(prefix[-1]) + 1), start)
+        if end - start <= MAX_PREFIX_EXPANSION:
+            return self._vocabulary[start:end], False
+        tokens = itertools.islice(self._vocabulary, start, end)
+        return heapq.nsmallest(MAX_PREFIX_EXPANSION, tokens, key=lambda token: (len(token), token)), True
+
+    def search(self, query, limit=20):
+        """
+        Return (total, [(score, filename), ...], total_is_estimate) for the
+        best `limit` matches; total_is_estimate is set when the last term had
+        more completions than MAX_PREFIX_EXPANSION, so total may undercount.
+
+        Every term must match. Earlier terms match whole tokens; the last
+        term also matches as a prefix, scaled down by how much of the token
+        it covers, so "beat" ranks "Beat It" above "Beatles".
+        """
+        terms = tokenize(query)
+        if not terms:
+            return 0, [], False
+
+        with self._lock:
+            exact_terms, last = terms[:-1], terms[-1]
+
+            postings = []
+            for term in exact_terms:
+                posting = self._postings.get(term)
+                if posting is None:
+                    return 0, [], False
+                postings.append(posting)
+
+            # Last term: exact hit scores full weight, completions are discounted
+            last_scores = {}
+            completions, truncated = self._completions(last)
+            for token in completions:
+                factor = 1.0 if token == last else 0.5 * len(last) / len(token)
+                for filename, weight in self._postings[token].items():
+                    score = weight * factor
+                    if score > last_scores.get(filename, 0.0):
+                        last_scores[filename] = score
+            if not last_scores:
+                return 0, [], truncated
+            postings.append(last_scores)
+
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            candidates = postings[0].keys()
+            for posting in postings[1:]:
+                candidates = [f for f in candidates if f in posting]
+                if not candidates:
+                    return 0, [], truncated
+
+            scored = ((sum(p[f] for p in postings), f) for f in candidates)
+            titles = self._titles
+            top = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], titles.get(item[1], ""), item[1]))
+            return len(candidates), top, truncated
@@ -0,0 +1,174 @@
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response
+from werkzeug.http import http_date, parse_date, quote_etag, unquote_etag
+from werkzeug.wsgi import wrap_file
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _OpenFile:
+    """
+    A cached read-only descriptor plus the stat data responses are built from.
+
+    Readers use os.pread, which never moves the shared file offset, so one
+    descriptor can serve any number of concurrent range requests. The fd is
+    closed when the last reference (cache or in-flight response) goes away.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        st = os.fstat(self.fd)
+        self.size = st.st_size
+        self.mtime = st.st_mtime
+        # Strong validator: changes whenever the bytes on disk can have changed
+        self.etag = f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"
+
+    def read_range(self, start, end):
+        """Yield bytes [start, end) in CHUNK_SIZE pieces"""
+        pos = start
+        while pos < end:
+            chunk = os.pread(self.fd, min(CHUNK_SIZE, end - pos), pos)
+            if not chunk:
+                break
+            pos += len(chunk)
+            yield chunk
+
+    def __del__(self):
+        try:
+            os.close(self.fd)
+        except (AttributeError, OSError):
+            pass
+
+
+class OpenFileCache:
+    """
+    Small LRU of open audio files, keyed by path.
+    Entries must be invalidated when the file changes (see on_index_change).
+    """
+
+    def __init__(self, max_files=64):
+        self.max_files = max_files
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None:
+                self._files.move_to_end(path)
+                return entry
+
+        entry = _OpenFile(path)
+        with self._lock:
+            self._files[path] = entry
+            self._files.move_to_end(path)
+            while len(self._files) > self.max_files:
+                self._files.popitem(last=False)
+        return entry
+
+    def invalidate(self, path):
+        with self._lock:
+            self._files.pop(path, None)
+
+    def on_index_change(self, rows, removed):
+        """MusicIndex listener: drop descriptors for modified or deleted files"""
+        changed = {row["filename"] for row in rows} | set(removed)
+        with self._lock:
+            for path in [p for p in self._files if os.path.basename(p) in changed]:
+                del self._files[path]
+
+
+def _parse_range(header, size):
+    """
+    Parse a single 'bytes=' range into (start, end) with end exclusive.
+    Returns None when the header should be ignored (multiple ranges or
+    invalid syntax, including a last byte before the first, RFC 7233 2.1)
+    and False when it is valid but unsatisfiable.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[6:].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split('-', 1))
+    if not (first.isdigit() or first == '') or not (last.isdigit() or last == '') or first == last == '':
+        return None
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    end = int(last) + 1 if last else size
+    return start, min(end, size)
+
+
+def _if_range_matches(header, entry):
+    """If-Range holds either a strong ETag or an HTTP date"""
+    if header.startswith('"') or header.startswith('W/'):
+        etag, weak = unquote_etag(header)
+        return not weak and etag == entry.etag
+    date = parse_date(header)
+    return date is not None and int(entry.mtime) == int(date.timestamp())
+
+
+def _not_modified(request, entry):
+    if request.if_none_match:
+        return request.if_none_match.contains(entry.etag)
+    if request.if_modified_since:
+        return int(entry.mtime) <= request.if_modified_since.timestamp()
+    return False
+
+
+def send_audio(request, entry, mimetype='audio/mpeg'):
+    """
+    Build a response for an audio file with conditional GET and single
+    byte-range support.
+
+    Full responses go through the server's wsgi.file_wrapper so servers that
+    implement it (gunicorn, uWSGI) can sendfile() the body; range responses
+    are read from the cached descriptor with pread.
+    """
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': quote_etag(entry.etag),
+        'Last-Modified': http_date(entry.mtime),
+        'Cache-Control': 'public, max-age=3600',
+    }
+
+    if _not_modified(request, entry):
+        return Response(status=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or _if_range_matches(if_range, entry)):
+        byte_range = _parse_range(range_header, entry.size)
+
+    if byte_range is False:
+        headers['Content-Range'] = f"bytes */{entry.size}"
+        return Response(status=416, headers=headers)
+
+    if byte_range is None:
+        headers['Content-Length'] = str(entry.size)
+        if request.method == 'HEAD':
+            return Response(status=200, headers=headers, mimetype=mimetype)
+        body = wrap_file(request.environ, open(entry.path, 'rb'), CHUNK_SIZE)
+        return Response(body, status=200, headers=headers, mimetype=mimetype, direct_passthrough=True)
+
+    start, end = byte_range
+    headers['Content-Range'] = f"bytes {start}-{end - 1}/{entry.size}"
+    headers['Content-Length'] = str(end - start)
+    if request.method == 'HEAD':
+        return Response(status=206, headers=headers, mimetype=mimetype)
+    return Response(entry.read_range(start, end), status=206, headers=headers,
+                    mimetype=mimetype, direct_passthrough=True)
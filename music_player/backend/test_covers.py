@@ -0,0 +1,75 @@
+"""Tests for /api/cover: thumbnail sizes, the on-disk cache and caching headers."""
+import io
+import os
+import shutil
+
+import pytest
+
+import cover_cache
+from cover_cache import CoverCache
+
+
+def test_sizes(client, server):
+    filename = 'a.mp3'
+    full = client.get(f'/api/cover/{filename}')
+    assert full.status_code == 200 and full.mimetype.startswith('image/')
+    # Only versioned URLs (as in the playlist) are immutable
+    assert 'immutable' not in full.headers['Cache-Control'] and 'no-cache' in full.headers['Cache-Control']
+    versioned = client.get(f'/api/cover/{filename}?v=1')
+    assert 'immutable' in versioned.headers['Cache-Control'] and versioned.data == full.data
+
+    if cover_cache.Image is None:
+        pytest.skip("Pillow not installed: every size is the original")
+    for size in ('64', '256'):
+        response = client.get(f'/api/cover/{filename}?size={size}')
+        assert response.status_code == 200 and response.mimetype == 'image/jpeg'
+        image = cover_cache.Image.open(io.BytesIO(response.data))
+        assert max(image.size) <= int(size)
+        # Each size has its own validator
+        assert response.headers['ETag'] != full.headers['ETag']
+        assert client.get(f'/api/cover/{filename}?size={size}', headers={
+            'If-None-Match': response.headers['ETag']
+        }).status_code == 304
+
+
+def test_invalid_requests(client):
+    assert client.get('/api/cover/a.mp3?size=128').status_code == 400
+    assert client.get('/api/cover/missing.mp3').status_code == 404
+
+
+def test_shared_art_is_stored_once_and_survives_a_cleaned_cache(server, tmp_path):
+    music_dir = tmp_path / 'music'
+    music_dir.mkdir()
+    for name in ('one.mp3', 'two.mp3'):
+        shutil.copy2(os.path.join(server.MUSIC_DIR, 'a.mp3'), music_dir / name)
+    covers = CoverCache(str(music_dir), str(tmp_path / 'covers'))
+
+    first, second = covers.get('one.mp3', '256'), covers.get('two.mp3', '256')
+    assert first.etag == second.etag
+    objects = [f for _, _, files in os.walk(tmp_path / 'covers' / 'objects') for f in files]
+    assert len(objects) == len(cover_cache.COVER_SIZES)
+
+    # Thumbnails deleted behind the cache's back are rebuilt from the MP3, in the size asked for
+    shutil.rmtree(tmp_path / 'covers' / 'objects')
+    covers.forget('one.mp3')
+    rebuilt = covers.get('one.mp3', '256')
+    assert rebuilt.etag == first.etag and rebuilt.data == first.data
+    assert covers.get('one.mp3', 'full').data == covers.get('two.mp3', 'full').data
+
+
+def test_memory_cache_is_bounded_by_bytes(server, tmp_path):
+    music_dir = tmp_path / 'music'
+    music_dir.mkdir()
+    for name in ('one.mp3', 'two.mp3', 'three.mp3'):
+        shutil.copy2(os.path.join(server.MUSIC_DIR, 'a.mp3'), music_dir / name)
+    size = len(CoverCache(str(music_dir), str(tmp_path / 'probe')).get('one.mp3', 'full').data)
+
+    covers = CoverCache(str(music_dir), str(tmp_path / 'covers'), max_bytes=2 * size)
+    for name in ('one.mp3', 'two.mp3', 'three.mp3'):
+        covers.get(name, 'full')
+    assert [key[0] for key in covers._memory] == ['two.mp3', 'three.mp3']
+    assert covers._memory_bytes == 2 * size
+
+    # An image bigger than the whole budget is served but not kept
+    small = CoverCache(str(music_dir), str(tmp_path / 'covers'), max_bytes=size - 1)
+    assert small.get('one.mp3', 'full').data and not small._memory
@@ -0,0 +1,74 @@
+"""Tests for the persistent metadata index behind /api/music."""
+import os
+import shutil
+
+import pytest
+
+import library
+from conftest import SAMPLE_DIR, copy_samples
+from library import MusicIndex
+
+
+@pytest.fixture
+def music_dir(tmp_path):
+    path = tmp_path / 'music'
+    path.mkdir()
+    copy_samples(str(path))
+    return str(path)
+
+
+def count_parses(monkeypatch):
+    parsed = []
+    original = library.get_file_metadata
+    def counting(filepath):
+        parsed.append(os.path.basename(filepath))
+        return original(filepath)
+    monkeypatch.setattr(library, 'get_file_metadata', counting)
+    return parsed
+
+
+def test_refresh_only_parses_changed_files(music_dir, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'index.db')
+    index = MusicIndex(music_dir, db_path)
+    assert index.refresh() == (4, 0)
+    index.close()
+
+    # A restart reads the index from SQLite instead of the tags
+    parsed = count_parses(monkeypatch)
+    index = MusicIndex(music_dir, db_path)
+    assert len(index.rows()) == 4 and index.refresh() == (0, 0) and parsed == []
+
+    os.utime(os.path.join(music_dir, 'a.mp3'), (1, 1))
+    os.remove(os.path.join(music_dir, 'Ajab Si.mp3'))
+    shutil.copy2(os.path.join(SAMPLE_DIR, 'a.mp3'), os.path.join(music_dir, 'b.mp3'))
+    assert index.refresh() == (2, 1)
+    assert sorted(parsed) == ['a.mp3', 'b.mp3']
+    assert index.get('Ajab Si.mp3') is None and index.get('b.mp3')['artist'] == 'Atif Aslam'
+    assert [t['url'] for t in index.tracks()][-2:] == ['/music/a.mp3', '/music/b.mp3']
+
+
+def test_update_file(music_dir, tmp_path):
+    index = MusicIndex(music_dir, str(tmp_path / 'index.db'))
+    index.refresh()
+    changes = []
+    index.add_listener(lambda rows, removed: changes.append(([r['filename'] for r in rows], removed)))
+
+    assert not index.update_file('a.mp3')  # unchanged
+    assert not index.update_file('cover.jpg')  # not music
+    os.remove(os.path.join(music_dir, 'a.mp3'))
+    assert index.update_file('a.mp3')
+    assert changes == [([], ['a.mp3'])]
+
+
+def test_parallel_scan_matches_serial_scan(music_dir, tmp_path, monkeypatch):
+    serial = MusicIndex(music_dir, str(tmp_path / 'serial.db'))
+    serial.refresh()
+
+    monkeypatch.setattr(library, 'PARALLEL_THRESHOLD', 2)
+    monkeypatch.setattr(library, 'SCAN_BATCH_SIZE', 1)
+    progress = []
+    parallel = MusicIndex(music_dir, str(tmp_path / 'parallel.db'), workers=2)
+    assert parallel.refresh(progress=lambda done, total, elapsed: progress.append((done, total))) == (4, 0)
+
+    assert progress == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    assert {r['filename']: r for r in parallel.rows()} == {r['filename']: r for r in serial.rows()}
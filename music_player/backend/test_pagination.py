@@ -0,0 +1,58 @@
+"""Tests for cursor pagination, sorting and filters on /api/music."""
+
+from library import FILTERED_ORDERS_CACHE_SIZE
+
+
+def all_pages(client, query):
+    tracks, cursor, pages = [], '', 0
+    while cursor is not None:
+        page = client.get(f'/api/music?{query}&cursor={cursor}').get_json()
+        tracks.extend(page['tracks'])
+        cursor = page['next_cursor']
+        pages += 1
+    return tracks, pages
+
+
+def test_plain_playlist_unless_paginating(client):
+    playlist = client.get('/api/music').get_json()
+    assert isinstance(playlist, list) and len(playlist) == 5  # the demo track plus four local files
+    # Unrelated parameters don't change the response shape
+    assert client.get('/api/music?t=123').get_json() == playlist
+    assert set(client.get('/api/music?limit=2').get_json()) == {'tracks', 'next_cursor', 'total'}
+
+
+def test_cursor_walks_every_track_once(client):
+    tracks, pages = all_pages(client, 'limit=3&sort=title')
+    titles = [t['title'] for t in tracks]
+    assert pages == 2 and len(titles) == 4
+    assert titles == sorted(titles, key=str.casefold)
+
+    backwards, _ = all_pages(client, 'limit=1&sort=duration&order=desc')
+    assert [t['duration'] for t in backwards] == ['4:01', '3:16', '3:12', '2:35']
+
+
+def test_filters(client):
+    page = client.get('/api/music?limit=10&artist=atif aslam').get_json()
+    assert [t['title'] for t in page['tracks']] == ['Ajnabi - PagalNew '] and page['total'] == 1
+    assert client.get('/api/music?limit=10&category=Rock').get_json()['total'] == 0
+
+
+def test_invalid_parameters(client):
+    assert client.get('/api/music?limit=abc').status_code == 400
+    assert client.get('/api/music?limit=0').status_code == 400
+    assert client.get('/api/music?limit=501').status_code == 400
+    assert client.get('/api/music?limit=2&sort=year').status_code == 400
+    assert client.get('/api/music?cursor=not-a-cursor').status_code == 400
+
+    # A cursor only continues the sort it was issued for
+    cursor = client.get('/api/music?limit=1&sort=title').get_json()['next_cursor']
+    assert client.get(f'/api/music?limit=1&sort=artist&cursor={cursor}').status_code == 400
+    assert client.get('/api/music/search?q=ajab&limit=abc').status_code == 400
+
+
+def test_filtered_views_are_capped(client, server):
+    for i in range(FILTERED_ORDERS_CACHE_SIZE + 10):
+        assert client.get(f'/api/music?limit=1&artist=nobody {i}').get_json()['total'] == 0
+    assert len(server.library._filtered) == FILTERED_ORDERS_CACHE_SIZE
+    # The most recent views are the ones kept
+    assert ('title', (('artist', f'nobody {FILTERED_ORDERS_CACHE_SIZE + 9}'),)) in server.library._filtered
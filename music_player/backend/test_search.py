@@ -0,0 +1,58 @@
+"""Tests for the in-memory search index and /api/music/search."""
+from search import MAX_PREFIX_EXPANSION, SearchIndex
+
+
+def row(filename, title, artist='Unknown Artist', album='Unknown Album'):
+    return {"filename": filename, "title": title, "artist": artist, "album": album}
+
+
+def test_prefix_matching_and_ranking():
+    index = SearchIndex()
+    index.rebuild([
+        row('1.mp3', 'Beat It', 'Michael Jackson'),
+        row('2.mp3', 'Help!', 'The Beatles'),
+        row('3.mp3', 'Beatles Medley', 'Various'),
+        row('4.mp3', 'Café del Mar', 'Energy 52'),
+    ])
+
+    # The last term matches as a prefix; a whole-token, title match ranks first
+    total, results, estimate = index.search('beat')
+    assert total == 3 and not estimate
+    assert [f for _, f in results] == ['1.mp3', '3.mp3', '2.mp3']
+    # Earlier terms must match whole tokens
+    assert index.search('beat jack')[1][0][1] == '1.mp3'
+    assert index.search('bea jackson') == (0, [], False)
+    # Accents and case are folded
+    assert [f for _, f in index.search('CAFE')[1]] == ['4.mp3']
+    assert index.search('   ') == (0, [], False)
+
+
+def test_prefix_with_more_completions_than_the_cap():
+    extra = MAX_PREFIX_EXPANSION + 10
+    index = SearchIndex()
+    index.rebuild([row('love.mp3', 'Love')] + [row(f'{i:03}.mp3', f'Love{i:03}') for i in range(extra)])
+
+    # Shorter completions are kept first, then alphabetical ones; the total is flagged
+    total, results, estimate = index.search('lov', limit=100)
+    assert estimate and total == MAX_PREFIX_EXPANSION
+    assert {f for _, f in results} == {'love.mp3'} | {f'{i:03}.mp3' for i in range(MAX_PREFIX_EXPANSION - 1)}
+    # A longer prefix with fewer completions than the cap is exact again
+    assert index.search('love07')[::2] == (4, False)
+
+
+def test_follows_index_changes():
+    index = SearchIndex()
+    index.rebuild([row('1.mp3', 'Beat It')])
+    index.on_index_change([row('1.mp3', 'Thriller'), row('2.mp3', 'Beat Street')], [])
+    assert [f for _, f in index.search('beat')[1]] == ['2.mp3']
+    index.on_index_change([], ['2.mp3'])
+    assert index.search('beat') == (0, [], False) and len(index) == 1
+
+
+def test_search_endpoint(client):
+    response = client.get('/api/music/search?q=ajn')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['total'] == 1 and body['tracks'][0]['artist'] == 'Atif Aslam' and body['total_is_estimate'] is False
+    assert body['tracks'][0]['url'] == '/music/a.mp3'
+    assert client.get('/api/music/search?q=').status_code == 400
@@ -0,0 +1,77 @@
+"""Tests for /music/<filename>: byte ranges, If-Range, 416 and conditional GET."""
+import os
+
+import pytest
+from werkzeug.http import http_date
+
+
+@pytest.fixture
+def track(server):
+    filename = 'a.mp3'
+    with open(os.path.join(server.MUSIC_DIR, filename), 'rb') as f:
+        return filename, f.read()
+
+
+def test_full_response_and_conditional_get(client, track):
+    filename, data = track
+    response = client.get(f'/music/{filename}')
+    assert response.status_code == 200 and response.data == data
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.headers['Content-Length'] == str(len(data))
+
+    etag = response.headers['ETag']
+    assert client.get(f'/music/{filename}', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(f'/music/{filename}', headers={
+        'If-Modified-Since': response.headers['Last-Modified']
+    }).status_code == 304
+
+    head = client.head(f'/music/{filename}')
+    assert head.status_code == 200 and head.data == b'' and head.headers['Content-Length'] == str(len(data))
+
+
+def test_byte_ranges(client, track):
+    filename, data = track
+    size = len(data)
+
+    response = client.get(f'/music/{filename}', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206 and response.data == data[100:200]
+    assert response.headers['Content-Range'] == f'bytes 100-199/{size}'
+    assert response.headers['Content-Length'] == '100'
+
+    # Open-ended, suffix, and an end past the file are clamped
+    assert client.get(f'/music/{filename}', headers={'Range': f'bytes={size - 10}-'}).data == data[-10:]
+    assert client.get(f'/music/{filename}', headers={'Range': 'bytes=-500'}).data == data[-500:]
+    response = client.get(f'/music/{filename}', headers={'Range': f'bytes={size - 5}-{size + 100}'})
+    assert response.status_code == 206 and response.headers['Content-Range'] == f'bytes {size - 5}-{size - 1}/{size}'
+
+    # A range spanning several read chunks comes back whole
+    assert client.get(f'/music/{filename}', headers={'Range': 'bytes=0-300000'}).data == data[:300001]
+
+    # Multiple ranges and invalid ones (last byte before the first, RFC 7233 2.1) are ignored: the whole file
+    for header in ('bytes=0-1,5-6', 'bytes=abc', 'items=0-1', 'bytes=10-5', 'bytes=-', 'bytes=5--3'):
+        response = client.get(f'/music/{filename}', headers={'Range': header})
+        assert response.status_code == 200 and len(response.data) == size
+
+
+def test_unsatisfiable_range(client, track):
+    filename, data = track
+    for header in (f'bytes={len(data)}-', f'bytes={len(data) + 10}-{len(data) + 20}', 'bytes=-0'):
+        response = client.get(f'/music/{filename}', headers={'Range': header})
+        assert response.status_code == 416
+        assert response.headers['Content-Range'] == f'bytes */{len(data)}'
+
+
+def test_if_range(client, track):
+    filename, data = track
+    first = client.get(f'/music/{filename}')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+
+    # The validator still matches: the range is honoured
+    for validator in (etag, last_modified):
+        response = client.get(f'/music/{filename}', headers={'Range': 'bytes=0-9', 'If-Range': validator})
+        assert response.status_code == 206 and response.data == data[:10]
+
+    # The file changed since (or a weak ETag): the full new file instead of a mismatched piece
+    for validator in ('"stale"', f'W/{etag}', http_date(0)):
+        response = client.get(f'/music/{filename}', headers={'Range': 'bytes=0-9', 'If-Range': validator})
+        assert response.status_code == 200 and len(response.data) == len(data)
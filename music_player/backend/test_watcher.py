@@ -0,0 +1,61 @@
+"""Tests for the background library watcher: events and the periodic rescan."""
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+import watcher as watcher_module
+from conftest import SAMPLE_DIR, copy_samples
+from library import MusicIndex
+from watcher import LibraryWatcher
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def index():
+    root = tempfile.mkdtemp(prefix='watcher_')
+    music_dir = os.path.join(root, 'music')
+    os.makedirs(music_dir)
+    copy_samples(music_dir, count=1)
+    index = MusicIndex(music_dir, os.path.join(root, 'index.db'))
+    yield index
+    index.close()
+
+
+def add_sample(index, name):
+    source = os.path.join(SAMPLE_DIR, sorted(os.listdir(SAMPLE_DIR))[-1])
+    shutil.copy2(source, os.path.join(index.music_dir, name))
+
+
+def test_catch_up_scan_runs_on_the_watcher_thread(index):
+    watcher = LibraryWatcher(index, poll_interval=0.1, debounce=0.05).start()
+    try:
+        assert wait_for(lambda: len(index.rows()) == 1)
+        add_sample(index, 'new.mp3')
+        assert wait_for(lambda: index.get('new.mp3') is not None)
+    finally:
+        watcher.stop()
+
+
+@pytest.mark.skipif(watcher_module.Observer is None, reason="watchdog not installed")
+def test_events_mode_rescans_for_missed_events(index):
+    watcher = LibraryWatcher(index, debounce=0.05, rescan_interval=0.5).start()
+    try:
+        assert watcher.mode == "events"
+        assert wait_for(lambda: len(index.rows()) == 1)
+        # Lose every further event, as an overflowing inotify queue would
+        watcher._observer.unschedule_all()
+        add_sample(index, 'missed.mp3')
+        assert wait_for(lambda: index.get('missed.mp3') is not None)
+    finally:
+        watcher.stop()
@@ -0,0 +1,111 @@
+"""Tests for waveform analysis: peak reduction, serving stored peaks, and failures (recorded, backed off, retried when the file changes)."""
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+import pytest
+
+import waveform
+from waveform import WaveformStore
+
+FAILING_DECODER = shutil.which('false')
+
+
+@pytest.fixture
+def failing_store(monkeypatch, server):
+    if waveform.np is None or FAILING_DECODER is None:
+        pytest.skip("needs numpy and a `false` binary")
+    # Stands in for an ffmpeg that can't decode anything
+    monkeypatch.setattr(waveform, 'FFMPEG', FAILING_DECODER)
+    store = WaveformStore(server.MUSIC_DIR, os.path.join(tempfile.mkdtemp(prefix='waveform_'), 'w.db'), workers=1)
+    monkeypatch.setattr(server, 'waveforms', store)
+    return store
+
+
+@pytest.fixture
+def stored_waveform(monkeypatch, server):
+    """A store holding a known analysis for the first track, without decoding anything"""
+    if waveform.np is None or FAILING_DECODER is None:
+        pytest.skip("needs numpy and a `false` binary")
+    monkeypatch.setattr(waveform, 'FFMPEG', FAILING_DECODER)  # only makes the store count as enabled
+    store = WaveformStore(server.MUSIC_DIR, os.path.join(tempfile.mkdtemp(prefix='waveform_'), 'w.db'), workers=1)
+    monkeypatch.setattr(server, 'waveforms', store)
+    row = server.library.rows()[0]
+    peaks = waveform.np.array([-127, 127, -5, 3], dtype=waveform.np.int8)
+    store._conn.execute("INSERT INTO waveforms VALUES (?, ?, ?, ?, ?)",
+                        (row['filename'], row['mtime'], row['size'], peaks.tobytes(), -14.2))
+    store._conn.commit()
+    return row
+
+
+def drain(store):
+    store._pool.shutdown(wait=True)
+
+
+def test_failed_decode_is_not_retried_on_every_request(client, server, failing_store):
+    filename = server.library.rows()[0]['filename']
+    assert client.get(f'/api/waveform/{filename}').status_code == 202
+    drain(failing_store)
+
+    response = client.get(f'/api/waveform/{filename}')
+    assert response.status_code == 422
+    body = response.get_json()
+    assert body['status'] == 'failed' and 0 < body['retry_after'] <= waveform.RETRY_BASE
+    assert response.headers['Retry-After'] == str(body['retry_after'])
+    assert not failing_store._pending  # nothing was scheduled again
+
+    # backfill() leaves it alone until the retry time
+    failing_store.backfill(server.library.rows()[:1])
+    assert not failing_store._pending
+
+
+def test_backoff_doubles_and_a_changed_file_retries_at_once(server, failing_store):
+    row = dict(server.library.rows()[0])
+    key = (row['filename'], row['mtime'], row['size'])
+    failing_store._record_failure(key, 'first')
+    failing_store._record_failure(key, 'second')
+    error, retry_at = failing_store.failure(row)
+    attempts = failing_store._conn.execute("SELECT attempts FROM waveform_failures").fetchone()[0]
+    assert error == 'second' and attempts == 2
+    assert waveform.RETRY_BASE < retry_at - time.time() <= 2 * waveform.RETRY_BASE
+
+    # A new version of the file has no failure recorded
+    row['mtime'] += 1
+    assert failing_store.failure(row) is None
+    failing_store.on_index_change([], [row['filename']])
+    assert failing_store._conn.execute("SELECT COUNT(*) FROM waveform_failures").fetchone()[0] == 0
+
+
+def test_compute_peaks_on_known_samples():
+    np = pytest.importorskip('numpy')
+    samples = np.array([0, 16384, -16384, 0, 32767, -32768, 256, -256, 999], dtype='<i2')
+    # Four buckets of two samples; the trailing sample that doesn't fill a bucket is dropped
+    assert waveform.compute_peaks(samples, points=4).tolist() == [0, 64, -64, 0, -127, 127, -1, 1]
+    # Never more points than samples
+    assert waveform.compute_peaks(samples[:3], points=1000).tolist() == [0, 0, 64, 64, -64, -64]
+    assert waveform.compute_peaks(np.zeros(0, dtype='<i2')).tolist() == []
+
+
+def test_stored_waveform_is_served(client, stored_waveform):
+    url = f"/api/waveform/{stored_waveform['filename']}"
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.get_json() == {"points": 2, "peaks": [-127, 127, -5, 3], "loudness": -14.2}
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    raw = client.get(f'{url}?format=raw')
+    assert raw.status_code == 200 and raw.mimetype == 'application/octet-stream'
+    assert raw.data == bytes([129, 127, 251, 3]) and raw.headers['X-Loudness-LUFS'] == '-14.2'
+
+
+def test_decode_error_is_the_last_stderr_line(monkeypatch):
+    decoder = os.path.join(tempfile.mkdtemp(prefix='decoder_'), 'ffmpeg')
+    with open(decoder, 'w') as f:
+        f.write('#!/bin/sh\necho "Input #0" >&2\necho "song.mp3: Invalid data found" >&2\nexit 1\n')
+    os.chmod(decoder, os.stat(decoder).st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(waveform, 'FFMPEG', decoder)
+    with pytest.raises(RuntimeError) as error:
+        waveform.decode('song.mp3')
+    assert str(error.value) == 'song.mp3: Invalid data found'
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+
+from library import is_music_file, print_progress
+
+# watchdog is optional: it gives us inotify on Linux (FSEvents/ReadDirectoryChangesW elsewhere).
+# Without it we fall back to periodically diffing the folder against the index.
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _MusicEventHandler(FileSystemEventHandler):
+    """Turns watchdog events into pending filenames for the watcher"""
+
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self.watcher.touch(event.src_path)
+        # Moves/renames carry the new name in dest_path
+        dest_path = getattr(event, 'dest_path', None)
+        if dest_path:
+            self.watcher.touch(dest_path)
+
+
+class LibraryWatcher:
+    """
+    Keeps a MusicIndex in sync with MUSIC_DIR in the background.
+
+    Filesystem events are debounced (an album copy fires many 'modified' events
+    per file) and then applied one file at a time, so requests never have to
+    trigger a full rescan. Events can still be missed (inotify queue overflow,
+    network mounts), so the folder is also diffed every `rescan_interval`
+    seconds (0 to disable). When watchdog is unavailable, or the OS refuses
+    another inotify watch, the folder is polled every `poll_interval` seconds.
+    """
+
+    def __init__(self, index, poll_interval=5.0, debounce=1.0, rescan_interval=3600.0):
+        self.index = index
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.rescan_interval = rescan_interval
+        self.mode = None
+
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    def start(self):
+        """Start watching; the catch-up scan runs on the watcher thread, events from then on are queued"""
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_MusicEventHandler(self), self.index.music_dir, recursive=False)
+                self._observer.start()
+                self.mode = "events"
+                self._thread = threading.Thread(target=self._apply_events, name="music-watcher", daemon=True)
+            except OSError as e:
+                print(f"Filesystem events unavailable ({e}), falling back to polling")
+                self._observer = None
+
+        if self._observer is None:
+            self.mode = "polling"
+            self._thread = threading.Thread(target=self._poll, name="music-poller", daemon=True)
+
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def touch(self, path):
+        """Mark a file as changed; it is re-indexed once it has been quiet for `debounce` seconds"""
+        filename = os.path.basename(path)
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.index.music_dir):
+            return
+        if not is_music_file(filename):
+            return
+        with self._cond:
+            self._pending[filename] = time.monotonic() + self.debounce
+            self._cond.notify()
+
+    def _catch_up(self):
+        # Whatever changed while the server was down
+        try:
+            self.index.refresh(progress=print_progress)
+        except Exception as e:
+            print(f"Error scanning music folder: {e}")
+
+    def _apply_events(self):
+        self._catch_up()
+        next_rescan = time.monotonic() + self.rescan_interval if self.rescan_interval else None
+        while not self._stopped.is_set():
+            with self._cond:
+                now = time.monotonic()
+                ready = [name for name, due in self._pending.items() if due <= now]
+                for name in ready:
+                    del self._pending[name]
+                rescan = next_rescan is not None and now >= next_rescan
+                if not ready and not rescan:
+                    deadlines = list(self._pending.values()) + ([next_rescan] if next_rescan else [])
+                    self._cond.wait(min(deadlines) - now if deadlines else None)
+                    continue
+
+            for name in ready:
+                try:
+                    self.index.update_file(name)
+                except Exception as e:
+                    print(f"Error indexing {name}: {e}")
+
+            if rescan:
+                try:
+                    self.index.refresh()
+                except Exception as e:
+                    print(f"Error rescanning music folder: {e}")
+                next_rescan = time.monotonic() + self.rescan_interval
+
+    def _poll(self):
+        self._catch_up()
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.index.refresh()
+            except Exception as e:
+                print(f"Error rescanning music folder: {e}")
@@ -0,0 +1,199 @@
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Analysis is optional: it needs numpy for the peak arrays and an ffmpeg binary to decode
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FFMPEG = shutil.which('ffmpeg')
+
+# Number of (min, max) pairs stored per track
+WAVEFORM_POINTS = 1000
+# Decoding rate for the peak data; plenty for a seek-bar sized waveform
+DECODE_RATE = 8000
+
+# A file that fails to decode is retried after RETRY_BASE seconds, doubling up to RETRY_MAX
+RETRY_BASE = 60
+RETRY_MAX = 24 * 3600
+
+LOUDNESS_RE = re.compile(r"I:\s+(-?[\d.]+|-inf) LUFS")
+
+
+def is_available():
+    return np is not None and FFMPEG is not None
+
+
+def decode(filepath):
+    """
+    Decode a track once with ffmpeg: mono PCM at DECODE_RATE for the peaks,
+    and an EBU R128 measurement (ebur128 filter) of the original channels.
+    Returns (int16 samples, integrated loudness in LUFS or None).
+    """
+    cmd = [
+        FFMPEG, '-hide_banner', '-nostats', '-nostdin', '-i', filepath,
+        '-filter_complex',
+        f'[0:a:0]asplit=2[a][b];[a]aformat=channel_layouts=mono,aresample={DECODE_RATE}[pcm];[b]ebur128[meter]',
+        '-map', '[pcm]', '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1',
+        '-map', '[meter]', '-f', 'null', '-',
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
+    if proc.returncode != 0:
+        lines = proc.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"ffmpeg exited with status {proc.returncode}")
+
+    samples = np.frombuffer(proc.stdout, dtype='<i2')
+    matches = LOUDNESS_RE.findall(proc.stderr.decode('utf-8', 'replace'))
+    loudness = None
+    if matches and matches[-1] != '-inf':
+        loudness = float(matches[-1])
+    return samples, loudness
+
+
+def compute_peaks(samples, points=WAVEFORM_POINTS):
+    """
+    Reduce samples to `points` buckets of (min, max), quantized to int8 and
+    interleaved as [min0, max0, min1, max1, ...].
+    """
+    if len(samples) == 0:
+        return np.zeros(0, dtype=np.int8)
+    points = min(points, len(samples))
+    usable = len(samples) - len(samples) % points
+    buckets = samples[:usable].reshape(points, -1).astype(np.float32) / 32768.0
+    peaks = np.empty(points * 2, dtype=np.float32)
+    peaks[0::2] = buckets.min(axis=1)
+    peaks[1::2] = buckets.max(axis=1)
+    return np.clip(np.round(peaks * 127), -127, 127).astype(np.int8)
+
+
+class WaveformStore:
+    """
+    Background waveform/loudness analysis, persisted next to the music index.
+
+    Each track is decoded once per (mtime, size) by a small worker pool; the
+    result is a compact int8 peak array plus integrated loudness stored in
+    SQLite, so clients can draw a seek-bar waveform without downloading audio.
+    A failed decode is recorded too, so it isn't retried on every request but
+    after a backoff (RETRY_BASE doubling to RETRY_MAX), or as soon as the
+    file changes.
+    """
+
+    def __init__(self, music_dir, db_path, workers=2, enabled=True):
+        self.music_dir = music_dir
+        self.enabled = enabled and is_available()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS waveforms (
+                filename TEXT PRIMARY KEY,
+                mtime    REAL NOT NULL,
+                size     INTEGER NOT NULL,
+                peaks    BLOB NOT NULL,
+                loudness REAL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS waveform_failures (
+                filename TEXT PRIMARY KEY,
+                mtime    REAL NOT NULL,
+                size     INTEGER NOT NULL,
+                error    TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                retry_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="waveform") if self.enabled else None
+
+    def get(self, row):
+        """Stored (peaks bytes, loudness) for an index row, or None if missing or stale"""
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT peaks, loudness FROM waveforms WHERE filename = ? AND mtime = ? AND size = ?",
+                (row["filename"], row["mtime"], row["size"])
+            ).fetchone()
+        return found
+
+    def failure(self, row):
+        """(error, retry_at) if decoding this version of the file failed, else None"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT error, retry_at FROM waveform_failures WHERE filename = ? AND mtime = ? AND size = ?",
+                (row["filename"], row["mtime"], row["size"])
+            ).fetchone()
+
+    def schedule(self, row):
+        """Queue analysis for a row unless it is already queued"""
+        if not self.enabled:
+            return
+        key = (row["filename"], row["mtime"], row["size"])
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._pool.submit(self._analyze, key)
+
+    def backfill(self, rows):
+        """Schedule every row that has no up-to-date analysis (e.g. at startup)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            done = {(f, m, s) for f, m, s in self._conn.execute("SELECT filename, mtime, size FROM waveforms")}
+            # Failures wait for their retry time (a request after it reschedules them)
+            done.update((f, m, s) for f, m, s in self._conn.execute(
+                "SELECT filename, mtime, size FROM waveform_failures WHERE retry_at > ?", (time.time(),)))
+        for row in rows:
+            if (row["filename"], row["mtime"], row["size"]) not in done:
+                self.schedule(row)
+
+    def _analyze(self, key):
+        filename, mtime, size = key
+        try:
+            samples, loudness = decode(os.path.join(self.music_dir, filename))
+            peaks = compute_peaks(samples)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO waveforms (filename, mtime, size, peaks, loudness) VALUES (?, ?, ?, ?, ?)",
+                    (filename, mtime, size, peaks.tobytes(), loudness)
+                )
+                self._conn.execute("DELETE FROM waveform_failures WHERE filename = ?", (filename,))
+                self._conn.commit()
+        except Exception as e:
+            print(f"Error analyzing {filename}: {e}")
+            self._record_failure(key, str(e))
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _record_failure(self, key, error):
+        filename, mtime, size = key
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT attempts FROM waveform_failures WHERE filename = ? AND mtime = ? AND size = ?", key
+            ).fetchone()
+            attempts = previous[0] + 1 if previous else 1
+            retry_at = time.time() + min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO waveform_failures (filename, mtime, size, error, attempts, retry_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (filename, mtime, size, error[:500], attempts, retry_at)
+            )
+            self._conn.commit()
+
+    def on_index_change(self, rows, removed):
+        """MusicIndex listener: analyze new/changed tracks, drop deleted ones"""
+        for row in rows:
+            self.schedule(row)
+        if removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM waveforms WHERE filename = ?", [(f,) for f in removed])
+                self._conn.executemany("DELETE FROM waveform_failures WHERE filename = ?", [(f,) for f in removed])
+                self._conn.commit()